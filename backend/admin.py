@@ -1,34 +1,27 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, current_app
 from src.models.database import db
 from src.models.user import User
 from src.models.sorteio import Sorteio
+from src.models.estatisticas import estatisticas_gerais, ultimos_dias
+from src.models.modalidade import Modalidade, BilhetePredefinido, Premiacao, ApostaModalidade
+from src.services.autenticacao import admin_obrigatorio
+from src.services.carteira import lancar, valor_valido, SaldoInsuficiente
+from src.services.paginacao import (
+    usar_cursor, paginar_por_cursor, parametros_cursor, campos_cursor, CursorInvalido
+)
 from src.services.scheduler import sorteio_scheduler
+from src.services.metricas import metricas_aplicacao, medidores_atuais
+from src.services.catalogo import catalogo_modalidades
 from datetime import date, datetime
+import hmac
 
 admin_bp = Blueprint('admin', __name__)
 
-def require_admin():
-    """Verifica se o usuário é administrador (simplificado para demo)"""
-    # Em uma implementação real, você teria um campo 'is_admin' no modelo User
-    # Por enquanto, vamos usar uma verificação simples
-    user_id = session.get('user_id')
-    if not user_id:
-        return None
-    
-    user = User.query.get(user_id)
-    # Para demo, vamos considerar que o primeiro usuário é admin
-    if user and user.id == 1:
-        return user
-    return None
-
 @admin_bp.route('/executar-sorteio', methods=['POST'])
+@admin_obrigatorio
 def executar_sorteio_manual():
     """Executa um sorteio manualmente (apenas para admin)"""
     try:
-        admin = require_admin()
-        if not admin:
-            return jsonify({'error': 'Acesso negado - Apenas administradores'}), 403
-        
         data = request.get_json()
         data_sorteio = None
         
@@ -39,10 +32,13 @@ def executar_sorteio_manual():
                 return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD'}), 400
         
         # Executa o sorteio manual
-        sucesso = sorteio_scheduler.executar_sorteio_manual(data_sorteio)
+        liquidacao = sorteio_scheduler.executar_sorteio_manual(data_sorteio)
         
-        if sucesso:
-            return jsonify({'message': 'Sorteio executado com sucesso'}), 200
+        if liquidacao:
+            return jsonify({
+                'message': 'Sorteio executado com sucesso',
+                'liquidacao': liquidacao
+            }), 200
         else:
             return jsonify({'error': 'Erro ao executar sorteio'}), 500
             
@@ -50,31 +46,30 @@ def executar_sorteio_manual():
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/status-scheduler', methods=['GET'])
+@admin_obrigatorio
 def status_scheduler():
     """Retorna o status do scheduler de sorteios"""
     try:
-        admin = require_admin()
-        if not admin:
-            return jsonify({'error': 'Acesso negado - Apenas administradores'}), 403
-        
         status = sorteio_scheduler.get_proximo_sorteio()
         
         return jsonify({
             'scheduler_status': status,
-            'scheduler_running': sorteio_scheduler.scheduler.running
+            'scheduler_running': sorteio_scheduler.scheduler.running,
+            'processo': sorteio_scheduler.identidade,
+            'lideranca': sorteio_scheduler.get_lideranca(),
+            'execucoes': sorteio_scheduler.get_historico_execucoes(
+                request.args.get('limite', 10, type=int)
+            )
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/parar-scheduler', methods=['POST'])
+@admin_obrigatorio
 def parar_scheduler():
     """Para o scheduler de sorteios"""
     try:
-        admin = require_admin()
-        if not admin:
-            return jsonify({'error': 'Acesso negado - Apenas administradores'}), 403
-        
         sorteio_scheduler.parar_scheduler()
         
         return jsonify({'message': 'Scheduler parado com sucesso'}), 200
@@ -83,13 +78,10 @@ def parar_scheduler():
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/reiniciar-scheduler', methods=['POST'])
+@admin_obrigatorio
 def reiniciar_scheduler():
     """Reinicia o scheduler de sorteios"""
     try:
-        admin = require_admin()
-        if not admin:
-            return jsonify({'error': 'Acesso negado - Apenas administradores'}), 403
-        
         sorteio_scheduler.reiniciar_scheduler()
         
         return jsonify({'message': 'Scheduler reiniciado com sucesso'}), 200
@@ -97,30 +89,47 @@ def reiniciar_scheduler():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _exposicao_metricas():
+    try:
+        texto = metricas_aplicacao.texto_prometheus(medidores_atuais())
+        return current_app.response_class(texto, mimetype='text/plain; version=0.0.4')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/metrics', methods=['GET'])
+def metricas():
+    """Métricas do processo no formato texto do Prometheus (admin ou METRICAS_TOKEN)"""
+    token = current_app.config.get('METRICAS_TOKEN')
+    autorizacao = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(autorizacao, f'Bearer {token}'):
+        return _exposicao_metricas()
+    
+    return admin_obrigatorio(_exposicao_metricas)()
+
 @admin_bp.route('/estatisticas-admin', methods=['GET'])
+@admin_obrigatorio
 def estatisticas_admin():
     """Retorna estatísticas detalhadas para administradores"""
     try:
-        admin = require_admin()
-        if not admin:
-            return jsonify({'error': 'Acesso negado - Apenas administradores'}), 403
+        # Totais mantidos incrementalmente, lidos de uma única linha
+        geral = estatisticas_gerais()
         
         # Estatísticas de usuários
-        total_usuarios = User.query.count()
-        usuarios_ativos = User.query.filter_by(ativo=True).count()
+        total_usuarios = geral.total_usuarios
+        usuarios_ativos = geral.usuarios_ativos
         
         # Estatísticas de sorteios
-        total_sorteios = Sorteio.query.count()
-        sorteios_finalizados = Sorteio.query.filter_by(status='finalizado').count()
+        total_sorteios = geral.total_sorteios
+        sorteios_finalizados = geral.sorteios_finalizados
         
         # Estatísticas financeiras
-        from src.models.aposta import Aposta
-        total_apostas = Aposta.query.count()
-        total_arrecadado = db.session.query(db.func.sum(Sorteio.total_arrecadado)).scalar() or 0
-        total_premiado = db.session.query(db.func.sum(Sorteio.premio_total)).scalar() or 0
+        total_apostas = geral.total_apostas
+        total_arrecadado = geral.total_arrecadado
+        total_premiado = geral.total_premiado
         
         # Saldo total dos usuários
-        saldo_total_usuarios = db.session.query(db.func.sum(User.saldo)).scalar() or 0
+        saldo_total_usuarios = geral.saldo_total_usuarios
         
         return jsonify({
             'usuarios': {
@@ -139,33 +148,42 @@ def estatisticas_admin():
                 'total_premiado': total_premiado,
                 'lucro_casa': total_arrecadado - total_premiado,
                 'margem_casa': ((total_arrecadado - total_premiado) / total_arrecadado * 100) if total_arrecadado > 0 else 0
-            }
+            },
+            'ultimos_dias': [dia.to_dict() for dia in ultimos_dias()]
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/usuarios', methods=['GET'])
+@admin_obrigatorio
 def listar_usuarios():
     """Lista todos os usuários (apenas para admin)"""
     try:
-        admin = require_admin()
-        if not admin:
-            return jsonify({'error': 'Acesso negado - Apenas administradores'}), 403
+        def serializar(usuarios):
+            usuarios_list = []
+            for user in usuarios:
+                user_dict = user.to_dict()
+                # Remove informações sensíveis
+                user_dict.pop('password_hash', None)
+                usuarios_list.append(user_dict)
+            return usuarios_list
+        
+        # Paginação por cursor sobre o índice (data_criacao, id)
+        if usar_cursor():
+            pagina = paginar_por_cursor(
+                User.query, [User.data_criacao, User.id], **parametros_cursor(20)
+            )
+            return jsonify({'usuarios': serializar(pagina['itens']), **campos_cursor(pagina)}), 200
         
         # Pega parâmetros de paginação
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
-        usuarios_query = User.query.order_by(User.data_criacao.desc())
+        usuarios_query = User.query.order_by(User.data_criacao.desc(), User.id.desc())
         usuarios_paginados = usuarios_query.paginate(page=page, per_page=per_page, error_out=False)
         
-        usuarios_list = []
-        for user in usuarios_paginados.items:
-            user_dict = user.to_dict()
-            # Remove informações sensíveis
-            user_dict.pop('password_hash', None)
-            usuarios_list.append(user_dict)
+        usuarios_list = serializar(usuarios_paginados.items)
         
         return jsonify({
             'usuarios': usuarios_list,
@@ -174,6 +192,256 @@ def listar_usuarios():
             'current_page': page
         }), 200
         
+    except CursorInvalido:
+        return jsonify({'error': 'Cursor inválido'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/usuarios/<int:user_id>/ajuste-saldo', methods=['POST'])
+@admin_obrigatorio
+def ajustar_saldo(user_id):
+    """Lança um ajuste manual (crédito ou débito) no saldo de um usuário"""
+    try:
+        data = request.get_json()
+        
+        if not data or 'valor' not in data or not data.get('descricao'):
+            return jsonify({'error': 'Valor e descrição são obrigatórios'}), 400
+        
+        valor = data['valor']
+        
+        if not valor_valido(valor) or valor == 0:
+            return jsonify({'error': 'Valor deve ser diferente de zero'}), 400
+        
+        if not db.session.get(User, user_id):
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+        
+        try:
+            lancamento = lancar(user_id, 'ajuste', valor, data['descricao'])
+        except SaldoInsuficiente:
+            db.session.rollback()
+            return jsonify({'error': 'Saldo insuficiente para o débito'}), 400
+        
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Ajuste lançado com sucesso',
+            'lancamento': lancamento.to_dict()
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Catálogo de modalidades: toda escrita incrementa a versão do catálogo na
+# mesma transação e recarrega o catálogo em memória depois do commit
+
+CAMPOS_MODALIDADE = ('nome', 'descricao', 'cor', 'ativo', 'quantidade_numeros')
+CAMPOS_PREMIACAO = ('posicao', 'valor', 'acertos')
+
+def _salvar_catalogo():
+    catalogo_modalidades.marcar_alterado()
+    db.session.commit()
+    catalogo_modalidades.recarregar()
+
+def _aplicar_numeros(bilhete, numeros, modalidade):
+    """Valida e grava os números de um bilhete do catálogo; retorna a mensagem de erro, se houver"""
+    if not isinstance(numeros, list) or not all(isinstance(numero, int) for numero in numeros):
+        return 'Números devem ser uma lista de inteiros'
+    if len(set(numeros)) != len(numeros):
+        return 'Números repetidos no bilhete'
+    if modalidade.quantidade_numeros and len(numeros) != modalidade.quantidade_numeros:
+        return f'O bilhete deve ter {modalidade.quantidade_numeros} números'
+    try:
+        bilhete.set_numeros(numeros)
+    except ValueError as e:
+        return str(e)
+    return None
+
+@admin_bp.route('/modalidades', methods=['POST'])
+@admin_obrigatorio
+def criar_modalidade():
+    """Cadastra uma modalidade"""
+    try:
+        data = request.get_json()
+        
+        if not data or not all(data.get(campo) for campo in ('nome', 'descricao', 'cor')):
+            return jsonify({'error': 'Nome, descrição e cor são obrigatórios'}), 400
+        
+        modalidade = Modalidade(**{campo: data[campo] for campo in CAMPOS_MODALIDADE if campo in data})
+        db.session.add(modalidade)
+        _salvar_catalogo()
+        
+        return jsonify({
+            'message': 'Modalidade cadastrada com sucesso',
+            'modalidade': modalidade.to_dict()
+        }), 201
+        
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/modalidades/<int:modalidade_id>', methods=['PUT'])
+@admin_obrigatorio
+def atualizar_modalidade(modalidade_id):
+    """Atualiza uma modalidade (inclusive ativo, para tirá-la do catálogo)"""
+    try:
+        data = request.get_json() or {}
+        
+        modalidade = db.session.get(Modalidade, modalidade_id)
+        if not modalidade:
+            return jsonify({'error': 'Modalidade não encontrada'}), 404
+        
+        for campo in CAMPOS_MODALIDADE:
+            if campo in data:
+                setattr(modalidade, campo, data[campo])
+        _salvar_catalogo()
+        
+        return jsonify({
+            'message': 'Modalidade atualizada com sucesso',
+            'modalidade': modalidade.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/modalidades/<int:modalidade_id>/bilhetes', methods=['POST'])
+@admin_obrigatorio
+def criar_bilhetes(modalidade_id):
+    """Cadastra bilhetes pré-definidos: {"bilhetes": [{"numeros": [...], "preco": 5.0}, ...]}"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('bilhetes'), list) or not data['bilhetes']:
+            return jsonify({'error': 'Lista de bilhetes não fornecida'}), 400
+        
+        modalidade = db.session.get(Modalidade, modalidade_id)
+        if not modalidade:
+            return jsonify({'error': 'Modalidade não encontrada'}), 404
+        
+        bilhetes = []
+        for item in data['bilhetes']:
+            preco = item.get('preco')
+            if not valor_valido(preco) or preco <= 0:
+                db.session.rollback()
+                return jsonify({'error': 'Preço deve ser um número maior que zero'}), 400
+            
+            bilhete = BilhetePredefinido(modalidade_id=modalidade.id, preco=preco, ativo=item.get('ativo', True))
+            erro = _aplicar_numeros(bilhete, item.get('numeros'), modalidade)
+            if erro:
+                db.session.rollback()
+                return jsonify({'error': erro}), 400
+            bilhetes.append(bilhete)
+        
+        db.session.add_all(bilhetes)
+        _salvar_catalogo()
+        
+        return jsonify({
+            'message': 'Bilhetes cadastrados com sucesso',
+            'bilhetes': [bilhete.to_dict() for bilhete in bilhetes]
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/bilhetes/<int:bilhete_id>', methods=['PUT'])
+@admin_obrigatorio
+def atualizar_bilhete(bilhete_id):
+    """Atualiza números, preço ou ativo de um bilhete pré-definido"""
+    try:
+        data = request.get_json() or {}
+        
+        bilhete = db.session.get(BilhetePredefinido, bilhete_id)
+        if not bilhete:
+            return jsonify({'error': 'Bilhete não encontrado'}), 404
+        
+        if 'numeros' in data:
+            erro = _aplicar_numeros(bilhete, data['numeros'], bilhete.modalidade)
+            if erro:
+                db.session.rollback()
+                return jsonify({'error': erro}), 400
+        if 'preco' in data:
+            if not valor_valido(data['preco']) or data['preco'] <= 0:
+                db.session.rollback()
+                return jsonify({'error': 'Preço deve ser um número maior que zero'}), 400
+            bilhete.preco = data['preco']
+        if 'ativo' in data:
+            bilhete.ativo = bool(data['ativo'])
+        _salvar_catalogo()
+        
+        return jsonify({
+            'message': 'Bilhete atualizado com sucesso',
+            'bilhete': bilhete.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/modalidades/<int:modalidade_id>/premiacoes', methods=['POST'])
+@admin_obrigatorio
+def criar_premiacao(modalidade_id):
+    """Cadastra uma faixa de premiação da modalidade"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('posicao') or 'valor' not in data:
+            return jsonify({'error': 'Posição e valor são obrigatórios'}), 400
+        
+        if not valor_valido(data['valor']) or data['valor'] < 0:
+            return jsonify({'error': 'Valor da premiação inválido'}), 400
+        
+        if not db.session.get(Modalidade, modalidade_id):
+            return jsonify({'error': 'Modalidade não encontrada'}), 404
+        
+        premiacao = Premiacao(
+            modalidade_id=modalidade_id, **{campo: data[campo] for campo in CAMPOS_PREMIACAO if campo in data}
+        )
+        db.session.add(premiacao)
+        _salvar_catalogo()
+        
+        return jsonify({
+            'message': 'Premiação cadastrada com sucesso',
+            'premiacao': premiacao.to_dict()
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/premiacoes/<int:premiacao_id>', methods=['PUT', 'DELETE'])
+@admin_obrigatorio
+def alterar_premiacao(premiacao_id):
+    """Atualiza (PUT) ou remove (DELETE) uma faixa de premiação"""
+    try:
+        premiacao = db.session.get(Premiacao, premiacao_id)
+        if not premiacao:
+            return jsonify({'error': 'Premiação não encontrada'}), 404
+        
+        if request.method == 'DELETE':
+            if db.session.query(ApostaModalidade.id).filter_by(premiacao_id=premiacao.id).first():
+                return jsonify({'error': 'Premiação já paga em bilhetes; altere-a em vez de removê-la'}), 400
+            
+            db.session.delete(premiacao)
+            _salvar_catalogo()
+            return jsonify({'message': 'Premiação removida com sucesso'}), 200
+        
+        data = request.get_json() or {}
+        if 'valor' in data and (not valor_valido(data['valor']) or data['valor'] < 0):
+            return jsonify({'error': 'Valor da premiação inválido'}), 400
+        
+        for campo in CAMPOS_PREMIACAO:
+            if campo in data:
+                setattr(premiacao, campo, data[campo])
+        _salvar_catalogo()
+        
+        return jsonify({
+            'message': 'Premiação atualizada com sucesso',
+            'premiacao': premiacao.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
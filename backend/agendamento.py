@@ -0,0 +1,71 @@
+from .database import db
+from datetime import datetime
+import json
+
+class LiderScheduler(db.Model):
+    """Concessão de liderança entre os processos que rodam o scheduler.
+
+    Só o dono de uma concessão ainda válida recupera os sorteios perdidos (o
+    sorteio diário roda em quem disparar o job, protegido pela reserva em
+    execucoes_sorteio); a concessão é renovada periodicamente e, se o dono parar de renová-la, outro
+    processo a assume quando ela expira.
+    """
+    __tablename__ = 'lider_scheduler'
+
+    nome = db.Column(db.String(50), primary_key=True)
+    dono = db.Column(db.String(120), nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False)
+    renovada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'dono': self.dono,
+            'expira_em': self.expira_em.isoformat(),
+            'renovada_em': self.renovada_em.isoformat() if self.renovada_em else None
+        }
+
+
+class ExecucaoSorteio(db.Model):
+    """Histórico de execuções dos sorteios, uma linha por data de sorteio.
+
+    A linha é gravada antes de o sorteio rodar e a unicidade de data_sorteio
+    garante que dois processos não executem o mesmo sorteio.
+    """
+    __tablename__ = 'execucoes_sorteio'
+
+    STATUS = ('executando', 'sucesso', 'erro')
+
+    id = db.Column(db.Integer, primary_key=True)
+    data_sorteio = db.Column(db.Date, nullable=False, unique=True)
+    origem = db.Column(db.String(20), nullable=False)  # agendado, recuperacao, manual
+    status = db.Column(db.String(20), nullable=False, default='executando')
+    executado_por = db.Column(db.String(120), nullable=False)
+    iniciado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finalizado_em = db.Column(db.DateTime, nullable=True)
+    duracao_ms = db.Column(db.Float, nullable=True)
+    numero_sorteado = db.Column(db.Integer, nullable=True)
+    total_ganhadores = db.Column(db.Integer, nullable=True)
+    tempos_ms = db.Column(db.Text, nullable=True)  # JSON com o tempo de cada fase da liquidação
+    erro = db.Column(db.Text, nullable=True)
+    tentativas = db.Column(db.Integer, nullable=False, default=1)
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'data_sorteio': self.data_sorteio.isoformat(),
+            'origem': self.origem,
+            'status': self.status,
+            'executado_por': self.executado_por,
+            'iniciado_em': self.iniciado_em.isoformat(),
+            'finalizado_em': self.finalizado_em.isoformat() if self.finalizado_em else None,
+            'duracao_ms': self.duracao_ms,
+            'numero_sorteado': self.numero_sorteado,
+            'total_ganhadores': self.total_ganhadores,
+            'tempos_ms': json.loads(self.tempos_ms) if self.tempos_ms else None,
+            'erro': self.erro,
+            'tentativas': self.tentativas
+        }
+
+    def __repr__(self):
+        return f'<ExecucaoSorteio {self.data_sorteio} - {self.status}>'
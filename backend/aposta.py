@@ -4,6 +4,14 @@ from datetime import datetime
 class Aposta(db.Model):
     """Model para apostas do sistema"""
     __tablename__ = 'apostas'
+    __table_args__ = (
+        # Um número por usuário em cada sorteio; também atende filtros por (user_id, sorteio_id)
+        db.Index('uq_apostas_user_sorteio_numero', 'user_id', 'sorteio_id', 'numero_escolhido', unique=True),
+        # Apuração de ganhadores: filter_by(sorteio_id, numero_escolhido)
+        db.Index('ix_apostas_sorteio_numero', 'sorteio_id', 'numero_escolhido'),
+        # Histórico do usuário: filter_by(user_id).order_by(data_aposta.desc())
+        db.Index('ix_apostas_user_data', 'user_id', 'data_aposta', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1,26 +1,35 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, g
+from sqlalchemy.exc import IntegrityError
 from src.models.database import db
-from src.models.user import User
+from src.services.autenticacao import login_obrigatorio, usuario_atual
 from src.models.aposta import Aposta
-from src.models.sorteio import Sorteio
+from src.models.sorteio import Sorteio, SorteioFechado
+from src.models.modalidade import BilhetePredefinido
+from src.models.numeros_usuario_sorteio import carregar_numeros_apostados
+from src.services.registro_apostas import (
+    registrar_apostas, comprar_bilhete, numero_valido,
+    MOTIVO_NUMERO_INVALIDO, MOTIVO_JA_APOSTADO, MOTIVO_SALDO_INSUFICIENTE
+)
+from src.services.carteira import SaldoInsuficiente
+from src.services.ingestao_apostas import fila_apostas, MOTIVO_SORTEIO_FECHADO
+from src.services.serializadores import serializar_apostas_com_sorteio
+from src.services.catalogo import catalogo_modalidades
+from src.services.paginacao import (
+    usar_cursor, paginar_por_cursor, parametros_cursor, campos_cursor, CursorInvalido
+)
 from datetime import date
 
 apostas_bp = Blueprint('apostas', __name__)
 
-def require_auth():
-    """Decorator para verificar autenticação"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return None
-    return User.query.get(user_id)
+# Limite de números por carrinho no endpoint em lote
+MAXIMO_NUMEROS_LOTE = 500
 
 @apostas_bp.route('/fazer-aposta', methods=['POST'])
+@login_obrigatorio
 def fazer_aposta():
     """Realiza uma nova aposta"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
+        user = usuario_atual()
         
         data = request.get_json()
         
@@ -30,13 +39,8 @@ def fazer_aposta():
         numero = data['numero']
         
         # Validação do número
-        if not isinstance(numero, int) or numero < 1 or numero > 500:
-            return jsonify({'error': 'Número deve estar entre 1 e 500'}), 400
-        
-        # Verifica se o usuário tem saldo suficiente
-        valor_aposta = 2.0
-        if user.saldo < valor_aposta:
-            return jsonify({'error': 'Saldo insuficiente'}), 400
+        if not numero_valido(numero):
+            return jsonify({'error': MOTIVO_NUMERO_INVALIDO}), 400
         
         # Pega o sorteio atual
         sorteio = Sorteio.get_sorteio_atual()
@@ -44,66 +48,227 @@ def fazer_aposta():
         if sorteio.status != 'aberto':
             return jsonify({'error': 'Sorteio não está aberto para apostas'}), 400
         
-        # Verifica se o usuário já apostou neste número hoje
-        aposta_existente = Aposta.query.filter_by(
-            user_id=user.id,
-            sorteio_id=sorteio.id,
-            numero_escolhido=numero
-        ).first()
+        # Ingestão assíncrona: a aposta é reservada e gravada depois, em lote
+        if fila_apostas.habilitada:
+            try:
+                reserva, resultados = fila_apostas.reservar(user.id, sorteio, [numero])
+            except SorteioFechado:
+                return jsonify({'error': MOTIVO_SORTEIO_FECHADO}), 400
+            
+            if not reserva:
+                return jsonify({'error': resultados[0]['motivo']}), 400
+            
+            return jsonify({
+                'message': 'Aposta recebida, aguardando gravação',
+                'reserva': reserva.to_dict(),
+                'saldo_restante': fila_apostas.saldo_disponivel(user.id, user.saldo)
+            }), 202
+        
+        # Valida, debita o saldo e cria a aposta em uma única transação; a aposta
+        # repetida é barrada pelo bitset do usuário e, na corrida, pelo índice único
+        try:
+            aceitas, resultados = registrar_apostas(user, sorteio, [numero])
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': MOTIVO_JA_APOSTADO}), 400
+        except SaldoInsuficiente:
+            db.session.rollback()
+            return jsonify({'error': MOTIVO_SALDO_INSUFICIENTE}), 400
+        except SorteioFechado:
+            # O sorteio foi realizado entre a leitura do status e a gravação
+            db.session.rollback()
+            return jsonify({'error': MOTIVO_SORTEIO_FECHADO}), 400
+        
+        if not aceitas:
+            db.session.rollback()
+            return jsonify({'error': resultados[0]['motivo']}), 400
+        
+        # Serializada antes do commit, que expiraria a aposta e o usuário (dois SELECTs)
+        resposta = {
+            'message': 'Aposta realizada com sucesso',
+            'aposta': aceitas[0].to_dict(),
+            'saldo_restante': user.saldo
+        }
+        db.session.commit()
+        
+        return jsonify(resposta), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@apostas_bp.route('/fazer-apostas-lote', methods=['POST'])
+@login_obrigatorio
+def fazer_apostas_lote():
+    """Realiza várias apostas de uma vez (carrinho) em uma única transação"""
+    try:
+        user = usuario_atual()
         
-        if aposta_existente:
-            return jsonify({'error': 'Você já apostou neste número hoje'}), 400
+        data = request.get_json()
         
-        # Debita o saldo do usuário
-        if not user.debitar_saldo(valor_aposta):
-            return jsonify({'error': 'Erro ao debitar saldo'}), 500
+        if not data or not isinstance(data.get('numeros'), list) or not data['numeros']:
+            return jsonify({'error': 'Lista de números é obrigatória'}), 400
         
-        # Cria a aposta
-        aposta = Aposta(
-            user_id=user.id,
-            sorteio_id=sorteio.id,
-            numero_escolhido=numero,
-            valor_aposta=valor_aposta
-        )
+        numeros = data['numeros']
         
-        db.session.add(aposta)
+        if len(numeros) > MAXIMO_NUMEROS_LOTE:
+            return jsonify({'error': f'Máximo de {MAXIMO_NUMEROS_LOTE} números por lote'}), 400
         
-        # Adiciona o valor ao total arrecadado do sorteio
-        sorteio.adicionar_aposta(valor_aposta)
+        # Pega o sorteio atual
+        sorteio = Sorteio.get_sorteio_atual()
         
-        db.session.commit()
+        if sorteio.status != 'aberto':
+            return jsonify({'error': 'Sorteio não está aberto para apostas'}), 400
+        
+        # Ingestão assíncrona: as apostas aceitas são reservadas e gravadas depois, em lote
+        if fila_apostas.habilitada:
+            try:
+                reserva, resultados = fila_apostas.reservar(user.id, sorteio, numeros)
+            except SorteioFechado:
+                return jsonify({'error': MOTIVO_SORTEIO_FECHADO}), 400
+            
+            total_aceitas = len(reserva.numeros) if reserva else 0
+            return jsonify({
+                'message': f'{total_aceitas} de {len(numeros)} apostas recebidas, aguardando gravação',
+                'reserva': reserva.to_dict() if reserva else None,
+                'resultados': resultados,
+                'total_aceitas': total_aceitas,
+                'total_rejeitadas': len(numeros) - total_aceitas,
+                'valor_reservado': reserva.valor_total if reserva else 0.0,
+                'saldo_restante': fila_apostas.saldo_disponivel(user.id, user.saldo)
+            }), 202 if reserva else 400
+        
+        try:
+            aceitas, resultados = registrar_apostas(user, sorteio, numeros)
+        except IntegrityError:
+            # Outra requisição do mesmo usuário gravou um destes números no meio tempo
+            db.session.rollback()
+            return jsonify({'error': 'Conflito ao registrar as apostas, tente novamente'}), 409
+        except SaldoInsuficiente:
+            # O saldo foi consumido por outra transação entre a validação e o débito
+            db.session.rollback()
+            return jsonify({'error': MOTIVO_SALDO_INSUFICIENTE}), 409
+        except SorteioFechado:
+            db.session.rollback()
+            return jsonify({'error': MOTIVO_SORTEIO_FECHADO}), 400
+        
+        # Lidos antes do commit, que expira as apostas e o usuário (evita um SELECT por aposta)
+        valor_debitado = sum(aposta.valor_aposta for aposta in aceitas)
+        saldo_restante = user.saldo
+        
+        if aceitas:
+            db.session.commit()
+        else:
+            db.session.rollback()
         
         return jsonify({
-            'message': 'Aposta realizada com sucesso',
+            'message': f'{len(aceitas)} de {len(numeros)} apostas realizadas',
+            'resultados': resultados,
+            'total_aceitas': len(aceitas),
+            'total_rejeitadas': len(numeros) - len(aceitas),
+            'valor_debitado': valor_debitado,
+            'saldo_restante': saldo_restante
+        }), 201 if aceitas else 400
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@apostas_bp.route('/comprar-bilhete', methods=['POST'])
+@login_obrigatorio
+def comprar_bilhete_modalidade():
+    """Compra um bilhete pré-definido de uma modalidade para o sorteio atual"""
+    try:
+        user = usuario_atual()
+        
+        data = request.get_json()
+        
+        if not data or 'bilhete_id' not in data:
+            return jsonify({'error': 'ID do bilhete é obrigatório'}), 400
+        
+        bilhete_id = data['bilhete_id']
+        if isinstance(bilhete_id, bool) or not isinstance(bilhete_id, int):
+            return jsonify({'error': 'ID do bilhete inválido'}), 400
+        
+        bilhete = db.session.get(BilhetePredefinido, bilhete_id)
+        if not bilhete or not bilhete.ativo or not bilhete.modalidade.ativo:
+            return jsonify({'error': 'Bilhete não encontrado'}), 404
+        
+        # Pega o sorteio atual
+        sorteio = Sorteio.get_sorteio_atual()
+        
+        if sorteio.status != 'aberto':
+            return jsonify({'error': 'Sorteio não está aberto para apostas'}), 400
+        
+        # Com a ingestão assíncrona, parte do saldo pode estar reservada para apostas ainda não gravadas
+        if fila_apostas.habilitada and fila_apostas.saldo_disponivel(user.id, user.saldo) < bilhete.preco:
+            return jsonify({'error': MOTIVO_SALDO_INSUFICIENTE}), 400
+        
+        try:
+            aposta = comprar_bilhete(user, sorteio, bilhete)
+        except SaldoInsuficiente:
+            db.session.rollback()
+            return jsonify({'error': MOTIVO_SALDO_INSUFICIENTE}), 400
+        except SorteioFechado:
+            db.session.rollback()
+            return jsonify({'error': MOTIVO_SORTEIO_FECHADO}), 400
+        
+        # Serializada antes do commit, que expiraria a aposta e o usuário
+        resposta = {
+            'message': 'Bilhete comprado com sucesso',
             'aposta': aposta.to_dict(),
             'saldo_restante': user.saldo
-        }), 201
+        }
+        db.session.commit()
+        
+        return jsonify(resposta), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@apostas_bp.route('/reservas/<int:reserva_id>', methods=['GET'])
+@login_obrigatorio
+def estado_reserva(reserva_id):
+    """Retorna o estado de uma reserva feita no modo de ingestão assíncrona"""
+    try:
+        reserva = fila_apostas.obter_reserva(reserva_id)
+        
+        if not reserva or reserva.user_id != g.usuario_id:
+            return jsonify({'error': 'Reserva não encontrada'}), 404
+        
+        return jsonify({'reserva': reserva.to_dict()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @apostas_bp.route('/minhas-apostas', methods=['GET'])
+@login_obrigatorio
 def minhas_apostas():
     """Retorna as apostas do usuário logado"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
+        # Busca as apostas do usuário
+        apostas_query = Aposta.query.filter_by(user_id=g.usuario_id)
+        
+        # Paginação por cursor sobre o índice (user_id, data_aposta, id)
+        if usar_cursor():
+            pagina = paginar_por_cursor(
+                apostas_query, [Aposta.data_aposta, Aposta.id], **parametros_cursor(10)
+            )
+            return jsonify({
+                'apostas': serializar_apostas_com_sorteio(pagina['itens']),
+                **campos_cursor(pagina)
+            }), 200
         
         # Pega parâmetros de paginação
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
-        # Busca as apostas do usuário
-        apostas_query = Aposta.query.filter_by(user_id=user.id).order_by(Aposta.data_aposta.desc())
+        apostas_query = apostas_query.order_by(Aposta.data_aposta.desc(), Aposta.id.desc())
         apostas_paginadas = apostas_query.paginate(page=page, per_page=per_page, error_out=False)
         
-        apostas_list = []
-        for aposta in apostas_paginadas.items:
-            aposta_dict = aposta.to_dict()
-            aposta_dict['sorteio'] = aposta.sorteio.to_dict()
-            apostas_list.append(aposta_dict)
+        # Sorteios da página carregados em lote, sem lazy load por aposta
+        apostas_list = serializar_apostas_com_sorteio(apostas_paginadas.items)
         
         return jsonify({
             'apostas': apostas_list,
@@ -112,23 +277,22 @@ def minhas_apostas():
             'current_page': page
         }), 200
         
+    except CursorInvalido:
+        return jsonify({'error': 'Cursor inválido'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @apostas_bp.route('/apostas-hoje', methods=['GET'])
+@login_obrigatorio
 def apostas_hoje():
     """Retorna as apostas do usuário para o sorteio de hoje"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
-        
         # Pega o sorteio de hoje
         sorteio = Sorteio.get_sorteio_atual()
         
         # Busca as apostas do usuário para hoje
         apostas = Aposta.query.filter_by(
-            user_id=user.id,
+            user_id=g.usuario_id,
             sorteio_id=sorteio.id
         ).order_by(Aposta.numero_escolhido).all()
         
@@ -144,13 +308,10 @@ def apostas_hoje():
         return jsonify({'error': str(e)}), 500
 
 @apostas_bp.route('/numeros-disponiveis', methods=['GET'])
+@login_obrigatorio
 def numeros_disponiveis():
     """Retorna os números disponíveis para aposta (que o usuário ainda não apostou hoje)"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
-        
         # Pega o sorteio de hoje
         sorteio = Sorteio.get_sorteio_atual()
         
@@ -160,23 +321,58 @@ def numeros_disponiveis():
                 'message': 'Sorteio não está aberto para apostas'
             }), 200
         
-        # Busca os números que o usuário já apostou hoje
-        apostas_hoje = Aposta.query.filter_by(
-            user_id=user.id,
-            sorteio_id=sorteio.id
-        ).all()
+        # Números que o usuário já apostou hoje, como bitset de 500 bits
+        apostados = carregar_numeros_apostados(g.usuario_id, sorteio.id)
+        disponiveis = apostados.complemento()
         
-        numeros_apostados = [aposta.numero_escolhido for aposta in apostas_hoje]
+        # Formato compacto: o bitset dos apostados em base64 (84 caracteres);
+        # o bit (n - 1) % 8 do byte (n - 1) // 8 indica o número n
+        if request.args.get('formato') == 'bitset':
+            return jsonify({
+                'formato': 'bitset',
+                'numeros_apostados': apostados.para_base64(),
+                'total_disponiveis': len(disponiveis)
+            }), 200
         
-        # Gera lista de números disponíveis (1 a 500, exceto os já apostados)
-        numeros_disponiveis = [num for num in range(1, 501) if num not in numeros_apostados]
+        numeros_disponiveis = list(disponiveis)
         
         return jsonify({
             'numeros_disponiveis': numeros_disponiveis,
-            'numeros_apostados': numeros_apostados,
+            'numeros_apostados': list(apostados),
             'total_disponiveis': len(numeros_disponiveis)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@apostas_bp.route('/modalidades', methods=['GET'])
+def get_modalidades():
+    """Retorna todas as modalidades ativas"""
+    try:
+        return catalogo_modalidades.responder(catalogo_modalidades.atual().modalidades)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@apostas_bp.route('/modalidades/<int:modalidade_id>/bilhetes', methods=['GET'])
+def get_bilhetes_modalidade(modalidade_id):
+    """Retorna os bilhetes pré-definidos ativos de uma modalidade ativa"""
+    try:
+        resposta = catalogo_modalidades.atual().bilhetes.get(modalidade_id)
+        if resposta is None:
+            return jsonify({'error': 'Modalidade não encontrada'}), 404
+        
+        return catalogo_modalidades.responder(resposta)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@apostas_bp.route('/modalidades/<int:modalidade_id>/premiacoes', methods=['GET'])
+def get_premiacoes_modalidade(modalidade_id):
+    """Retorna as premiações de uma modalidade ativa, da maior para a menor"""
+    try:
+        resposta = catalogo_modalidades.atual().premiacoes.get(modalidade_id)
+        if resposta is None:
+            return jsonify({'error': 'Modalidade não encontrada'}), 404
+        
+        return catalogo_modalidades.responder(resposta)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
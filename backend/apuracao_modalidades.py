@@ -0,0 +1,250 @@
+from src.models.database import db
+from src.models.bitset_numeros import BitsetNumeros
+from src.models.modalidade import Modalidade, ApostaModalidade, ResultadoModalidade
+from src.models.estatisticas import somar_gerais
+from src.services.carteira import creditar_por_usuario
+from src.services.liquidacao import Cronometro
+import json
+import logging
+import random
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - sem NumPy a contagem roda em Python puro
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Faixa dos números dos bilhetes (a mesma dos sorteios de um número)
+NUMERO_MAXIMO = 500
+
+# Tamanho do bitset de cada bilhete em apostas_modalidades.numeros
+TAMANHO_BITSET = (NUMERO_MAXIMO + 7) // 8
+
+# Bilhetes lidos e contados por vez; limita a memória a alguns MB por lote
+LOTE_LEITURA = 100_000
+
+
+def sortear_numeros(quantidade, rnd=random):
+    """Sorteia ``quantidade`` números distintos de 1 a NUMERO_MAXIMO, em ordem crescente"""
+    return sorted(rnd.sample(range(1, NUMERO_MAXIMO + 1), quantidade))
+
+
+def contar_acertos(bitsets, sorteados):
+    """Acertos de cada bilhete contra os números sorteados.
+
+    ``bitsets`` são os bitsets de 63 bytes dos bilhetes (BitsetNumeros.para_bytes()).
+    Com NumPy, os bilhetes viram uma matriz n x 63 de bytes e cada número
+    sorteado soma, de uma vez para todos os bilhetes, o seu bit na coluna do
+    byte correspondente: k operações vetorizadas sobre n bilhetes. Sem NumPy,
+    conta os bits da interseção de cada bilhete com o sorteio.
+    """
+    if np is not None:
+        matriz = np.frombuffer(b''.join(bitsets), dtype=np.uint8).reshape(len(bitsets), TAMANHO_BITSET)
+        acertos = np.zeros(len(bitsets), dtype=np.uint8)
+        for numero in sorteados:
+            acertos += (matriz[:, (numero - 1) // 8] >> ((numero - 1) % 8)) & 1
+        return acertos
+
+    mascara = BitsetNumeros(sorteados).bits
+    return [bin(int.from_bytes(bits, 'little') & mascara).count('1') for bits in bitsets]
+
+
+def faixas_premiacao(modalidade, quantidade):
+    """Retorna {acertos: Premiacao} da modalidade.
+
+    Faixas sem ``acertos`` definidos seguem a ordem de valor: a de maior
+    prêmio exige os ``quantidade`` números, a seguinte um a menos, e assim por
+    diante.
+    """
+    faixas = {}
+    premiacoes = sorted(modalidade.premiacoes, key=lambda premiacao: (-premiacao.valor, premiacao.id))
+    for ordem, premiacao in enumerate(premiacoes):
+        acertos = premiacao.acertos if premiacao.acertos is not None else quantidade - ordem
+        if acertos > 0:
+            faixas.setdefault(acertos, premiacao)
+    return faixas
+
+
+def _premiados(consulta, sorteados, faixas):
+    """Percorre os bilhetes da consulta em lotes e devolve (total de bilhetes, [(id, acertos)] premiados)"""
+    minimo = min(faixas) if faixas else None
+    total = 0
+    premiados = []
+
+    resultado = db.session.execute(consulta.execution_options(yield_per=LOTE_LEITURA))
+    for lote in resultado.partitions():
+        total += len(lote)
+        if minimo is None:
+            continue
+
+        ids = [linha[0] for linha in lote]
+        acertos = contar_acertos([linha[1] for linha in lote], sorteados)
+        if np is not None:
+            for indice in np.flatnonzero(acertos >= minimo):
+                premiados.append((ids[indice], int(acertos[indice])))
+        else:
+            premiados.extend((ids[indice], quantidade) for indice, quantidade in enumerate(acertos)
+                             if quantidade >= minimo)
+
+    return total, premiados
+
+
+def apurar_modalidade(sorteio, modalidade, numeros_sorteados=None):
+    """Sorteia os números da modalidade, apura todos os bilhetes do sorteio e paga os prêmios.
+
+    Os bilhetes ativos de (sorteio, modalidade) são lidos em lotes só com id
+    e bitset, os acertos de cada lote são contados de forma vetorizada e cada
+    contagem é mapeada para a faixa de Premiacao correspondente. Os bilhetes
+    premiados recebem acertos, faixa e prêmio; os demais viram perdedores com
+    um único UPDATE, e os prêmios são creditados com um UPDATE agregado por
+    usuário. Tudo em uma transação, registrada em resultados_modalidades.
+
+    Retorna um resumo com o tempo (ms) de cada fase, ou None se a modalidade
+    já foi apurada neste sorteio.
+    """
+    if db.session.get(ResultadoModalidade, (sorteio.id, modalidade.id)) is not None:
+        return None
+
+    cronometro = Cronometro()
+    quantidade = modalidade.quantidade_numeros or (len(numeros_sorteados) if numeros_sorteados else None)
+    if not quantidade:
+        raise ValueError(f'A modalidade {modalidade.nome} não define quantos números tem cada bilhete')
+
+    sorteados = sorted(numeros_sorteados) if numeros_sorteados else sortear_numeros(quantidade)
+    faixas = faixas_premiacao(modalidade, quantidade)
+    cronometro.fase('preparar')
+
+    filtro = db.and_(
+        ApostaModalidade.sorteio_id == sorteio.id,
+        ApostaModalidade.modalidade_id == modalidade.id,
+        ApostaModalidade.status == 'ativa'
+    )
+
+    # Fase 1: contagem dos acertos de todos os bilhetes
+    total_bilhetes, premiados = _premiados(
+        db.select(ApostaModalidade.id, ApostaModalidade.numeros).where(filtro), sorteados, faixas
+    )
+    cronometro.fase('contar_acertos')
+
+    # Fase 2: grava acertos, faixa e prêmio dos premiados
+    total_premios = 0.0
+    if premiados:
+        tabela = ApostaModalidade.__table__
+        # Cada contagem de acertos cai na maior faixa que ela alcança
+        faixa_dos_acertos = {
+            acertos: faixas[max(faixa for faixa in faixas if faixa <= acertos)]
+            for acertos in range(min(faixas), len(sorteados) + 1)
+        }
+        linhas = []
+        for aposta_id, acertos in premiados:
+            premiacao = faixa_dos_acertos[acertos]
+            total_premios += premiacao.valor
+            linhas.append({
+                'b_id': aposta_id, 'b_acertos': acertos,
+                'b_premiacao_id': premiacao.id, 'b_premio': premiacao.valor
+            })
+        db.session.execute(
+            db.update(tabela).where(tabela.c.id == db.bindparam('b_id')).values(
+                status='ganhadora', acertos=db.bindparam('b_acertos'),
+                premiacao_id=db.bindparam('b_premiacao_id'), premio=db.bindparam('b_premio')
+            ),
+            linhas
+        )
+    cronometro.fase('marcar_ganhadoras')
+
+    # Fase 3: todos os outros bilhetes ativos perderam
+    db.session.execute(
+        db.update(ApostaModalidade)
+        .where(filtro)
+        .values(status='perdedora')
+        .execution_options(synchronize_session=False)
+    )
+    cronometro.fase('marcar_perdedoras')
+
+    # Fase 4: credita a soma dos prêmios de cada usuário
+    if premiados:
+        ganhadores = (
+            db.select(ApostaModalidade.user_id, db.func.sum(ApostaModalidade.premio).label('valor'))
+            .where(
+                ApostaModalidade.sorteio_id == sorteio.id,
+                ApostaModalidade.modalidade_id == modalidade.id,
+                ApostaModalidade.status == 'ganhadora'
+            )
+            .group_by(ApostaModalidade.user_id)
+            .subquery()
+        )
+        creditar_por_usuario(
+            ganhadores, sorteio, f'Prêmio {modalidade.nome} do sorteio de {sorteio.data_sorteio.isoformat()}'
+        )
+        somar_gerais(saldo_total_usuarios=total_premios)
+    cronometro.fase('creditar_premios')
+
+    db.session.add(ResultadoModalidade(
+        sorteio_id=sorteio.id,
+        modalidade_id=modalidade.id,
+        numeros_sorteados=json.dumps(sorteados),
+        total_bilhetes=total_bilhetes,
+        total_ganhadores=len(premiados),
+        total_premios=total_premios,
+        duracao_ms=cronometro.total()
+    ))
+    db.session.commit()
+    cronometro.fase('commit')
+
+    resumo = {
+        'sorteio_id': sorteio.id,
+        'modalidade_id': modalidade.id,
+        'numeros_sorteados': sorteados,
+        'total_bilhetes': total_bilhetes,
+        'total_ganhadores': len(premiados),
+        'total_premios': total_premios,
+        'tempos_ms': cronometro.tempos,
+        'tempo_total_ms': cronometro.total()
+    }
+
+    logger.info(
+        f"Modalidade {modalidade.nome} apurada no sorteio {sorteio.id} em {resumo['tempo_total_ms']} ms - "
+        f"{total_bilhetes} bilhetes, {len(premiados)} premiados - fases: {cronometro.tempos}"
+    )
+
+    return resumo
+
+
+def modalidades_pendentes(sorteio):
+    """Ids das modalidades com bilhetes ativos (ainda não apurados) no sorteio"""
+    return sorted(db.session.execute(
+        db.select(ApostaModalidade.modalidade_id)
+        .where(ApostaModalidade.sorteio_id == sorteio.id, ApostaModalidade.status == 'ativa')
+        .distinct()
+    ).scalars().all())
+
+
+def apurar_modalidades(sorteio):
+    """Apura todas as modalidades com bilhetes ativos no sorteio (uma transação por modalidade).
+
+    Modalidades já apuradas ficam de fora, então a chamada pode ser repetida
+    depois de uma execução interrompida. A falha de uma modalidade é desfeita
+    e registrada no log sem impedir as demais: seus bilhetes continuam ativos
+    e ela é apurada na próxima chamada. Retorna (resumos, falhas), com falhas
+    no formato {nome da modalidade: mensagem de erro}. Bilhetes de uma
+    modalidade que não existe mais ficam ativos e entram nas falhas.
+    """
+    resumos = []
+    falhas = {}
+    for modalidade_id in modalidades_pendentes(sorteio):
+        nome = str(modalidade_id)
+        try:
+            modalidade = db.session.get(Modalidade, modalidade_id)
+            if modalidade is None:
+                raise ValueError(f'Modalidade {modalidade_id} não encontrada')
+            nome = modalidade.nome
+            resumo = apurar_modalidade(sorteio, modalidade)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erro ao apurar a modalidade {nome} no sorteio {sorteio.id}: {str(e)}")
+            falhas[nome] = str(e)
+            continue
+        if resumo is not None:
+            resumos.append(resumo)
+    return resumos, falhas
@@ -0,0 +1,17 @@
+"""Entrada ASGI da aplicação: leituras públicas e transmissão (SSE) dos sorteios assíncronas, o resto pela aplicação Flask.
+
+Requer asgiref e o driver assíncrono do banco (aiosqlite ou asyncpg) além de
+um servidor ASGI, por exemplo:
+    pip install "flask[async]" aiosqlite uvicorn
+    uvicorn src.asgi:app --workers 1
+
+Sem o driver, as leituras são atendidas pelas views síncronas; a transmissão
+(/api/sorteios/stream) fica sempre no loop, pois só lê o banco ao abrir a conexão.
+"""
+from src.main import app as aplicacao_flask
+from src.services.leitura_assincrona import AplicacaoAsgi, leitor_sorteios
+from src.services.transmissao import transmissor_sorteios
+
+leitor_sorteios.init_app(aplicacao_flask)
+
+app = AplicacaoAsgi(aplicacao_flask, leitor_sorteios, transmissor_sorteios)
@@ -0,0 +1,135 @@
+from flask import g, session, jsonify
+from src.models.database import db
+from src.models.user import User
+from sqlalchemy import event
+from collections import OrderedDict, namedtuple
+from functools import wraps
+import threading
+import time
+
+# Dados mínimos para autorizar uma requisição sem consultar o banco
+IdentidadeUsuario = namedtuple('IdentidadeUsuario', ['id', 'ativo', 'is_admin'])
+
+
+class CacheIdentidades:
+    """Cache LRU limitado de identidades de usuários, compartilhado entre requisições.
+
+    As entradas expiram após ``ttl`` segundos, o que limita o atraso com que
+    mudanças feitas por outros processos são percebidas. Mudanças feitas neste
+    processo invalidam a entrada imediatamente.
+    """
+
+    def __init__(self, maximo=10000, ttl=60):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, user_id):
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is None:
+                return None
+
+            identidade, expira_em = entrada
+            if expira_em < time.monotonic():
+                del self._entradas[user_id]
+                return None
+
+            self._entradas.move_to_end(user_id)
+            return identidade
+
+    def guardar(self, identidade):
+        with self._lock:
+            self._entradas[identidade.id] = (identidade, time.monotonic() + self.ttl)
+            self._entradas.move_to_end(identidade.id)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._entradas.pop(user_id, None)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_identidades = CacheIdentidades()
+
+
+def _identidade_de(user):
+    return IdentidadeUsuario(id=user.id, ativo=bool(user.ativo), is_admin=bool(user.is_admin))
+
+
+def usuario_atual():
+    """Retorna o usuário da sessão, carregado no máximo uma vez por requisição"""
+    if '_usuario_atual' not in g:
+        user_id = session.get('user_id')
+        user = db.session.get(User, user_id) if user_id else None
+        if user is not None:
+            cache_identidades.guardar(_identidade_de(user))
+        g._usuario_atual = user
+    return g._usuario_atual
+
+
+def identidade_atual():
+    """Retorna a identidade do usuário da sessão, do cache sempre que possível"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+
+    identidade = cache_identidades.obter(user_id)
+    if identidade is None:
+        user = usuario_atual()
+        identidade = _identidade_de(user) if user else None
+    return identidade
+
+
+def invalidar_identidade(user_id):
+    """Descarta a identidade em cache após mudança de perfil, senha ou status"""
+    cache_identidades.invalidar(user_id)
+
+
+def login_obrigatorio(view):
+    """Decorator que exige um usuário autenticado e ativo.
+
+    Disponibiliza o id do usuário em ``g.usuario_id``; o objeto User completo
+    é obtido com usuario_atual(), que só consulta o banco uma vez por requisição.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        identidade = identidade_atual()
+        if not identidade:
+            return jsonify({'error': 'Usuário não autenticado'}), 401
+        if not identidade.ativo:
+            return jsonify({'error': 'Usuário inativo'}), 401
+
+        g.usuario_id = identidade.id
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def admin_obrigatorio(view):
+    """Decorator que exige um usuário ativo com o papel de administrador"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        identidade = identidade_atual()
+        if not identidade or not identidade.ativo or not identidade.is_admin:
+            return jsonify({'error': 'Acesso negado - Apenas administradores'}), 403
+
+        g.usuario_id = identidade.id
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# Atributos cuja mudança invalida a identidade em cache (saldo não entra)
+ATRIBUTOS_IDENTIDADE = ('ativo', 'is_admin', 'nome', 'email', 'telefone', 'password_hash')
+
+
+@event.listens_for(User, 'after_update')
+def _invalidar_ao_atualizar(mapper, connection, target):
+    """Atualizações de perfil, senha, status ou papel feitas pelo ORM invalidam o cache"""
+    estado = db.inspect(target)
+    if any(estado.attrs[nome].history.has_changes() for nome in ATRIBUTOS_IDENTIDADE):
+        invalidar_identidade(target.id)
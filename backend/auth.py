@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.database import db
 from src.models.user import User
+from src.services.autenticacao import login_obrigatorio, usuario_atual
+from src.services.carteira import registrar_saldo_inicial
+from src.services.senhas import servico_senhas, ServicoSenhasOcupado
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -18,15 +21,19 @@ def register():
         if User.query.filter_by(email=data['email']).first():
             return jsonify({'error': 'Email já cadastrado'}), 400
         
-        # Cria o novo usuário
+        # Cria o novo usuário; o hash roda no pool de senhas, como no login
         user = User(
             nome=data['nome'],
             email=data['email'],
             telefone=data['telefone'],
-            password=data['password']
+            password_hash=servico_senhas.gerar_hash(data['password'])
         )
         
         db.session.add(user)
+        db.session.flush()
+        
+        # Abre o extrato com o saldo inicial
+        registrar_saldo_inicial(user)
         db.session.commit()
         
         # Salva o usuário na sessão
@@ -37,6 +44,9 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except ServicoSenhasOcupado:
+        db.session.rollback()
+        return jsonify({'error': 'Muitos cadastros simultâneos, tente novamente'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -52,12 +62,18 @@ def login():
         
         user = User.query.filter_by(email=data['email']).first()
         
-        if not user or not user.check_password(data['password']):
+        # A verificação roda no pool de senhas, que limita quantas rodam ao mesmo tempo
+        if not user or not servico_senhas.verificar(user.password_hash, data['password']):
             return jsonify({'error': 'Email ou senha incorretos'}), 401
         
         if not user.ativo:
             return jsonify({'error': 'Usuário inativo'}), 401
         
+        # Hash de uma política anterior: refeito agora que a senha é conhecida
+        if servico_senhas.precisa_rehash(user.password_hash):
+            user.password_hash = servico_senhas.gerar_hash(data['password'])
+            db.session.commit()
+        
         # Salva o usuário na sessão
         session['user_id'] = user.id
         
@@ -66,6 +82,8 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except ServicoSenhasOcupado:
+        return jsonify({'error': 'Muitos logins simultâneos, tente novamente'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -76,18 +94,11 @@ def logout():
     return jsonify({'message': 'Logout realizado com sucesso'}), 200
 
 @auth_bp.route('/me', methods=['GET'])
+@login_obrigatorio
 def get_current_user():
     """Retorna os dados do usuário logado"""
     try:
-        user_id = session.get('user_id')
-        
-        if not user_id:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
-        
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'Usuário não encontrado'}), 404
+        user = usuario_atual()
         
         return jsonify({'user': user.to_dict()}), 200
         
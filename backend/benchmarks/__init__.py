@@ -0,0 +1 @@
+# Benchmarks do sistema de bilhetes 2 pra 500
@@ -0,0 +1,156 @@
+"""Benchmark da apuração de bilhetes de modalidades (vários números por bilhete).
+
+Cria um banco SQLite temporário com --bilhetes bilhetes aleatórios de
+--numeros números em um sorteio e apura a modalidade com a contagem
+vetorizada (NumPy) e com a contagem em Python puro, sempre com os mesmos
+números sorteados. Para cada modo, informa bilhetes/s só da contagem dos
+acertos e da apuração completa (leitura, contagem, gravação e créditos), com
+o tempo de cada fase. Os dois modos precisam chegar aos mesmos ganhadores.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.apuracao_modalidades --bilhetes 1000000 --saida modalidades.json
+    python -m benchmarks.apuracao_modalidades --bilhetes 200000 --numeros 5 --modos numpy
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+from src.models.database import db
+from src.models.user import User
+from src.models.sorteio import Sorteio
+from src.models.bitset_numeros import BitsetNumeros
+from src.models.modalidade import Modalidade, Premiacao, ApostaModalidade, ResultadoModalidade
+from src.services import apuracao_modalidades
+from benchmarks.carga_api import criar_app
+
+LOTE_INSERCAO = 50000
+
+
+def semear(total_bilhetes, numeros, usuarios, semente):
+    """Insere usuários, o sorteio, a modalidade com uma faixa por acertos e os bilhetes"""
+    rnd = random.Random(semente)
+    db.session.execute(db.insert(User.__table__), [
+        {'nome': f'Usuário {i}', 'email': f'u{i}@benchmark', 'telefone': '0', 'password_hash': '-'}
+        for i in range(usuarios)
+    ])
+    sorteio = Sorteio(date.today())
+    sorteio.status = 'sorteado'
+    modalidade = Modalidade(nome=f'{numeros} números', descricao='benchmark', cor='azul',
+                            quantidade_numeros=numeros)
+    db.session.add_all([sorteio, modalidade])
+    db.session.flush()
+    db.session.add_all([
+        Premiacao(modalidade_id=modalidade.id, posicao=f'{numeros - acertos + 1}º Prêmio',
+                  valor=float(10 ** acertos), acertos=acertos)
+        for acertos in range(numeros, max(0, numeros - 3), -1)
+    ])
+
+    populacao = range(1, apuracao_modalidades.NUMERO_MAXIMO + 1)
+    for inicio in range(0, total_bilhetes, LOTE_INSERCAO):
+        db.session.execute(db.insert(ApostaModalidade.__table__), [
+            {
+                'user_id': rnd.randint(1, usuarios),
+                'sorteio_id': sorteio.id,
+                'modalidade_id': modalidade.id,
+                'numeros': BitsetNumeros(rnd.sample(populacao, numeros)).para_bytes(),
+                'valor': 2.0,
+                'status': 'ativa',
+            }
+            for _ in range(inicio, min(inicio + LOTE_INSERCAO, total_bilhetes))
+        ])
+    db.session.commit()
+    return sorteio.id, modalidade.id
+
+
+def reabrir(sorteio_id, modalidade_id):
+    """Desfaz a apuração para medir o próximo modo sobre os mesmos bilhetes"""
+    db.session.execute(
+        db.update(ApostaModalidade)
+        .where(ApostaModalidade.sorteio_id == sorteio_id, ApostaModalidade.modalidade_id == modalidade_id)
+        .values(status='ativa', acertos=None, premiacao_id=None, premio=0)
+    )
+    db.session.execute(db.delete(ResultadoModalidade).where(ResultadoModalidade.sorteio_id == sorteio_id))
+    db.session.commit()
+
+
+def medir(modo, sorteio_id, modalidade_id, sorteados, total_bilhetes):
+    numpy = apuracao_modalidades.np
+    if modo == 'python':
+        apuracao_modalidades.np = None
+    try:
+        bitsets = [bits for bits, in db.session.execute(
+            db.select(ApostaModalidade.numeros).where(ApostaModalidade.sorteio_id == sorteio_id)
+        )]
+        inicio = time.perf_counter()
+        apuracao_modalidades.contar_acertos(bitsets, sorteados)
+        contagem = time.perf_counter() - inicio
+        del bitsets
+
+        resumo = apuracao_modalidades.apurar_modalidade(
+            db.session.get(Sorteio, sorteio_id), db.session.get(Modalidade, modalidade_id), sorteados
+        )
+    finally:
+        apuracao_modalidades.np = numpy
+    db.session.remove()
+
+    return {
+        'modo': modo,
+        'bilhetes_por_segundo_contagem': round(total_bilhetes / contagem),
+        'bilhetes_por_segundo_apuracao': round(total_bilhetes / (resumo['tempo_total_ms'] / 1000)),
+        'total_ganhadores': resumo['total_ganhadores'],
+        'total_premios': resumo['total_premios'],
+        'tempos_ms': resumo['tempos_ms'],
+        'tempo_total_ms': resumo['tempo_total_ms'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bilhetes', type=int, default=1000000)
+    parser.add_argument('--numeros', type=int, default=5, help='Números por bilhete (e sorteados)')
+    parser.add_argument('--usuarios', type=int, default=20000)
+    parser.add_argument('--modos', default='numpy,python', help='Modos medidos, separados por vírgula')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help='Arquivo JSON para gravar os resultados')
+    args = parser.parse_args()
+
+    modos = [modo.strip() for modo in args.modos.split(',') if modo.strip()]
+    if 'numpy' in modos and apuracao_modalidades.np is None:
+        parser.error('NumPy não está instalado; use --modos python')
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app(f"sqlite:///{os.path.join(diretorio, 'modalidades.db')}", 'sqlite')
+        with app.app_context():
+            inicio = time.perf_counter()
+            sorteio_id, modalidade_id = semear(args.bilhetes, args.numeros, args.usuarios, args.semente)
+            print(f'{args.bilhetes} bilhetes semeados em {time.perf_counter() - inicio:.1f} s')
+
+            sorteados = apuracao_modalidades.sortear_numeros(args.numeros, random.Random(args.semente + 1))
+            for modo in modos:
+                reabrir(sorteio_id, modalidade_id)
+                resultados.append(medir(modo, sorteio_id, modalidade_id, sorteados, args.bilhetes))
+            db.engine.dispose()
+
+    if len({(medicao['total_ganhadores'], medicao['total_premios']) for medicao in resultados}) > 1:
+        raise SystemExit('os modos chegaram a ganhadores diferentes')
+
+    print(f"{'modo':<8}{'contagem/s':>14}{'apuração/s':>14}{'total':>12}{'ganhadores':>12}")
+    for medicao in resultados:
+        print(f"{medicao['modo']:<8}{medicao['bilhetes_por_segundo_contagem']:>14}"
+              f"{medicao['bilhetes_por_segundo_apuracao']:>14}{medicao['tempo_total_ms']:>10.1f}ms"
+              f"{medicao['total_ganhadores']:>12}")
+        print(f"{'':<8}fases: {medicao['tempos_ms']}")
+
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump({'parametros': vars(args), 'numeros_sorteados': sorteados, 'resultados': resultados},
+                      arquivo, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""Benchmark de carga e latência da API de apostas, com resultados em JSON.
+
+Semeia um banco com o volume pedido (usuários, sorteios anteriores e apostas
+por sorteio), registra os blueprints reais e dispara usuários virtuais
+concorrentes pelo test client do Flask: cada um se cadastra, faz login,
+deposita, compra números e consulta o sorteio. Reporta p50/p95/p99 por
+endpoint e a vazão total. Em seguida mede o tempo de parede do sorteio e da
+liquidação de sorteios com os tamanhos de --liquidacao.
+
+O JSON traz o commit e as versões usadas, para comparar execuções entre
+commits (mesma --semente, mesmos parâmetros).
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.carga_api --usuarios-virtuais 16 --iteracoes 50 --saida carga.json
+    python -m benchmarks.carga_api --liquidacao 10000,100000,1000000 --saida carga.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+import sqlalchemy
+from flask import Flask
+from src.models.database import db, init_db
+from src.models.user import User
+from src.models.aposta import Aposta
+from src.models.sorteio import Sorteio
+from src.models.contagem_numeros import reconstruir_contagens
+from src.models.numeros_usuario_sorteio import reconstruir_numeros_apostados
+from src.models.estatisticas import reconstruir_estatisticas
+from src.services.liquidacao import liquidar_sorteio
+
+LOTE_INSERCAO = 50000
+VALOR_APOSTA = 2.0
+
+
+def criar_app(url, perfil):
+    """Aplicação com os blueprints da API, sem scheduler nem arquivos estáticos"""
+    from src.routes.auth import auth_bp
+    from src.routes.user import user_bp
+    from src.routes.apostas import apostas_bp
+    from src.routes.sorteios import sorteios_bp
+    from src.routes.admin import admin_bp
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark'
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['BANCO_PERFIL'] = perfil
+    init_db(app)
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(user_bp, url_prefix='/api/user')
+    app.register_blueprint(apostas_bp, url_prefix='/api/apostas')
+    app.register_blueprint(sorteios_bp, url_prefix='/api/sorteios')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    return app
+
+
+# Carga inicial
+
+def semear(total_usuarios, total_sorteios, apostas_por_sorteio, semente):
+    """Insere usuários, sorteios finalizados anteriores e o sorteio aberto de hoje.
+
+    Cada sorteio recebe ``apostas_por_sorteio`` pares (usuário, número)
+    distintos. Contadores, bitsets e estatísticas derivados são reconstruídos
+    ao final, como após uma importação. Retorna o id do sorteio aberto.
+    """
+    if apostas_por_sorteio > total_usuarios * 500:
+        raise ValueError('poucos usuários para o número de apostas por sorteio')
+
+    rnd = random.Random(semente)
+    hoje = date.today()
+
+    for inicio in range(0, total_usuarios, LOTE_INSERCAO):
+        db.session.execute(db.insert(User.__table__), [
+            {
+                'nome': f'Usuário {i}',
+                'email': f'semeado{i}@benchmark',
+                'telefone': '0',
+                'password_hash': 'x',
+                'saldo': 0.0,
+            }
+            for i in range(inicio, min(inicio + LOTE_INSERCAO, total_usuarios))
+        ])
+
+    sorteio_aberto = None
+    for indice in range(total_sorteios):
+        aberto = indice == total_sorteios - 1
+        numero_sorteado = None if aberto else rnd.randint(1, 500)
+        sorteio = Sorteio(data_sorteio=hoje - timedelta(days=total_sorteios - 1 - indice))
+        db.session.add(sorteio)
+        db.session.flush()
+
+        ganhadoras = 0
+        lote = []
+        for chave in rnd.sample(range(total_usuarios * 500), apostas_por_sorteio):
+            numero = chave % 500 + 1
+            if numero == numero_sorteado:
+                ganhadoras += 1
+            lote.append({
+                'user_id': chave // 500 + 1,
+                'sorteio_id': sorteio.id,
+                'numero_escolhido': numero,
+                'valor_aposta': VALOR_APOSTA,
+                'status': 'ativa' if aberto else ('ganhadora' if numero == numero_sorteado else 'perdedora'),
+            })
+            if len(lote) >= LOTE_INSERCAO:
+                db.session.execute(db.insert(Aposta.__table__), lote)
+                lote = []
+        if lote:
+            db.session.execute(db.insert(Aposta.__table__), lote)
+
+        sorteio.total_apostas = apostas_por_sorteio
+        sorteio.total_arrecadado = VALOR_APOSTA * apostas_por_sorteio
+        if aberto:
+            sorteio_aberto = sorteio.id
+        else:
+            sorteio.status = 'finalizado'
+            sorteio.numero_sorteado = numero_sorteado
+            sorteio.data_sorteio_realizado = datetime.utcnow()
+            sorteio.premio_total = sorteio.total_arrecadado * 0.9
+            sorteio.total_ganhadores = ganhadoras
+            sorteio.premio_por_ganhador = sorteio.premio_total / ganhadoras if ganhadoras else 0.0
+
+    db.session.commit()
+
+    reconstruir_contagens()
+    reconstruir_numeros_apostados()
+    reconstruir_estatisticas()
+    db.session.commit()
+    return sorteio_aberto
+
+
+# Usuários virtuais
+
+class Registro:
+    """Latências (ms) e status por endpoint, compartilhados entre as threads"""
+
+    def __init__(self):
+        self._tempos = defaultdict(list)
+        self._status = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def anotar(self, endpoint, ms, status):
+        with self._lock:
+            self._tempos[endpoint].append(ms)
+            self._status[endpoint][status] += 1
+
+    def resumo(self):
+        return {
+            endpoint: {
+                'requisicoes': len(tempos),
+                'media_ms': round(statistics.mean(tempos), 3),
+                **percentis(tempos),
+                'status': dict(self._status[endpoint]),
+            }
+            for endpoint, tempos in sorted(self._tempos.items())
+        }
+
+    @property
+    def total(self):
+        return sum(len(tempos) for tempos in self._tempos.values())
+
+
+def percentis(tempos):
+    ordenados = sorted(tempos)
+    return {
+        f'p{q}_ms': round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * q / 100))], 3)
+        for q in (50, 95, 99)
+    }
+
+
+def usuario_virtual(app, indice, iteracoes, tamanho_lote, semente, registro):
+    """Sessão de um usuário: cadastro, login, depósito e ciclos de compra e consulta"""
+    rnd = random.Random(semente * 1000 + indice)
+    cliente = app.test_client()
+
+    def chamar(endpoint, metodo, url, **kwargs):
+        inicio = time.perf_counter()
+        resposta = getattr(cliente, metodo)(url, **kwargs)
+        registro.anotar(endpoint, (time.perf_counter() - inicio) * 1000, resposta.status_code)
+        return resposta
+
+    email = f'virtual{indice}@benchmark'
+    chamar('auth.register', 'post', '/api/auth/register', json={
+        'nome': f'Virtual {indice}', 'email': email, 'telefone': '0', 'password': 'senha-benchmark'
+    })
+    chamar('auth.login', 'post', '/api/auth/login', json={'email': email, 'password': 'senha-benchmark'})
+    chamar('user.adicionar_saldo', 'post', '/api/user/adicionar-saldo', json={
+        'valor': VALOR_APOSTA * iteracoes * (1 + tamanho_lote)
+    })
+
+    for iteracao in range(iteracoes):
+        chamar('sorteios.sorteio_atual', 'get', '/api/sorteios/sorteio-atual')
+        chamar('apostas.numeros_disponiveis', 'get', '/api/apostas/numeros-disponiveis')
+        chamar('apostas.fazer_aposta', 'post', '/api/apostas/fazer-aposta', json={'numero': rnd.randint(1, 500)})
+
+        if iteracao % 5 == 0:
+            chamar('apostas.fazer_apostas_lote', 'post', '/api/apostas/fazer-apostas-lote', json={
+                'numeros': rnd.sample(range(1, 501), tamanho_lote)
+            })
+            chamar('apostas.minhas_apostas', 'get', '/api/apostas/minhas-apostas')
+            chamar('user.get_saldo', 'get', '/api/user/saldo')
+            chamar('sorteios.historico_sorteios', 'get', '/api/sorteios/historico')
+
+
+def medir_carga(app, usuarios_virtuais, iteracoes, tamanho_lote, semente):
+    registro = Registro()
+    threads = [
+        threading.Thread(
+            target=usuario_virtual, args=(app, indice, iteracoes, tamanho_lote, semente, registro)
+        )
+        for indice in range(usuarios_virtuais)
+    ]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    return {
+        'duracao_s': round(duracao, 3),
+        'requisicoes': registro.total,
+        'requisicoes_por_segundo': round(registro.total / duracao, 1),
+        'endpoints': registro.resumo(),
+    }
+
+
+# Liquidação
+
+def medir_liquidacao(diretorio, perfil, total_apostas, semente):
+    """Tempo de parede do sorteio e da liquidação de um sorteio com ``total_apostas``"""
+    caminho = os.path.join(diretorio, f'liquidacao-{total_apostas}.db')
+    app = criar_app(f'sqlite:///{caminho}', perfil)
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        sorteio_id = semear(max(100, total_apostas // 100), 1, total_apostas, semente)
+        tempo_carga = time.perf_counter() - inicio
+
+        sorteio = db.session.get(Sorteio, sorteio_id)
+        inicio = time.perf_counter()
+        sorteio.realizar_sorteio()
+        tempo_sorteio = time.perf_counter() - inicio
+
+        resumo = liquidar_sorteio(sorteio)
+        tempo_total = time.perf_counter() - inicio
+        db.session.remove()
+        db.engine.dispose()
+
+    os.remove(caminho)
+    return {
+        'tempo_carga_s': round(tempo_carga, 2),
+        'sorteio_ms': round(tempo_sorteio * 1000, 3),
+        'liquidacao_ms': resumo['tempo_total_ms'],
+        'fases_ms': resumo['tempos_ms'],
+        'total_ms': round(tempo_total * 1000, 3),
+        'total_ganhadores': resumo['total_ganhadores'],
+    }
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.realpath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=2000, help='Usuários semeados')
+    parser.add_argument('--sorteios', type=int, default=30, help='Sorteios semeados (o último fica aberto)')
+    parser.add_argument('--apostas-por-sorteio', type=int, default=20000)
+    parser.add_argument('--usuarios-virtuais', type=int, default=16)
+    parser.add_argument('--iteracoes', type=int, default=50, help='Ciclos de compra e consulta por usuário virtual')
+    parser.add_argument('--tamanho-lote', type=int, default=5, help='Números por compra em lote')
+    parser.add_argument('--liquidacao', default='10000,100000',
+                        help='Tamanhos de sorteio (apostas) para medir a liquidação, separados por vírgula')
+    parser.add_argument('--perfil', default='sqlite', help='Perfil de engine (database.PERFIS_BANCO)')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help='Arquivo JSON para gravar os resultados')
+    args = parser.parse_args()
+
+    tamanhos = [int(tamanho) for tamanho in args.liquidacao.split(',') if tamanho.strip()]
+
+    relatorio = {
+        'commit': commit_atual(),
+        'ambiente': {
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'sqlite': sqlite3.sqlite_version,
+        },
+        'parametros': vars(args),
+    }
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app(f"sqlite:///{os.path.join(diretorio, 'carga.db')}", args.perfil)
+        with app.app_context():
+            inicio = time.perf_counter()
+            semear(args.usuarios, args.sorteios, args.apostas_por_sorteio, args.semente)
+            relatorio['tempo_carga_s'] = round(time.perf_counter() - inicio, 2)
+            db.session.remove()
+
+        relatorio['carga'] = medir_carga(
+            app, args.usuarios_virtuais, args.iteracoes, args.tamanho_lote, args.semente
+        )
+        with app.app_context():
+            db.engine.dispose()
+
+        relatorio['liquidacao'] = {
+            str(tamanho): medir_liquidacao(diretorio, args.perfil, tamanho, args.semente)
+            for tamanho in tamanhos
+        }
+
+    carga = relatorio['carga']
+    print(f"Carga: {relatorio['tempo_carga_s']} s | {carga['requisicoes']} requisições em "
+          f"{carga['duracao_s']} s ({carga['requisicoes_por_segundo']} req/s)")
+    print(f"{'endpoint':<32}{'req':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for endpoint, dados in carga['endpoints'].items():
+        print(f"{endpoint:<32}{dados['requisicoes']:>7}"
+              f"{dados['p50_ms']:>8.2f}ms{dados['p95_ms']:>8.2f}ms{dados['p99_ms']:>8.2f}ms")
+    for tamanho, dados in relatorio['liquidacao'].items():
+        print(f"Liquidação de {tamanho} apostas: sorteio {dados['sorteio_ms']} ms + "
+              f"liquidação {dados['liquidacao_ms']} ms ({dados['total_ganhadores']} ganhadores)")
+
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Benchmark das consultas quentes de apostas e sorteios antes e depois da migração 1.
+
+Cria um banco SQLite temporário com o volume pedido de apostas, remove os índices
+da migração 1 (simulando um banco antigo), mede as consultas usadas pelas rotas,
+aplica as migrações e mede novamente.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.indices_apostas --apostas 1000000 --saida indices.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+from src.models.database import db, init_db
+from src.models.user import User  # tabela users, referenciada por apostas
+from src.models.aposta import Aposta
+from src.models.sorteio import Sorteio
+from src.models.migracoes import VersaoSchema, aplicar_migracoes
+
+INDICES_MIGRACAO_1 = [
+    'uq_apostas_user_sorteio_numero',
+    'ix_apostas_sorteio_numero',
+    'ix_apostas_user_data',
+    'ix_sorteios_status_data',
+]
+
+LOTE_INSERCAO = 50000
+
+
+def criar_app(caminho_banco):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{caminho_banco}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # As apostas sintéticas não têm usuários cadastrados; sem foreign_keys=ON
+    app.config['BANCO_PERFIL'] = 'sqlite-padrao'
+    init_db(app)
+    return app
+
+
+def popular(total_apostas, total_usuarios, total_sorteios, semente):
+    """Insere sorteios e apostas únicas por (usuário, sorteio, número)"""
+    rnd = random.Random(semente)
+    hoje = date.today()
+
+    sorteios = [
+        {
+            'id': i + 1,
+            'data_sorteio': hoje - timedelta(days=total_sorteios - i - 1),
+            'status': 'aberto' if i == total_sorteios - 1 else 'finalizado',
+            'total_arrecadado': 0.0,
+            'premio_total': 0.0,
+            'data_criacao': datetime.utcnow(),
+        }
+        for i in range(total_sorteios)
+    ]
+    db.session.execute(db.insert(Sorteio.__table__), sorteios)
+
+    vistas = set()
+    lote = []
+    inicio = datetime.utcnow() - timedelta(days=total_sorteios)
+    while len(vistas) < total_apostas:
+        chave = (
+            rnd.randint(1, total_usuarios),
+            rnd.randint(1, total_sorteios),
+            rnd.randint(1, 500),
+        )
+        if chave in vistas:
+            continue
+        vistas.add(chave)
+        lote.append({
+            'user_id': chave[0],
+            'sorteio_id': chave[1],
+            'numero_escolhido': chave[2],
+            'valor_aposta': 2.0,
+            'data_aposta': inicio + timedelta(seconds=len(vistas)),
+            'status': 'ativa',
+        })
+        if len(lote) >= LOTE_INSERCAO:
+            db.session.execute(db.insert(Aposta.__table__), lote)
+            lote = []
+    if lote:
+        db.session.execute(db.insert(Aposta.__table__), lote)
+    db.session.commit()
+
+
+def remover_indices_migracao():
+    """Volta o banco ao estado anterior à migração 1"""
+    for nome in INDICES_MIGRACAO_1:
+        db.session.execute(db.text(f'DROP INDEX IF EXISTS {nome}'))
+    db.session.query(VersaoSchema).filter(VersaoSchema.versao == 1).delete()
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def consultas(total_usuarios, total_sorteios):
+    """Consultas equivalentes às das rotas, com parâmetros sorteados"""
+    return {
+        'duplicada_fazer_aposta': lambda r: Aposta.query.filter_by(
+            user_id=r.randint(1, total_usuarios),
+            sorteio_id=r.randint(1, total_sorteios),
+            numero_escolhido=r.randint(1, 500)
+        ).first(),
+        'ganhadoras_sorteio': lambda r: Aposta.query.filter_by(
+            sorteio_id=r.randint(1, total_sorteios),
+            numero_escolhido=r.randint(1, 500)
+        ).all(),
+        'minhas_apostas_pagina': lambda r: Aposta.query.filter_by(
+            user_id=r.randint(1, total_usuarios)
+        ).order_by(Aposta.data_aposta.desc()).limit(10).all(),
+        'historico_sorteios_pagina': lambda r: Sorteio.query.filter(
+            Sorteio.status.in_(['sorteado', 'finalizado'])
+        ).order_by(Sorteio.data_sorteio.desc()).limit(10).all(),
+    }
+
+
+def medir(funcoes, repeticoes, semente):
+    resultados = {}
+    for nome, funcao in funcoes.items():
+        # Sequência distinta da usada na carga, para não favorecer as primeiras linhas
+        rnd = random.Random(semente + 1)
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao(rnd)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            db.session.expunge_all()
+        tempos.sort()
+        resultados[nome] = {
+            'media_ms': round(statistics.mean(tempos), 4),
+            'p50_ms': round(tempos[len(tempos) // 2], 4),
+            'p95_ms': round(tempos[int(len(tempos) * 0.95) - 1], 4),
+        }
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apostas', type=int, default=1_000_000)
+    parser.add_argument('--usuarios', type=int, default=20_000)
+    parser.add_argument('--sorteios', type=int, default=60)
+    parser.add_argument('--repeticoes', type=int, default=200)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help='Arquivo JSON para gravar os resultados')
+    args = parser.parse_args()
+
+    capacidade = args.usuarios * args.sorteios * 500
+    if args.apostas > capacidade // 2:
+        parser.error('poucos usuários/sorteios para o número de apostas pedido')
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app(os.path.join(diretorio, 'benchmark.db'))
+        with app.app_context():
+            inicio = time.perf_counter()
+            remover_indices_migracao()
+            popular(args.apostas, args.usuarios, args.sorteios, args.semente)
+            tempo_carga = time.perf_counter() - inicio
+
+            funcoes = consultas(args.usuarios, args.sorteios)
+            antes = medir(funcoes, args.repeticoes, args.semente)
+
+            inicio = time.perf_counter()
+            aplicar_migracoes()
+            tempo_migracao = time.perf_counter() - inicio
+
+            depois = medir(funcoes, args.repeticoes, args.semente)
+
+    relatorio = {
+        'parametros': vars(args),
+        'tempo_carga_s': round(tempo_carga, 2),
+        'tempo_migracao_s': round(tempo_migracao, 2),
+        'consultas': {
+            nome: {
+                'antes': antes[nome],
+                'depois': depois[nome],
+                'ganho_p50': round(antes[nome]['p50_ms'] / depois[nome]['p50_ms'], 1)
+                if depois[nome]['p50_ms'] else None,
+            }
+            for nome in antes
+        },
+    }
+
+    print(f"Carga: {relatorio['tempo_carga_s']} s | migração 1: {relatorio['tempo_migracao_s']} s")
+    print(f"{'consulta':<28}{'antes p50':>12}{'depois p50':>12}{'ganho':>9}")
+    for nome, dados in relatorio['consultas'].items():
+        print(f"{nome:<28}{dados['antes']['p50_ms']:>10.3f}ms{dados['depois']['p50_ms']:>10.3f}ms{dados['ganho_p50']:>8}x")
+
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
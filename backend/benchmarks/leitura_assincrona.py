@@ -0,0 +1,201 @@
+"""Benchmark de leitores simultâneos: views síncronas (WSGI) x leitor assíncrono (ASGI).
+
+Semeia um banco com sorteios finalizados e chama, em ciclo fechado, uma
+mistura de /sorteio-atual, /historico?page=N e /resultado/<id> com 8, 32, 128...
+clientes simultâneos. O modo síncrono simula um servidor WSGI com
+--threads-wsgi threads (as requisições excedentes esperam na fila, e essa
+espera entra na latência); o modo assíncrono chama a aplicação ASGI de asgi.py
+no mesmo loop dos clientes. Para cada modo, informa p50/p95/p99 e requisições
+por segundo por concorrência, e a maior concorrência atendida com p99 abaixo
+de --p99-alvo.
+
+Com --sem-cache, o cache de respostas é desligado e toda leitura vai ao banco.
+Com --url, mede outro banco (por exemplo Postgres com asyncpg) em vez de um
+SQLite temporário. Requer asgiref e o driver assíncrono do banco.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.leitura_assincrona --saida leitura.json
+    python -m benchmarks.leitura_assincrona --concorrencias 16,64,256 --sem-cache --p99-alvo 100
+    python -m benchmarks.leitura_assincrona --url postgresql://localhost/bilhetes_bench --perfil postgres
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+from src.models.database import db
+from src.models.sorteio import Sorteio
+from src.services.cache_respostas import BackendCache, cache_respostas
+from src.services.leitura_assincrona import AplicacaoAsgi, LeitorSorteiosAssincrono
+from benchmarks.carga_api import criar_app, semear, percentis
+
+
+class BackendNulo(BackendCache):
+    """Backend que nunca guarda nada (--sem-cache)"""
+
+    def obter(self, chave):
+        return None
+
+    def guardar(self, chave, corpo, imutavel=False):
+        pass
+
+    def apagar(self, chave):
+        pass
+
+    def limpar(self):
+        pass
+
+
+def urls_de_leitura(sorteios_finalizados, paginas):
+    urls = ['/api/sorteios/sorteio-atual']
+    urls += [f'/api/sorteios/historico?page={pagina}' for pagina in range(1, paginas + 1)]
+    urls += [f'/api/sorteios/resultado/{sorteio_id}' for sorteio_id in sorteios_finalizados]
+    return urls
+
+
+def chamar_wsgi(app, url):
+    caminho, _, query_string = url.partition('?')
+    corpo, status, _ = run_wsgi_app(app, EnvironBuilder(path=caminho, query_string=query_string).get_environ(),
+                                    buffered=True)
+    b''.join(corpo)
+    return int(status.split()[0])
+
+
+async def chamar_asgi(aplicacao, url):
+    caminho, _, query_string = url.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': caminho, 'raw_path': caminho.encode(), 'root_path': '',
+        'query_string': query_string.encode(), 'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(mensagem):
+        if mensagem['type'] == 'http.response.start':
+            status.append(mensagem['status'])
+
+    await aplicacao(scope, receive, send)
+    return status[0]
+
+
+async def medir(chamar, urls, concorrencia, duracao, semente):
+    """Ciclo fechado: ``concorrencia`` clientes chamando urls aleatórias por ``duracao`` segundos"""
+    tempos = []
+    erros = 0
+    fim = time.perf_counter() + duracao
+
+    async def cliente(indice):
+        nonlocal erros
+        rnd = random.Random(semente * 1000 + indice)
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            status = await chamar(rnd.choice(urls))
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            if status >= 400:
+                erros += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*[cliente(indice) for indice in range(concorrencia)])
+    decorrido = time.perf_counter() - inicio
+    return {
+        'concorrencia': concorrencia,
+        'requisicoes': len(tempos),
+        'erros': erros,
+        'requisicoes_por_segundo': round(len(tempos) / decorrido, 1),
+        **percentis(tempos),
+    }
+
+
+async def comparar(app, aplicacao_asgi, urls, concorrencias, threads_wsgi, duracao, semente):
+    loop = asyncio.get_running_loop()
+    resultados = {'sincrono': [], 'assincrono': []}
+
+    with ThreadPoolExecutor(max_workers=threads_wsgi, thread_name_prefix='wsgi') as servidor:
+        async def sincrono(url):
+            return await loop.run_in_executor(servidor, chamar_wsgi, app, url)
+
+        async def assincrono(url):
+            return await chamar_asgi(aplicacao_asgi, url)
+
+        # Aquece as conexões dos dois engines
+        await medir(sincrono, urls, threads_wsgi, 0.5, semente)
+        await medir(assincrono, urls, threads_wsgi, 0.5, semente)
+
+        for concorrencia in concorrencias:
+            resultados['sincrono'].append(await medir(sincrono, urls, concorrencia, duracao, semente))
+            resultados['assincrono'].append(await medir(assincrono, urls, concorrencia, duracao, semente))
+
+    await aplicacao_asgi.leitor.fechar()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=2000, help='Usuários semeados')
+    parser.add_argument('--sorteios', type=int, default=60, help='Sorteios semeados (o último fica aberto)')
+    parser.add_argument('--apostas-por-sorteio', type=int, default=2000)
+    parser.add_argument('--concorrencias', default='8,32,128,512', help='Clientes simultâneos, separados por vírgula')
+    parser.add_argument('--threads-wsgi', type=int, default=16, help='Threads do servidor WSGI simulado')
+    parser.add_argument('--duracao', type=float, default=5.0, help='Segundos de medição por concorrência e modo')
+    parser.add_argument('--p99-alvo', type=float, default=50.0, help='p99 (ms) aceitável')
+    parser.add_argument('--sem-cache', action='store_true', help='Desliga o cache de respostas')
+    parser.add_argument('--url', help='Banco de destino (vazio: SQLite temporário); é recriado e semeado')
+    parser.add_argument('--perfil', default='sqlite', help='Perfil de engine (database.PERFIS_BANCO)')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help='Arquivo JSON para gravar os resultados')
+    args = parser.parse_args()
+
+    concorrencias = [int(valor) for valor in args.concorrencias.split(',') if valor.strip()]
+    if args.sem_cache:
+        cache_respostas.configurar(BackendNulo())
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app(args.url or f"sqlite:///{os.path.join(diretorio, 'leitura.db')}", args.perfil)
+        with app.app_context():
+            if args.url:
+                db.drop_all()
+                db.create_all()
+            semear(args.usuarios, args.sorteios, args.apostas_por_sorteio, args.semente)
+            finalizados = [sorteio_id for sorteio_id, in db.session.query(Sorteio.id).filter_by(status='finalizado')]
+            db.session.remove()
+
+        leitor = LeitorSorteiosAssincrono(app)
+        if not leitor.disponivel:
+            parser.error('leitor assíncrono indisponível: instale aiosqlite (ou asyncpg)')
+
+        urls = urls_de_leitura(finalizados, max(1, len(finalizados) // 10))
+        resultados = asyncio.run(comparar(
+            app, AplicacaoAsgi(app, leitor), urls, concorrencias, args.threads_wsgi, args.duracao, args.semente
+        ))
+        with app.app_context():
+            db.engine.dispose()
+
+    relatorio = {'parametros': vars(args), 'resultados': resultados, 'maxima_concorrencia_no_alvo': {}}
+
+    print(f"{'modo':<12}{'clientes':>9}{'req/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'erros':>7}")
+    for modo, medicoes in resultados.items():
+        dentro = [medicao['concorrencia'] for medicao in medicoes if medicao['p99_ms'] <= args.p99_alvo]
+        relatorio['maxima_concorrencia_no_alvo'][modo] = max(dentro) if dentro else None
+        for medicao in medicoes:
+            print(f"{modo:<12}{medicao['concorrencia']:>9}{medicao['requisicoes_por_segundo']:>9}"
+                  f"{medicao['p50_ms']:>8.2f}ms{medicao['p95_ms']:>8.2f}ms{medicao['p99_ms']:>8.2f}ms"
+                  f"{medicao['erros']:>7}")
+    for modo, maxima in relatorio['maxima_concorrencia_no_alvo'].items():
+        print(f"{modo}: até {maxima if maxima is not None else '-'} clientes com p99 <= {args.p99_alvo} ms")
+
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Confere o orçamento de consultas SQL de cada rota (orcamento_consultas.ORCAMENTOS).
+
+Semeia um banco com vários sorteios e apostas, chama cada rota de auth, user,
+apostas, sorteios e admin pelo test client e conta as instruções SQL de cada
+chamada. As listagens são chamadas com páginas pequenas e grandes (e por
+cursor) e a compra em lote com carrinhos de tamanhos diferentes: o número de
+consultas não pode crescer com a página, e nenhuma chamada pode passar do
+orçamento. Um lazy load novo num serializador aparece aqui como falha.
+
+Sai com código 1 se algum orçamento for excedido ou se alguma rota não tiver
+orçamento declarado, listando as instruções executadas.
+
+As mesmas chamadas rodam como testes em tests/test_orcamento_consultas.py
+(python -m pytest tests), que falham quando um orçamento é excedido.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.orcamento_consultas
+    python -m benchmarks.orcamento_consultas --saida orcamentos.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from src.models.database import db
+from src.models.user import User
+from src.models.sorteio import Sorteio
+from src.services.cache_respostas import cache_respostas
+from src.services.orcamento_consultas import ContadorConsultas, ORCAMENTOS, orcamento_da_rota
+from src.services.scheduler import sorteio_scheduler
+from benchmarks.carga_api import criar_app, semear
+
+# Rotas fora da conferência
+ROTAS_IGNORADAS = {'static'}
+
+
+def chamadas(sorteio_finalizado_id):
+    """(endpoint, método, url, json, itens) de cada chamada, na ordem de execução.
+
+    As chamadas da mesma rota com parâmetros diferentes precisam caber no
+    mesmo orçamento; ``itens`` é o tamanho do carrinho na compra em lote, o
+    número de bilhetes criados no catálogo ou o de modalidades apuradas no sorteio.
+    """
+    listagens = [
+        ('apostas.minhas_apostas', '/api/apostas/minhas-apostas'),
+        ('user.historico_transacoes', '/api/user/historico-transacoes'),
+        ('sorteios.historico_sorteios', '/api/sorteios/historico'),
+        ('admin.listar_usuarios', '/api/admin/usuarios'),
+    ]
+    lista = [
+        ('auth.register', 'post', '/api/auth/register', {
+            'nome': 'Cadastro', 'email': 'cadastro@benchmark', 'telefone': '0', 'password': 'senha'
+        }, 0),
+        ('auth.login', 'post', '/api/auth/login', {'email': 'orcamento@benchmark', 'password': 'senha'}, 0),
+        ('auth.get_current_user', 'get', '/api/auth/me', None, 0),
+        ('user.get_perfil', 'get', '/api/user/perfil', None, 0),
+        ('user.update_perfil', 'put', '/api/user/perfil', {'nome': 'Orçamento', 'email': 'orcamento2@benchmark'}, 0),
+        ('user.alterar_senha', 'put', '/api/user/alterar-senha', {'senha_atual': 'senha', 'nova_senha': 'senha'}, 0),
+        ('user.get_saldo', 'get', '/api/user/saldo', None, 0),
+        ('user.adicionar_saldo', 'post', '/api/user/adicionar-saldo', {'valor': 1000}, 0),
+        ('apostas.fazer_aposta', 'post', '/api/apostas/fazer-aposta', {'numero': 500}, 0),
+        ('apostas.fazer_apostas_lote', 'post', '/api/apostas/fazer-apostas-lote', {'numeros': [1]}, 1),
+        ('apostas.fazer_apostas_lote', 'post', '/api/apostas/fazer-apostas-lote',
+         {'numeros': list(range(2, 102))}, 100),
+        ('apostas.estado_reserva', 'get', '/api/apostas/reservas/1', None, 0),
+        ('apostas.apostas_hoje', 'get', '/api/apostas/apostas-hoje', None, 0),
+        ('apostas.numeros_disponiveis', 'get', '/api/apostas/numeros-disponiveis', None, 0),
+        ('apostas.numeros_disponiveis', 'get', '/api/apostas/numeros-disponiveis?formato=bitset', None, 0),
+        ('sorteios.sorteio_atual', 'get', '/api/sorteios/sorteio-atual', None, 0),
+        ('sorteios.resultado_sorteio', 'get', f'/api/sorteios/resultado/{sorteio_finalizado_id}', None, 0),
+        ('sorteios.estatisticas', 'get', '/api/sorteios/estatisticas', None, 0),
+        ('admin.estatisticas_admin', 'get', '/api/admin/estatisticas-admin', None, 0),
+        ('admin.status_scheduler', 'get', '/api/admin/status-scheduler', None, 0),
+        ('admin.ajustar_saldo', 'post', '/api/admin/usuarios/1/ajuste-saldo',
+         {'valor': 10, 'descricao': 'Conferência de orçamento'}, 0),
+        ('admin.metricas', 'get', '/api/admin/metrics', None, 0),
+        ('sorteios.stream_sorteio', 'get', '/api/sorteios/stream', None, 0),
+    ]
+    for endpoint, url in listagens:
+        for parametros in ('per_page=5', 'per_page=100', 'paginacao=cursor&per_page=5', 'paginacao=cursor&per_page=100'):
+            lista.append((endpoint, 'get', f'{url}?{parametros}', None, 0))
+
+    # Catálogo de modalidades: escritas do admin e leituras servidas da memória
+    lista += [
+        ('admin.criar_modalidade', 'post', '/api/admin/modalidades', {
+            'nome': '2 pra 500', 'descricao': 'Escolha 2 números', 'cor': 'bg-blue-500', 'quantidade_numeros': 2
+        }, 0),
+        ('admin.criar_bilhetes', 'post', '/api/admin/modalidades/1/bilhetes',
+         {'bilhetes': [{'numeros': [12, 34], 'preco': 5.0}]}, 1),
+        ('admin.criar_bilhetes', 'post', '/api/admin/modalidades/1/bilhetes',
+         {'bilhetes': [{'numeros': [n, n + 1], 'preco': 5.0} for n in range(1, 100, 2)]}, 50),
+        ('admin.atualizar_bilhete', 'put', '/api/admin/bilhetes/1', {'numeros': [7, 21], 'preco': 6.0}, 0),
+        ('admin.criar_premiacao', 'post', '/api/admin/modalidades/1/premiacoes', {'posicao': '1º Prêmio', 'valor': 500.0}, 0),
+        ('admin.alterar_premiacao', 'put', '/api/admin/premiacoes/1', {'valor': 600.0}, 0),
+        ('admin.atualizar_modalidade', 'put', '/api/admin/modalidades/1', {'cor': 'bg-green-500'}, 0),
+        ('apostas.get_modalidades', 'get', '/api/apostas/modalidades', None, 0),
+        ('apostas.get_bilhetes_modalidade', 'get', '/api/apostas/modalidades/1/bilhetes', None, 0),
+        ('apostas.get_premiacoes_modalidade', 'get', '/api/apostas/modalidades/1/premiacoes', None, 0),
+        ('apostas.comprar_bilhete_modalidade', 'post', '/api/apostas/comprar-bilhete', {'bilhete_id': 1}, 0),
+        ('admin.alterar_premiacao', 'delete', '/api/admin/premiacoes/1', None, 0),
+    ]
+
+    # Por último: o sorteio muda o estado do sorteio aberto
+    lista += [
+        ('admin.parar_scheduler', 'post', '/api/admin/parar-scheduler', None, 0),
+        ('admin.reiniciar_scheduler', 'post', '/api/admin/reiniciar-scheduler', None, 0),
+        # Apura a modalidade do bilhete comprado acima
+        ('admin.executar_sorteio_manual', 'post', '/api/admin/executar-sorteio', {}, 1),
+        ('auth.logout', 'post', '/api/auth/logout', None, 0),
+    ]
+    return lista
+
+
+def preparar(app):
+    """Cadastra o administrador que faz as chamadas; retorna (cliente, id de um sorteio finalizado)"""
+    cliente = app.test_client()
+    cliente.post('/api/auth/register', json={
+        'nome': 'Orçamento', 'email': 'orcamento@benchmark', 'telefone': '0', 'password': 'senha'
+    })
+    with app.app_context():
+        user = User.query.filter_by(email='orcamento@benchmark').first()
+        user.is_admin = True
+        db.session.commit()
+        finalizado = Sorteio.query.filter_by(status='finalizado').order_by(Sorteio.id).first().id
+    return cliente, finalizado
+
+
+def chamar(app, cliente, endpoint, metodo, url, corpo, contador=ContadorConsultas):
+    """Faz a chamada dentro de ``contador()`` (um ContadorConsultas ou orcamento_consultas).
+
+    Retorna (resposta, contador). Com orcamento_consultas, o OrcamentoExcedido
+    sai daqui.
+    """
+    # O cache de respostas esconderia o custo de gerar a resposta
+    cache_respostas.backend.limpar()
+    with app.app_context():
+        with contador() as ativo:
+            # O corpo SSE não termina: conta só o que roda antes do primeiro evento
+            stream = endpoint == 'sorteios.stream_sorteio'
+            resposta = getattr(cliente, metodo)(url, json=corpo, buffered=not stream)
+            if stream:
+                resposta.close()
+    return resposta, ativo
+
+
+def conferir(app):
+    cliente, finalizado = preparar(app)
+
+    resultados = []
+    for endpoint, metodo, url, corpo, itens in chamadas(finalizado):
+        resposta, contador = chamar(app, cliente, endpoint, metodo, url, corpo)
+        resultados.append({
+            'endpoint': endpoint,
+            'chamada': f'{metodo.upper()} {url}',
+            'status': resposta.status_code,
+            'consultas': contador.total,
+            'orcamento': orcamento_da_rota(endpoint, itens),
+            'instrucoes': contador.instrucoes,
+        })
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--saida', help='Arquivo JSON para gravar as contagens')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app(f"sqlite:///{os.path.join(diretorio, 'orcamento.db')}", 'sqlite')
+        with app.app_context():
+            semear(200, 20, 2000, semente=42)
+        sorteio_scheduler.init_app(app)
+        try:
+            resultados = conferir(app)
+        finally:
+            sorteio_scheduler.parar_scheduler()
+            with app.app_context():
+                db.engine.dispose()
+
+    falhas = []
+    for resultado in resultados:
+        orcamento = resultado['orcamento']
+        excedido = orcamento is None or resultado['consultas'] > orcamento
+        erro = resultado['status'] >= 500
+        marca = 'FALHA' if excedido or erro else 'ok'
+        print(f"{marca:<6}{resultado['consultas']:>4} / {orcamento if orcamento is not None else '-':<4}"
+              f"{resultado['status']:>5}  {resultado['chamada']}")
+        if excedido or erro:
+            falhas.append(resultado)
+
+    rotas = {regra.endpoint for regra in app.url_map.iter_rules()} - ROTAS_IGNORADAS
+    sem_orcamento = sorted(rotas - set(ORCAMENTOS))
+    nao_conferidas = sorted(set(ORCAMENTOS) - {resultado['endpoint'] for resultado in resultados})
+    if sem_orcamento:
+        print(f'Rotas sem orçamento declarado: {", ".join(sem_orcamento)}')
+    if nao_conferidas:
+        print(f'Rotas com orçamento e sem chamada conferida: {", ".join(nao_conferidas)}')
+
+    for falha in falhas:
+        print(f"\n{falha['chamada']} ({falha['endpoint']}): {falha['consultas']} consultas, "
+              f"status {falha['status']}")
+        for indice, sql in enumerate(falha['instrucoes'], 1):
+            print(f'  {indice}. {sql[:200]}')
+
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(resultados, arquivo, indent=2, default=str)
+
+    if falhas or sem_orcamento:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
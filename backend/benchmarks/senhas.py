@@ -0,0 +1,173 @@
+"""Benchmark de logins por segundo por núcleo em cada política de hash de senha.
+
+Para cada política, mede a verificação de senha pelo ServicoSenhas com pools
+de 1 até --trabalhadores threads (logins/s e logins/s por núcleo usado) e,
+pelo test client, o login completo (rota auth.login) com --clientes usuários
+fazendo login ao mesmo tempo, junto com a latência de uma rota leve
+(sorteio-atual) chamada durante a rajada: é essa latência que o pool limitado
+protege.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.senhas --saida senhas.json
+    python -m benchmarks.senhas --politicas pbkdf2:sha256:600000,scrypt:32768:8:1 --trabalhadores 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+from src.models.database import db
+from src.models.user import User
+from src.services.senhas import ServicoSenhas, servico_senhas
+from benchmarks.carga_api import criar_app, percentis
+
+POLITICAS = 'pbkdf2:sha256:600000,pbkdf2:sha256:260000,scrypt:32768:8:1,scrypt:16384:8:1'
+
+
+def medir_verificacoes(politica, trabalhadores, verificacoes):
+    """Verificações/s com um pool de ``trabalhadores`` threads"""
+    servico = ServicoSenhas()
+    servico.metodo = politica
+    servico.trabalhadores = trabalhadores
+    hash_senha = generate_password_hash('senha-benchmark', politica)
+
+    restantes = [verificacoes]
+    lock = threading.Lock()
+
+    def cliente():
+        while True:
+            with lock:
+                if restantes[0] == 0:
+                    return
+                restantes[0] -= 1
+            servico.verificar(hash_senha, 'senha-benchmark')
+
+    clientes = [threading.Thread(target=cliente) for _ in range(trabalhadores * 2)]
+    inicio = time.perf_counter()
+    for thread in clientes:
+        thread.start()
+    for thread in clientes:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    por_segundo = verificacoes / duracao
+    return {
+        'trabalhadores': trabalhadores,
+        'logins_por_segundo': round(por_segundo, 2),
+        'logins_por_segundo_por_nucleo': round(por_segundo / min(trabalhadores, os.cpu_count() or 1), 2),
+        'ms_por_verificacao': round(duracao * 1000 * trabalhadores / verificacoes, 1),
+    }
+
+
+def medir_rajada(diretorio, politica, trabalhadores, clientes, logins_por_cliente):
+    """Logins pela rota com ``clientes`` simultâneos e a latência de uma rota leve no mesmo processo"""
+    app = criar_app(f"sqlite:///{os.path.join(diretorio, 'senhas.db')}", 'sqlite')
+    app.config.update(SENHAS_METODO=politica, SENHAS_TRABALHADORES=trabalhadores)
+    servico_senhas.init_app(app)
+
+    with app.app_context():
+        hash_senha = generate_password_hash('senha-benchmark', politica)
+        db.session.execute(db.insert(User.__table__), [
+            {'nome': f'Login {i}', 'email': f'login{i}@benchmark', 'telefone': '0', 'password_hash': hash_senha}
+            for i in range(clientes)
+        ])
+        db.session.commit()
+        db.session.remove()
+
+    tempos_login = []
+    tempos_leve = []
+    status = {}
+    fim = threading.Event()
+
+    def logar(indice):
+        cliente = app.test_client()
+        for _ in range(logins_por_cliente):
+            inicio = time.perf_counter()
+            resposta = cliente.post('/api/auth/login', json={
+                'email': f'login{indice}@benchmark', 'password': 'senha-benchmark'
+            })
+            tempos_login.append((time.perf_counter() - inicio) * 1000)
+            status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+
+    def consultar():
+        cliente = app.test_client()
+        while not fim.is_set():
+            inicio = time.perf_counter()
+            cliente.get('/api/sorteios/sorteio-atual')
+            tempos_leve.append((time.perf_counter() - inicio) * 1000)
+            time.sleep(0.005)
+
+    leitor = threading.Thread(target=consultar)
+    threads = [threading.Thread(target=logar, args=(indice,)) for indice in range(clientes)]
+    leitor.start()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    fim.set()
+    leitor.join()
+
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+    return {
+        'trabalhadores': trabalhadores,
+        'clientes': clientes,
+        'logins_por_segundo': round(len(tempos_login) / duracao, 2),
+        'login': percentis(tempos_login),
+        'status': status,
+        'sorteio_atual_durante_rajada': percentis(tempos_leve) if tempos_leve else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--politicas', default=POLITICAS, help='Métodos do Werkzeug, separados por vírgula')
+    parser.add_argument('--trabalhadores', type=int, default=os.cpu_count() or 1,
+                        help='Maior pool medido (mede de 1 até este valor, dobrando)')
+    parser.add_argument('--verificacoes', type=int, default=40, help='Verificações por medição do pool')
+    parser.add_argument('--clientes', type=int, default=16, help='Logins simultâneos na rajada pela rota')
+    parser.add_argument('--logins-por-cliente', type=int, default=2)
+    parser.add_argument('--saida', help='Arquivo JSON para gravar os resultados')
+    args = parser.parse_args()
+
+    tamanhos = []
+    tamanho = 1
+    while tamanho < args.trabalhadores:
+        tamanhos.append(tamanho)
+        tamanho *= 2
+    tamanhos.append(args.trabalhadores)
+
+    relatorio = {'parametros': vars(args), 'nucleos': os.cpu_count(), 'politicas': {}}
+    with tempfile.TemporaryDirectory() as diretorio:
+        for politica in [politica.strip() for politica in args.politicas.split(',') if politica.strip()]:
+            relatorio['politicas'][politica] = {
+                'pool': [medir_verificacoes(politica, n, args.verificacoes) for n in tamanhos],
+                'rajada': medir_rajada(
+                    diretorio, politica, max(1, args.trabalhadores // 2), args.clientes, args.logins_por_cliente
+                ),
+            }
+
+    print(f"{'política':<24}{'pool':>5}{'logins/s':>10}{'por núcleo':>12}{'ms/login':>10}")
+    for politica, dados in relatorio['politicas'].items():
+        for medicao in dados['pool']:
+            print(f"{politica:<24}{medicao['trabalhadores']:>5}{medicao['logins_por_segundo']:>10}"
+                  f"{medicao['logins_por_segundo_por_nucleo']:>12}{medicao['ms_por_verificacao']:>10}")
+        rajada = dados['rajada']
+        leve = rajada['sorteio_atual_durante_rajada'] or {}
+        print(f"{'':<24}rajada de {rajada['clientes']} logins: {rajada['logins_por_segundo']} logins/s, "
+              f"login p95 {rajada['login']['p95_ms']} ms, sorteio-atual p95 {leve.get('p95_ms')} ms")
+
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import base64
+
+
+class BitsetNumeros:
+    """Conjunto de números de 1 a ``maximo`` representado como um bitset.
+
+    O número n ocupa o bit n - 1 de um inteiro Python, então pertinência,
+    inclusão e complemento são operações de bits. Serializado, o conjunto de
+    1 a 500 ocupa 63 bytes (84 caracteres em base64), com o bit 0 do primeiro
+    byte correspondendo ao número 1.
+    """
+
+    __slots__ = ('maximo', 'bits')
+
+    def __init__(self, numeros=(), maximo=500):
+        self.maximo = maximo
+        self.bits = 0
+        for numero in numeros:
+            self.adicionar(numero)
+
+    @property
+    def tamanho_bytes(self):
+        return (self.maximo + 7) // 8
+
+    @property
+    def _mascara(self):
+        return (1 << self.maximo) - 1
+
+    @classmethod
+    def de_bytes(cls, dados, maximo=500):
+        """Reconstrói o conjunto a partir de para_bytes()"""
+        bitset = cls(maximo=maximo)
+        bitset.bits = int.from_bytes(dados or b'', 'little') & bitset._mascara
+        return bitset
+
+    @classmethod
+    def de_base64(cls, texto, maximo=500):
+        """Reconstrói o conjunto a partir de para_base64()"""
+        return cls.de_bytes(base64.b64decode(texto), maximo=maximo)
+
+    def para_bytes(self):
+        return self.bits.to_bytes(self.tamanho_bytes, 'little')
+
+    def para_base64(self):
+        return base64.b64encode(self.para_bytes()).decode('ascii')
+
+    def adicionar(self, numero):
+        if not 1 <= numero <= self.maximo:
+            raise ValueError(f'Número fora da faixa 1..{self.maximo}: {numero}')
+        self.bits |= 1 << (numero - 1)
+
+    def complemento(self):
+        """Retorna os números da faixa que não estão no conjunto"""
+        bitset = BitsetNumeros(maximo=self.maximo)
+        bitset.bits = ~self.bits & self._mascara
+        return bitset
+
+    def copia(self):
+        bitset = BitsetNumeros(maximo=self.maximo)
+        bitset.bits = self.bits
+        return bitset
+
+    def __contains__(self, numero):
+        return 1 <= numero <= self.maximo and bool(self.bits >> (numero - 1) & 1)
+
+    def __iter__(self):
+        """Percorre os números do conjunto em ordem crescente"""
+        bits = self.bits
+        while bits:
+            menor = bits & -bits
+            yield menor.bit_length()
+            bits ^= menor
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __or__(self, outro):
+        bitset = BitsetNumeros(maximo=max(self.maximo, outro.maximo))
+        bitset.bits = self.bits | outro.bits
+        return bitset
+
+    def __and__(self, outro):
+        bitset = BitsetNumeros(maximo=min(self.maximo, outro.maximo))
+        bitset.bits = self.bits & outro.bits
+        return bitset
+
+    def __eq__(self, outro):
+        return isinstance(outro, BitsetNumeros) and self.bits == outro.bits
+
+    def __repr__(self):
+        return f'<BitsetNumeros {len(self)}/{self.maximo}>'
@@ -0,0 +1,173 @@
+from flask import current_app, request
+from collections import OrderedDict
+import hashlib
+import threading
+
+# Cache-Control das respostas que nunca mudam (sorteios finalizados)
+UM_ANO = 365 * 24 * 3600
+
+
+class BackendCache:
+    """Interface dos backends do cache de respostas.
+
+    Guarda corpos de resposta (bytes) por chave (str). Implementações devem
+    ser seguras para uso entre threads e podem descartar entradas a qualquer
+    momento: o cache só é consultado, nunca é a fonte da verdade.
+    """
+
+    def obter(self, chave):
+        raise NotImplementedError
+
+    def guardar(self, chave, corpo, imutavel=False):
+        raise NotImplementedError
+
+    def apagar(self, chave):
+        raise NotImplementedError
+
+    def limpar(self):
+        raise NotImplementedError
+
+
+class BackendMemoria(BackendCache):
+    """Backend no próprio processo: dicionário LRU limitado em entradas e em bytes"""
+
+    def __init__(self, maximo_entradas=1024, maximo_bytes=32 * 1024 * 1024):
+        self.maximo_entradas = maximo_entradas
+        self.maximo_bytes = maximo_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            corpo = self._entradas.get(chave)
+            if corpo is not None:
+                self._entradas.move_to_end(chave)
+            return corpo
+
+    def guardar(self, chave, corpo, imutavel=False):
+        if len(corpo) > self.maximo_bytes:
+            return
+
+        with self._lock:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+
+            self._entradas[chave] = corpo
+            self._bytes += len(corpo)
+
+            while len(self._entradas) > self.maximo_entradas or self._bytes > self.maximo_bytes:
+                _, removido = self._entradas.popitem(last=False)
+                self._bytes -= len(removido)
+
+    def apagar(self, chave):
+        with self._lock:
+            corpo = self._entradas.pop(chave, None)
+            if corpo is not None:
+                self._bytes -= len(corpo)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+
+class BackendRedis(BackendCache):
+    """Backend sobre um cliente compatível com Redis (get/set/delete/scan_iter).
+
+    Serve para redis.Redis ou qualquer substituto local com a mesma API; o
+    cliente é recebido pronto, então o pacote redis não é dependência. O
+    limite de memória e o LRU ficam a cargo do servidor (maxmemory com
+    maxmemory-policy allkeys-lru); entradas não imutáveis recebem ``ttl``.
+    """
+
+    def __init__(self, cliente, prefixo='bilhetes:respostas:', ttl=3600):
+        self.cliente = cliente
+        self.prefixo = prefixo
+        self.ttl = ttl
+
+    def obter(self, chave):
+        return self.cliente.get(self.prefixo + chave)
+
+    def guardar(self, chave, corpo, imutavel=False):
+        self.cliente.set(self.prefixo + chave, corpo, ex=None if imutavel else self.ttl)
+
+    def apagar(self, chave):
+        self.cliente.delete(self.prefixo + chave)
+
+    def limpar(self):
+        for chave in self.cliente.scan_iter(self.prefixo + '*'):
+            self.cliente.delete(chave)
+
+
+class CacheRespostas:
+    """Cache de respostas JSON públicas, com ETag forte e resposta 304.
+
+    A chave de cada resposta inclui a versão dos dados de que ela depende
+    (contadores incrementados a cada aposta e a cada sorteio/liquidação), então
+    nada precisa ser invalidado: uma nova versão simplesmente gera uma nova
+    chave e as antigas saem pelo LRU. A ETag é o hash do corpo guardado, e não
+    da chave: se uma chave voltar a ser usada com outro conteúdo (versões
+    reiniciadas com o banco, cache compartilhado entre ambientes), o cliente
+    não recebe 304 para um corpo que não tem. Com o corpo em cache, o 304 é
+    respondido sem montá-lo.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or BackendMemoria()
+
+    def configurar(self, backend):
+        """Troca o backend (por exemplo, por um BackendRedis compartilhado entre processos)"""
+        self.backend = backend
+
+    @staticmethod
+    def chave(*partes):
+        """Monta a chave textual a partir das partes (nome, ids, versões, query string)"""
+        return ':'.join(str(parte) for parte in partes)
+
+    @staticmethod
+    def etag(corpo):
+        """ETag forte do corpo (bytes) de uma resposta"""
+        return hashlib.sha1(corpo).hexdigest()
+
+    def responder(self, chave, gerar, imutavel=False):
+        """Responde com o corpo em cache para a chave, gerando-o com ``gerar`` se preciso.
+
+        ``gerar`` devolve o mesmo que uma view: (resposta, status). Só respostas
+        200 são guardadas. Com imutavel=True a resposta pode ser guardada pelo
+        cliente para sempre (sorteios finalizados).
+        """
+        corpo = self.backend.obter(chave)
+        if corpo is None:
+            resposta, status = gerar()
+            if status != 200:
+                return resposta, status
+            corpo = resposta.get_data()
+            self.backend.guardar(chave, corpo, imutavel=imutavel)
+
+        etag = self.etag(corpo)
+        if request.if_none_match.contains(etag):
+            return self.montar_resposta(etag, None, imutavel)
+        return self.montar_resposta(etag, corpo, imutavel)
+
+    @staticmethod
+    def montar_resposta(etag, corpo, imutavel=False, classe_resposta=None):
+        """Resposta 200 com o corpo JSON (ou 304, com corpo None) e os cabeçalhos de cache"""
+        classe_resposta = classe_resposta or current_app.response_class
+        if corpo is None:
+            resposta = classe_resposta(status=304)
+        else:
+            resposta = classe_resposta(corpo, status=200, mimetype='application/json')
+
+        resposta.set_etag(etag)
+        resposta.cache_control.public = True
+        if imutavel:
+            resposta.cache_control.max_age = UM_ANO
+            resposta.cache_control.immutable = True
+        else:
+            resposta.cache_control.no_cache = True
+        return resposta
+
+
+cache_respostas = CacheRespostas()
@@ -0,0 +1,460 @@
+from src.models.database import db
+from src.models.user import User
+from src.models.aposta import Aposta
+from src.models.sorteio import Sorteio
+from src.models.bitset_numeros import BitsetNumeros
+from src.models.modalidade import (
+    Modalidade, BilhetePredefinido, Premiacao, ApostaModalidade, reconstruir_indice_bilhetes
+)
+from src.models.contagem_numeros import reconstruir_contagens
+from src.models.numeros_usuario_sorteio import reconstruir_numeros_apostados
+from src.models.estatisticas import reconstruir_estatisticas, somar_gerais
+from src.services.carteira import abrir_extratos_sem_lancamento
+from src.services.liquidacao import Cronometro
+from werkzeug.security import generate_password_hash
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime, timedelta
+import csv
+import itertools
+import json
+import math
+import random
+
+# Entidades na ordem de carga (as chaves estrangeiras apontam sempre para trás)
+ENTIDADES = {
+    'usuarios': User,
+    'sorteios': Sorteio,
+    'modalidades': Modalidade,
+    'bilhetes': BilhetePredefinido,
+    'premiacoes': Premiacao,
+    'apostas': Aposta,
+    'apostas_modalidades': ApostaModalidade,
+}
+
+# Linhas por executemany
+LOTE_PADRAO = 50000
+
+# Parte do arrecadado que vira prêmio, como em Sorteio.realizar_sorteio
+PERCENTUAL_PREMIO = 0.9
+
+NUMERO_MAXIMO = 500
+
+
+class ErroCarga(ValueError):
+    """Arquivo ou parâmetro inválido para a carga em massa"""
+
+
+# Leitura dos arquivos
+
+def ler_arquivo(caminho):
+    """Percorre as linhas de um arquivo .csv (com cabeçalho) ou .jsonl como dicionários"""
+    if caminho.endswith('.csv'):
+        with open(caminho, newline='', encoding='utf-8') as arquivo:
+            yield from csv.DictReader(arquivo)
+    elif caminho.endswith('.jsonl'):
+        with open(caminho, encoding='utf-8') as arquivo:
+            for numero_linha, texto in enumerate(arquivo, 1):
+                if texto.strip():
+                    try:
+                        yield json.loads(texto)
+                    except ValueError as e:
+                        raise ErroCarga(f'{caminho}:{numero_linha}: JSON inválido ({e})')
+    else:
+        raise ErroCarga(f'Formato não suportado (use .csv ou .jsonl): {caminho}')
+
+
+def _converter(coluna, valor):
+    """Converte o valor lido (texto no CSV) para o tipo da coluna"""
+    if valor == '':
+        return None
+
+    tipo = coluna.type
+    if isinstance(tipo, db.Boolean):
+        return valor.strip().lower() in ('1', 'true', 't', 'sim', 's')
+    if isinstance(tipo, db.Integer):
+        return int(valor)
+    if isinstance(tipo, db.Float):
+        return float(valor)
+    if isinstance(tipo, db.DateTime):
+        return datetime.fromisoformat(valor)
+    if isinstance(tipo, db.Date):
+        return date.fromisoformat(valor)
+    return valor
+
+
+def _numeros(valor):
+    """Números de um bilhete: lista JSON, '[1, 2]' ou '1 2' / '1;2' no CSV"""
+    if isinstance(valor, str):
+        texto = valor.strip()
+        valor = json.loads(texto) if texto.startswith('[') else texto.replace(';', ' ').replace(',', ' ').split()
+    return BitsetNumeros(int(numero) for numero in valor)
+
+
+class _Preparador:
+    """Transforma as linhas de entrada em linhas da tabela, com os padrões das colunas"""
+
+    def __init__(self, modelo, senha):
+        self.modelo = modelo
+        self.tabela = modelo.__table__
+        self.senha = senha
+        self._hashes = {}
+        # (nome, coluna, padrão, chave primária) calculados uma vez, não a cada linha
+        self._colunas = [
+            (coluna.name, coluna, coluna.default, coluna.primary_key) for coluna in self.tabela.columns
+        ]
+
+    def _hash(self, senha):
+        # O hash é caro de propósito: senhas repetidas (comuns em staging) são calculadas uma vez
+        if senha not in self._hashes:
+            self._hashes[senha] = generate_password_hash(senha)
+        return self._hashes[senha]
+
+    def preparar(self, entrada):
+        entrada = dict(entrada)
+
+        if self.modelo is User and not entrada.get('password_hash'):
+            entrada['password_hash'] = self._hash(entrada.pop('senha', None) or self.senha)
+        entrada.pop('senha', None)
+
+        if self.modelo is BilhetePredefinido and 'bits' not in entrada:
+            bitset = _numeros(entrada['numeros'])
+            entrada['bits'] = bitset.para_bytes()
+            entrada['numeros'] = json.dumps(list(bitset))
+
+        if self.modelo is ApostaModalidade and not isinstance(entrada.get('numeros'), bytes):
+            entrada['numeros'] = _numeros(entrada['numeros']).para_bytes()
+
+        linha = {}
+        for nome, coluna, padrao, chave in self._colunas:
+            valor = entrada.get(nome)
+            if isinstance(valor, str):
+                valor = _converter(coluna, valor)
+            if valor is None:
+                if padrao is not None:
+                    valor = padrao.arg(None) if padrao.is_callable else padrao.arg
+                elif chave:
+                    continue
+            linha[nome] = valor
+        return linha
+
+
+# Dados sintéticos
+
+def pesos_numeros(especificacao):
+    """Pesos acumulados dos números 1..500 para random.choices.
+
+    ``uniforme``, ``normal[:media[:desvio]]`` (padrão 250:80) ou
+    ``zipf[:s]`` (padrão 1.1, o número 1 é o mais apostado).
+    """
+    nome, *parametros = especificacao.split(':')
+    try:
+        parametros = [float(parametro) for parametro in parametros]
+    except ValueError:
+        raise ErroCarga(f'Parâmetros inválidos na distribuição: {especificacao}')
+
+    numeros = range(1, NUMERO_MAXIMO + 1)
+    if nome == 'uniforme':
+        pesos = [1.0] * NUMERO_MAXIMO
+    elif nome == 'normal':
+        media, desvio = (parametros + [250.0, 80.0][len(parametros):])[:2]
+        pesos = [math.exp(-((numero - media) ** 2) / (2 * desvio ** 2)) for numero in numeros]
+    elif nome == 'zipf':
+        expoente = parametros[0] if parametros else 1.1
+        pesos = [1.0 / numero ** expoente for numero in numeros]
+    else:
+        raise ErroCarga(f'Distribuição desconhecida: {nome} (use uniforme, normal ou zipf)')
+
+    return list(itertools.accumulate(pesos))
+
+
+class GeradorSintetico:
+    """Gera usuários, sorteios, modalidades, bilhetes, premiações e apostas com uma semente.
+
+    Os ids são atribuídos a partir do maior id de cada tabela no momento da
+    geração, para que as apostas possam apontar para os usuários e sorteios
+    gerados. Os sorteios terminam hoje (o último fica aberto) ou, se o banco
+    já tem sorteios, na véspera do mais antigo, todos finalizados. Com
+    compras_por_modalidade, o sorteio aberto recebe esse número de bilhetes
+    do catálogo comprados em cada modalidade, ativos para a apuração.
+    """
+
+    def __init__(self, usuarios, sorteios, apostas_por_sorteio, modalidades=0, bilhetes_por_modalidade=0,
+                 distribuicao='uniforme', semente=42, valor_aposta=2.0, compras_por_modalidade=0):
+        if apostas_por_sorteio > usuarios * NUMERO_MAXIMO // 2:
+            raise ErroCarga('Poucos usuários para o número de apostas por sorteio')
+
+        self.total_usuarios = usuarios
+        self.total_sorteios = sorteios
+        self.apostas_por_sorteio = apostas_por_sorteio
+        self.total_modalidades = modalidades
+        self.bilhetes_por_modalidade = bilhetes_por_modalidade
+        self.compras_por_modalidade = compras_por_modalidade
+        self.pesos = pesos_numeros(distribuicao)
+        self.valor_aposta = valor_aposta
+        self.rnd = random.Random(semente)
+
+        self._usuarios = range(0)
+        self._sorteios = []
+        self._modalidades = []
+        self._bilhetes = {}
+
+    def fontes(self):
+        """{entidade: gerador} das entidades que têm linhas a gerar"""
+        nomes = ['usuarios', 'sorteios', 'apostas']
+        if self.total_modalidades:
+            nomes += ['modalidades', 'bilhetes', 'premiacoes']
+            if self.bilhetes_por_modalidade and self.compras_por_modalidade:
+                nomes.append('apostas_modalidades')
+        return {nome: getattr(self, nome)() for nome in nomes}
+
+    @staticmethod
+    def _proximo_id(modelo):
+        return (db.session.execute(db.select(db.func.max(modelo.id))).scalar() or 0) + 1
+
+    def usuarios(self):
+        primeiro = self._proximo_id(User)
+        self._usuarios = range(primeiro, primeiro + self.total_usuarios)
+        for user_id in self._usuarios:
+            yield {
+                'id': user_id,
+                'nome': f'Usuário {user_id}',
+                'email': f'usuario{user_id}@carga',
+                'telefone': f'{self.rnd.randrange(10 ** 10, 10 ** 11)}',
+                'saldo': float(self.rnd.randrange(0, 200)),
+            }
+
+    def sorteios(self):
+        primeiro = self._proximo_id(Sorteio)
+        mais_antigo = db.session.execute(db.select(db.func.min(Sorteio.data_sorteio))).scalar()
+        ultimo_dia = mais_antigo - timedelta(days=1) if mais_antigo else date.today()
+        aberto = mais_antigo is None
+
+        for indice in range(self.total_sorteios):
+            sorteio_id = primeiro + indice
+            dia = ultimo_dia - timedelta(days=self.total_sorteios - 1 - indice)
+            if aberto and indice == self.total_sorteios - 1:
+                numero_sorteado = None
+                linha = {'status': 'aberto'}
+            else:
+                numero_sorteado = self.rnd.randint(1, NUMERO_MAXIMO)
+                linha = {
+                    'status': 'finalizado',
+                    'numero_sorteado': numero_sorteado,
+                    'data_sorteio_realizado': datetime.combine(dia, datetime.min.time()),
+                }
+            self._sorteios.append((sorteio_id, numero_sorteado))
+            yield {'id': sorteio_id, 'data_sorteio': dia, **linha}
+
+    def modalidades(self):
+        primeiro = self._proximo_id(Modalidade)
+        for indice in range(self.total_modalidades):
+            quantidade = 2 + indice % 5
+            self._modalidades.append((primeiro + indice, quantidade))
+            yield {
+                'id': primeiro + indice,
+                'nome': f'{quantidade} números ({primeiro + indice})',
+                'descricao': f'Escolha {quantidade} números',
+                'cor': 'bg-blue-500',
+                'quantidade_numeros': quantidade,
+            }
+
+    def bilhetes(self):
+        bilhete_id = self._proximo_id(BilhetePredefinido)
+        for modalidade_id, quantidade in self._modalidades:
+            catalogo = self._bilhetes[modalidade_id] = []
+            for _ in range(self.bilhetes_por_modalidade):
+                numeros = set()
+                while len(numeros) < quantidade:
+                    numeros.update(self.rnd.choices(range(1, NUMERO_MAXIMO + 1), cum_weights=self.pesos,
+                                                    k=quantidade - len(numeros)))
+                bilhete = {'id': bilhete_id, 'modalidade_id': modalidade_id, 'numeros': sorted(numeros), 'preco': 5.0}
+                catalogo.append(bilhete)
+                bilhete_id += 1
+                yield bilhete
+
+    def premiacoes(self):
+        for modalidade_id, quantidade in self._modalidades:
+            for ordem in range(min(3, quantidade)):
+                yield {
+                    'modalidade_id': modalidade_id,
+                    'posicao': f'{ordem + 1}º Prêmio',
+                    'valor': float(500 * 10 ** (quantidade - 2) // 5 ** ordem),
+                    'acertos': quantidade - ordem,
+                }
+
+    def apostas(self):
+        populacao = range(1, NUMERO_MAXIMO + 1)
+        for sorteio_id, numero_sorteado in self._sorteios:
+            escolhidos = set()
+            while len(escolhidos) < self.apostas_por_sorteio:
+                faltam = self.apostas_por_sorteio - len(escolhidos)
+                numeros = self.rnd.choices(populacao, cum_weights=self.pesos, k=faltam)
+                for numero in numeros:
+                    user_id = self._usuarios[self.rnd.randrange(len(self._usuarios))]
+                    chave = (user_id, numero)
+                    if chave in escolhidos:
+                        continue
+                    escolhidos.add(chave)
+                    if numero_sorteado is None:
+                        status = 'ativa'
+                    else:
+                        status = 'ganhadora' if numero == numero_sorteado else 'perdedora'
+                    yield {
+                        'user_id': user_id,
+                        'sorteio_id': sorteio_id,
+                        'numero_escolhido': numero,
+                        'valor_aposta': self.valor_aposta,
+                        'status': status,
+                    }
+
+    def apostas_modalidades(self):
+        abertos = [sorteio_id for sorteio_id, numero_sorteado in self._sorteios if numero_sorteado is None]
+        for sorteio_id in abertos:
+            for modalidade_id, catalogo in self._bilhetes.items():
+                for _ in range(self.compras_por_modalidade):
+                    bilhete = catalogo[self.rnd.randrange(len(catalogo))]
+                    yield {
+                        'user_id': self._usuarios[self.rnd.randrange(len(self._usuarios))],
+                        'sorteio_id': sorteio_id,
+                        'modalidade_id': modalidade_id,
+                        'bilhete_id': bilhete['id'],
+                        'numeros': bilhete['numeros'],
+                        'valor': bilhete['preco'],
+                    }
+
+
+# Carga
+
+def _inserir(tabela, linhas, lote):
+    """Insere as linhas em executemany de ``lote`` linhas; retorna o total inserido"""
+    total = 0
+    while True:
+        bloco = list(itertools.islice(linhas, lote))
+        if not bloco:
+            return total
+        db.session.execute(db.insert(tabela), bloco)
+        total += len(bloco)
+
+
+def _consolidar_sorteios(sorteio_ids):
+    """Recalcula totais e prêmio dos sorteios a partir das apostas carregadas"""
+    sorteios = Sorteio.__table__
+    apostas = Aposta.__table__
+    da_aposta = apostas.c.sorteio_id == sorteios.c.id
+
+    total_apostas = db.select(db.func.count()).where(da_aposta).scalar_subquery()
+    arrecadado = db.select(db.func.coalesce(db.func.sum(apostas.c.valor_aposta), 0.0)).where(da_aposta).scalar_subquery()
+    ganhadoras = db.select(db.func.count()).where(
+        da_aposta, apostas.c.numero_escolhido == sorteios.c.numero_sorteado
+    ).scalar_subquery()
+
+    ids = sorted(sorteio_ids)
+    for inicio in range(0, len(ids), 500):
+        alvo = sorteios.c.id.in_(ids[inicio:inicio + 500])
+        db.session.execute(
+            db.update(sorteios).where(alvo).values(total_apostas=total_apostas, total_arrecadado=arrecadado)
+        )
+        db.session.execute(
+            db.update(sorteios).where(alvo, sorteios.c.status != 'aberto').values(
+                premio_total=sorteios.c.total_arrecadado * PERCENTUAL_PREMIO,
+                total_ganhadores=ganhadoras,
+                premio_por_ganhador=db.case(
+                    (ganhadoras > 0, sorteios.c.total_arrecadado * PERCENTUAL_PREMIO / ganhadoras), else_=0.0
+                )
+            )
+        )
+
+
+def carregar(fontes, lote=LOTE_PADRAO, adiar_indices=True, senha='senha123'):
+    """Carrega as fontes de cada entidade em uma única transação e reconstrói os derivados.
+
+    ``fontes`` mapeia o nome da entidade (ENTIDADES) para uma lista de
+    iteráveis de dicionários (arquivos lidos por ler_arquivo(), geradores do
+    GeradorSintetico), consumidos em ordem e em lotes de executemany. Com
+    adiar_indices, os índices secundários das tabelas carregadas são removidos
+    antes e recriados depois da carga (um índice único violado desfaz tudo).
+    Ao final, os usuários sem extrato recebem o lançamento de abertura com o
+    saldo carregado, e contadores, bitsets, índice do catálogo, totais dos
+    sorteios e estatísticas são reconstruídos, como após uma importação.
+
+    Retorna um relatório com linhas, segundos e linhas/s por entidade e o
+    tempo (ms) de cada fase.
+    """
+    cronometro = Cronometro()
+    carregadas = [nome for nome in ENTIDADES if fontes.get(nome)]
+    indices = [indice for nome in carregadas for indice in ENTIDADES[nome].__table__.indexes]
+
+    try:
+        conexao = db.session.connection()
+        if adiar_indices:
+            for indice in indices:
+                indice.drop(conexao, checkfirst=True)
+        cronometro.fase('remover_indices')
+
+        linhas_por_entidade = {}
+        sorteios_com_apostas = set()
+        for nome in carregadas:
+            preparador = _Preparador(ENTIDADES[nome], senha)
+            linhas = (preparador.preparar(linha) for fonte in fontes[nome] for linha in fonte)
+            if nome == 'apostas':
+                linhas = (sorteios_com_apostas.add(linha['sorteio_id']) or linha for linha in linhas)
+            linhas_por_entidade[nome] = _inserir(ENTIDADES[nome].__table__, linhas, lote)
+            cronometro.fase(nome)
+
+        if adiar_indices:
+            for indice in indices:
+                indice.create(conexao, checkfirst=True)
+        cronometro.fase('recriar_indices')
+
+        if 'usuarios' in carregadas:
+            # Usuários carregados entram com saldo e sem extrato: o saldo vira a abertura
+            abrir_extratos_sem_lancamento()
+        if sorteios_com_apostas:
+            _consolidar_sorteios(sorteios_com_apostas)
+            reconstruir_contagens()
+            reconstruir_numeros_apostados()
+        if 'bilhetes' in carregadas:
+            reconstruir_indice_bilhetes()
+        reconstruir_estatisticas()
+        if {'modalidades', 'bilhetes', 'premiacoes'} & set(carregadas):
+            # Os catálogos em memória recarregam na próxima conferência de versão
+            somar_gerais(versao_catalogo=1)
+        cronometro.fase('reconstruir_derivados')
+
+        db.session.commit()
+        cronometro.fase('commit')
+    except Exception as e:
+        db.session.rollback()
+        if adiar_indices:
+            # Nem todo driver desfaz DDL com o rollback (o sqlite3 roda o DROP INDEX
+            # fora da transação): os índices removidos são recriados sobre os dados antigos
+            with db.engine.begin() as conexao:
+                for indice in indices:
+                    indice.create(conexao, checkfirst=True)
+        if isinstance(e, IntegrityError):
+            raise ErroCarga(f'Carga desfeita: dados violam uma restrição ({e.orig})') from e
+        raise
+
+    if db.session.get_bind().dialect.name in ('sqlite', 'postgresql'):
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    cronometro.fase('analyze')
+
+    entidades = {}
+    for nome, total in linhas_por_entidade.items():
+        segundos = cronometro.tempos[nome] / 1000
+        entidades[nome] = {
+            'linhas': total,
+            'segundos': round(segundos, 3),
+            'linhas_por_segundo': round(total / segundos) if segundos else None,
+        }
+
+    total_linhas = sum(linhas_por_entidade.values())
+    tempo_total = cronometro.total()
+    return {
+        'entidades': entidades,
+        'total_linhas': total_linhas,
+        'linhas_por_segundo': round(total_linhas / (tempo_total / 1000)) if tempo_total else None,
+        'tempos_ms': cronometro.tempos,
+        'tempo_total_ms': tempo_total,
+    }
@@ -0,0 +1,166 @@
+from src.models.database import db
+from src.models.user import User
+from src.models.aposta import Aposta
+from src.models.lancamento import Lancamento
+from src.models.estatisticas import somar_gerais
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from datetime import datetime
+import math
+
+
+class SaldoInsuficiente(Exception):
+    """O débito deixaria o saldo do usuário negativo"""
+
+
+def valor_valido(valor):
+    """Verifica se o valor é um número finito para movimentar saldo ou preço"""
+    # bool é subclasse de int, e o JSON aceita NaN e Infinity; nenhum deles é dinheiro
+    return (
+        isinstance(valor, (int, float))
+        and not isinstance(valor, bool)
+        and math.isfinite(valor)
+    )
+
+
+def _sincronizar_saldo(user_id, saldo):
+    """Atualiza o User já carregado na sessão sem marcá-lo como alterado"""
+    user = db.session.identity_map.get(identity_key(User, user_id))
+    if user is not None:
+        set_committed_value(user, 'saldo', saldo)
+
+
+def lancar(user_id, tipo, valor, descricao, sorteio_id=None):
+    """Movimenta o saldo do usuário e registra o lançamento no extrato (sem commit).
+
+    O saldo é alterado com um UPDATE relativo (saldo = saldo + valor) e, para
+    débitos, condicionado a não ficar negativo; o saldo resultante é lido na
+    mesma transação e gravado no lançamento. Levanta SaldoInsuficiente se o
+    débito não couber no saldo.
+    """
+    if not valor_valido(valor):
+        raise ValueError(f'Valor inválido para lançamento: {valor!r}')
+
+    atualizacao = (
+        db.update(User)
+        .where(User.id == user_id)
+        .values(saldo=User.saldo + valor)
+        .execution_options(synchronize_session=False)
+    )
+    if valor < 0:
+        atualizacao = atualizacao.where(User.saldo + valor >= 0)
+
+    if db.session.execute(atualizacao).rowcount == 0:
+        raise SaldoInsuficiente()
+
+    saldo = db.session.execute(db.select(User.saldo).where(User.id == user_id)).scalar_one()
+    _sincronizar_saldo(user_id, saldo)
+    somar_gerais(saldo_total_usuarios=valor)
+
+    lancamento = Lancamento(
+        user_id=user_id,
+        tipo=tipo,
+        valor=valor,
+        saldo_apos=saldo,
+        sorteio_id=sorteio_id,
+        descricao=descricao
+    )
+    db.session.add(lancamento)
+    return lancamento
+
+
+def registrar_saldo_inicial(user):
+    """Abre o extrato de um usuário recém-criado com o saldo de boas-vindas (sem commit)"""
+    lancamento = Lancamento(
+        user_id=user.id,
+        tipo='ajuste',
+        valor=user.saldo,
+        saldo_apos=user.saldo,
+        descricao='Saldo inicial'
+    )
+    db.session.add(lancamento)
+    return lancamento
+
+
+def abrir_extratos_sem_lancamento(descricao='Saldo de abertura do extrato'):
+    """Abre o extrato dos usuários que não têm lançamentos com o saldo atual (sem commit).
+
+    Um único INSERT ... SELECT grava um 'ajuste' com o saldo de cada usuário
+    sem lançamento, como a migração do extrato fez para os usuários já
+    existentes. Retorna o número de extratos abertos.
+    """
+    lancamentos = (
+        db.select(
+            User.id,
+            db.literal('ajuste'),
+            User.saldo,
+            User.saldo,
+            db.literal(descricao),
+            db.literal(datetime.utcnow())
+        )
+        .where(~db.exists().where(Lancamento.user_id == User.id))
+    )
+    resultado = db.session.execute(
+        db.insert(Lancamento.__table__).from_select(
+            ['user_id', 'tipo', 'valor', 'saldo_apos', 'descricao', 'data_criacao'],
+            lancamentos
+        )
+    )
+    return resultado.rowcount
+
+
+def creditar_premios(sorteio, filtro_ganhadoras, premio_por_aposta):
+    """Credita os prêmios de todos os ganhadores do sorteio com operações em conjunto (sem commit).
+
+    Cada usuário recebe o prêmio por aposta vezes o número de apostas
+    ganhadoras que tem. Retorna o número de usuários creditados.
+    """
+    ganhadores = (
+        db.select(Aposta.user_id, (premio_por_aposta * db.func.count(Aposta.id)).label('valor'))
+        .where(filtro_ganhadoras)
+        .group_by(Aposta.user_id)
+        .subquery()
+    )
+    return creditar_por_usuario(ganhadores, sorteio, f'Prêmio do sorteio de {sorteio.data_sorteio.isoformat()}')
+
+
+def creditar_por_usuario(ganhadores, sorteio, descricao):
+    """Credita a cada usuário o valor da subconsulta ``ganhadores`` (user_id, valor) (sem commit).
+
+    Um UPDATE agregado por usuário credita users.saldo e um INSERT ... SELECT
+    grava, para cada ganhador, o lançamento de prêmio com o saldo já
+    atualizado. Retorna o número de usuários creditados.
+    """
+    valor_do_usuario = (
+        db.select(ganhadores.c.valor)
+        .where(ganhadores.c.user_id == User.id)
+        .scalar_subquery()
+    )
+
+    resultado = db.session.execute(
+        db.update(User)
+        .where(User.id.in_(db.select(ganhadores.c.user_id)))
+        .values(saldo=User.saldo + valor_do_usuario)
+        .execution_options(synchronize_session=False)
+    )
+
+    lancamentos = (
+        db.select(
+            User.id,
+            db.literal('premio'),
+            ganhadores.c.valor,
+            User.saldo,
+            db.literal(sorteio.id),
+            db.literal(descricao),
+            db.literal(datetime.utcnow())
+        )
+        .join_from(User, ganhadores, User.id == ganhadores.c.user_id)
+    )
+    db.session.execute(
+        db.insert(Lancamento.__table__).from_select(
+            ['user_id', 'tipo', 'valor', 'saldo_apos', 'sorteio_id', 'descricao', 'data_criacao'],
+            lancamentos
+        )
+    )
+
+    return resultado.rowcount
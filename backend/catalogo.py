@@ -0,0 +1,140 @@
+from flask import current_app, request
+from src.models.database import db
+from src.models.modalidade import Modalidade, BilhetePredefinido, Premiacao
+from src.models.estatisticas import EstatisticaGeral, somar_fatias, somar_gerais
+from src.services.cache_respostas import CacheRespostas
+from collections import namedtuple
+from types import MappingProxyType
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Corpo JSON já serializado de uma rota do catálogo e a sua ETag
+RespostaPronta = namedtuple('RespostaPronta', ['etag', 'corpo'])
+
+
+class CatalogoCarregado:
+    """Fotografia imutável do catálogo ativo em uma versão.
+
+    ``modalidades`` é a resposta de /modalidades; ``bilhetes`` e
+    ``premiacoes`` mapeiam o id de cada modalidade ativa para a resposta da
+    rota correspondente. Nada aqui é alterado depois de montado: uma nova
+    versão gera outra fotografia, que substitui esta de uma vez.
+    """
+
+    __slots__ = ('versao', 'modalidades', 'bilhetes', 'premiacoes', 'carregado_em')
+
+    def __init__(self, versao, modalidades, bilhetes, premiacoes):
+        self.versao = versao
+        self.modalidades = modalidades
+        self.bilhetes = MappingProxyType(bilhetes)
+        self.premiacoes = MappingProxyType(premiacoes)
+        self.carregado_em = time.monotonic()
+
+
+def _resposta_pronta(dados):
+    """Serializa como o jsonify da aplicação e deriva a ETag do conteúdo"""
+    corpo = current_app.json.response(dados).get_data()
+    return RespostaPronta(CacheRespostas.etag(corpo), corpo)
+
+
+class CatalogoModalidades:
+    """Catálogo de modalidades, bilhetes e premiações servido da memória.
+
+    O catálogo muda raramente, então é lido inteiro de uma vez (três
+    consultas) e cada rota recebe o corpo JSON já pronto, com ETag. A versão
+    fica em estatisticas_gerais.versao_catalogo e é incrementada pelas
+    escritas do admin na mesma transação (marcar_alterado); o processo que
+    escreveu recarrega logo após o commit (recarregar) e os demais percebem a
+    nova versão em até CATALOGO_VERIFICAR_SEGUNDOS, com uma leitura da linha
+    de estatísticas. A troca da fotografia é uma atribuição: quem já pegou a
+    anterior termina a resposta com ela.
+    """
+
+    def __init__(self, app=None):
+        self.verificar_segundos = 5.0
+        self._atual = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lê CATALOGO_VERIFICAR_SEGUNDOS e carrega o catálogo na inicialização"""
+        self.verificar_segundos = app.config.get('CATALOGO_VERIFICAR_SEGUNDOS', self.verificar_segundos)
+        self._atual = None
+
+        with app.app_context():
+            try:
+                self.recarregar()
+            except Exception as e:
+                # Banco ainda sem as tabelas (antes de 'flask migrar'): carrega na primeira leitura
+                db.session.rollback()
+                logger.warning(f"Catálogo não carregado na inicialização: {e}")
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def versao_no_banco():
+        return db.session.execute(somar_fatias(EstatisticaGeral.versao_catalogo)).scalar()
+
+    def recarregar(self):
+        """Lê o catálogo ativo do banco e troca a fotografia em memória; retorna a nova"""
+        with self._lock:
+            versao = self.versao_no_banco()
+
+            modalidades = Modalidade.query.filter_by(ativo=True).order_by(Modalidade.id).all()
+            ids = [modalidade.id for modalidade in modalidades]
+
+            bilhetes = {modalidade_id: [] for modalidade_id in ids}
+            for bilhete in BilhetePredefinido.query.filter(
+                BilhetePredefinido.modalidade_id.in_(ids), BilhetePredefinido.ativo.is_(True)
+            ).order_by(BilhetePredefinido.id):
+                bilhetes[bilhete.modalidade_id].append(bilhete.to_dict())
+
+            premiacoes = {modalidade_id: [] for modalidade_id in ids}
+            for premiacao in Premiacao.query.filter(Premiacao.modalidade_id.in_(ids)).order_by(
+                Premiacao.valor.desc(), Premiacao.id
+            ):
+                premiacoes[premiacao.modalidade_id].append(premiacao.to_dict())
+
+            self._atual = CatalogoCarregado(
+                versao,
+                _resposta_pronta([modalidade.to_dict() for modalidade in modalidades]),
+                {modalidade_id: _resposta_pronta(itens) for modalidade_id, itens in bilhetes.items()},
+                {modalidade_id: _resposta_pronta(itens) for modalidade_id, itens in premiacoes.items()}
+            )
+            self._verificado_em = time.monotonic()
+
+        logger.info(f"Catálogo carregado na versão {versao}: {len(ids)} modalidades ativas")
+        return self._atual
+
+    def atual(self):
+        """Fotografia vigente; recarrega se outra instância publicou uma versão nova"""
+        catalogo = self._atual
+        if catalogo is None:
+            return self.recarregar()
+
+        if time.monotonic() - self._verificado_em >= self.verificar_segundos:
+            self._verificado_em = time.monotonic()
+            if self.versao_no_banco() != catalogo.versao:
+                return self.recarregar()
+        return catalogo
+
+    @staticmethod
+    def responder(resposta):
+        """Resposta 200 com o corpo pronto, ou 304 se o cliente já tem essa ETag"""
+        if request.if_none_match.contains(resposta.etag):
+            return CacheRespostas.montar_resposta(resposta.etag, None)
+        return CacheRespostas.montar_resposta(resposta.etag, resposta.corpo)
+
+    @staticmethod
+    def marcar_alterado():
+        """Incrementa a versão do catálogo (sem commit); chame recarregar() depois do commit"""
+        somar_gerais(versao_catalogo=1)
+
+
+catalogo_modalidades = CatalogoModalidades()
@@ -0,0 +1,162 @@
+import click
+from flask.cli import with_appcontext
+from src.models.database import db
+
+
+@click.command('reconstruir-contagens')
+@click.option('--sorteio-id', type=int, default=None, help='Reconstrói apenas este sorteio')
+@with_appcontext
+def reconstruir_contagens_comando(sorteio_id):
+    """Recalcula do zero os contadores de apostas por número"""
+    from src.models.contagem_numeros import reconstruir_contagens
+
+    linhas = reconstruir_contagens(sorteio_id)
+    db.session.commit()
+
+    alvo = f'sorteio {sorteio_id}' if sorteio_id is not None else 'todos os sorteios'
+    click.echo(f'Contagens reconstruídas para {alvo}: {linhas} números com apostas')
+
+
+@click.command('reconstruir-numeros-apostados')
+@click.option('--sorteio-id', type=int, default=None, help='Reconstrói apenas este sorteio')
+@with_appcontext
+def reconstruir_numeros_apostados_comando(sorteio_id):
+    """Recalcula do zero os bitsets de números apostados por usuário e sorteio"""
+    from src.models.numeros_usuario_sorteio import reconstruir_numeros_apostados
+
+    linhas = reconstruir_numeros_apostados(sorteio_id)
+    db.session.commit()
+
+    alvo = f'sorteio {sorteio_id}' if sorteio_id is not None else 'todos os sorteios'
+    click.echo(f'Bitsets reconstruídos para {alvo}: {linhas} pares usuário/sorteio')
+
+
+@click.command('reconstruir-estatisticas')
+@with_appcontext
+def reconstruir_estatisticas_comando():
+    """Recalcula do zero as estatísticas acumuladas (gerais, diárias e por número)"""
+    from src.models.estatisticas import reconstruir_estatisticas
+
+    linhas = reconstruir_estatisticas()
+    db.session.commit()
+
+    click.echo(f'Estatísticas reconstruídas: {linhas} linhas diárias e por número')
+
+
+@click.command('reconstruir-indice-bilhetes')
+@click.option('--modalidade-id', type=int, default=None, help='Reconstrói apenas esta modalidade')
+@with_appcontext
+def reconstruir_indice_bilhetes_comando(modalidade_id):
+    """Recalcula bitsets e índice invertido dos bilhetes do catálogo a partir da coluna JSON"""
+    from src.models.modalidade import reconstruir_indice_bilhetes
+
+    bilhetes = reconstruir_indice_bilhetes(modalidade_id)
+    db.session.commit()
+
+    alvo = f'modalidade {modalidade_id}' if modalidade_id is not None else 'todas as modalidades'
+    click.echo(f'Índice de bilhetes reconstruído para {alvo}: {bilhetes} bilhetes')
+
+
+@click.command('bulk-load')
+@click.option('--usuarios', 'arq_usuarios', multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help='Arquivo .csv/.jsonl de usuários (pode repetir; idem para as demais entidades)')
+@click.option('--sorteios', 'arq_sorteios', multiple=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--modalidades', 'arq_modalidades', multiple=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--bilhetes', 'arq_bilhetes', multiple=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--premiacoes', 'arq_premiacoes', multiple=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--apostas', 'arq_apostas', multiple=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--apostas-modalidades', 'arq_apostas_modalidades', multiple=True,
+              type=click.Path(exists=True, dir_okay=False), help='Bilhetes comprados nas modalidades')
+@click.option('--sintetico', is_flag=True, help='Gera dados sintéticos além dos arquivos')
+@click.option('--total-usuarios', type=int, default=1000, show_default=True)
+@click.option('--total-sorteios', type=int, default=30, show_default=True)
+@click.option('--apostas-por-sorteio', type=int, default=10000, show_default=True)
+@click.option('--total-modalidades', type=int, default=0, show_default=True)
+@click.option('--bilhetes-por-modalidade', type=int, default=100, show_default=True)
+@click.option('--compras-por-modalidade', type=int, default=0, show_default=True,
+              help='Bilhetes comprados em cada modalidade no sorteio aberto')
+@click.option('--distribuicao', default='uniforme', show_default=True,
+              help='Números apostados: uniforme, normal[:media[:desvio]] ou zipf[:s]')
+@click.option('--semente', type=int, default=42, show_default=True)
+@click.option('--senha', default='senha123', show_default=True,
+              help='Senha dos usuários gerados e dos arquivos sem password_hash')
+@click.option('--lote', type=int, default=50000, show_default=True, help='Linhas por executemany')
+@click.option('--manter-indices', is_flag=True, help='Não remove os índices durante a carga')
+@with_appcontext
+def bulk_load_comando(sintetico, total_usuarios, total_sorteios, apostas_por_sorteio, total_modalidades,
+                      bilhetes_por_modalidade, compras_por_modalidade, distribuicao, semente, senha, lote,
+                      manter_indices, **arquivos):
+    """Carrega usuários, sorteios, apostas, modalidades e bilhetes em massa (CSV/JSONL ou sintéticos).
+
+    Tudo entra em uma transação, em lotes de executemany, com os índices das
+    tabelas carregadas recriados só no final; contadores e estatísticas são
+    reconstruídos em seguida. Colunas dos arquivos seguem os nomes das
+    tabelas; usuários podem trazer 'senha' em vez de 'password_hash' e
+    bilhetes (do catálogo ou comprados) trazem 'numeros' como lista JSON ou "1 2 3".
+    """
+    from src.services.carga_massa import ENTIDADES, ErroCarga, GeradorSintetico, carregar, ler_arquivo
+
+    fontes = {nome: [ler_arquivo(caminho) for caminho in arquivos[f'arq_{nome}']] for nome in ENTIDADES}
+    try:
+        if sintetico:
+            gerador = GeradorSintetico(
+                total_usuarios, total_sorteios, apostas_por_sorteio, total_modalidades, bilhetes_por_modalidade,
+                distribuicao, semente, compras_por_modalidade=compras_por_modalidade
+            )
+            for nome, linhas in gerador.fontes().items():
+                fontes[nome].append(linhas)
+
+        if not any(fontes.values()):
+            raise click.UsageError('Informe ao menos um arquivo ou --sintetico')
+
+        relatorio = carregar(fontes, lote=lote, adiar_indices=not manter_indices, senha=senha)
+    except ErroCarga as e:
+        raise click.ClickException(str(e))
+
+    for nome, dados in relatorio['entidades'].items():
+        click.echo(f"{nome:<20}{dados['linhas']:>12} linhas{dados['segundos']:>10.2f} s"
+                   f"{dados['linhas_por_segundo'] or 0:>12} linhas/s")
+    click.echo(f"Total: {relatorio['total_linhas']} linhas em {relatorio['tempo_total_ms'] / 1000:.2f} s "
+               f"({relatorio['linhas_por_segundo']} linhas/s)")
+    click.echo(f"Fases (ms): {relatorio['tempos_ms']}")
+
+
+@click.command('migrar')
+@with_appcontext
+def migrar_comando():
+    """Aplica as migrações de schema pendentes e lista as versões do banco"""
+    from src.models.migracoes import aplicar_migracoes, VersaoSchema
+
+    novas = aplicar_migracoes()
+    click.echo(f'Migrações aplicadas agora: {novas or "nenhuma"}')
+
+    for versao in VersaoSchema.query.order_by(VersaoSchema.versao).all():
+        click.echo(f'  {versao.versao:>3}  {versao.aplicada_em:%Y-%m-%d %H:%M}  {versao.descricao}')
+
+
+@click.command('definir-admin')
+@click.argument('email')
+@click.option('--remover', is_flag=True, help='Retira o papel de administrador')
+@with_appcontext
+def definir_admin_comando(email, remover):
+    """Concede (ou retira) o papel de administrador de um usuário"""
+    from src.models.user import User
+
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        raise click.ClickException(f'Usuário {email} não encontrado')
+
+    user.is_admin = not remover
+    db.session.commit()
+    click.echo(f"{email}: {'administrador' if user.is_admin else 'usuário comum'}")
+
+
+def registrar_comandos(app):
+    """Registra os comandos de linha de comando (flask <comando>) na aplicação"""
+    app.cli.add_command(reconstruir_contagens_comando)
+    app.cli.add_command(reconstruir_numeros_apostados_comando)
+    app.cli.add_command(reconstruir_estatisticas_comando)
+    app.cli.add_command(reconstruir_indice_bilhetes_comando)
+    app.cli.add_command(migrar_comando)
+    app.cli.add_command(bulk_load_comando)
+    app.cli.add_command(definir_admin_comando)
@@ -0,0 +1,99 @@
+from .database import db
+from collections import Counter
+
+class ContagemNumero(db.Model):
+    """Contador de apostas por número (1 a 500) de cada sorteio.
+
+    Mantido na mesma transação em que as apostas são registradas, para que o
+    sorteio atual possa ser exibido sem ler as apostas do dia.
+    """
+    __tablename__ = 'contagem_numeros'
+
+    sorteio_id = db.Column(db.Integer, db.ForeignKey('sorteios.id'), primary_key=True)
+    numero = db.Column(db.Integer, primary_key=True)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ContagemNumero sorteio {self.sorteio_id} - {self.numero}: {self.quantidade}>'
+
+
+def _insert_com_conflito(dialeto):
+    """Retorna o construtor de INSERT com suporte a ON CONFLICT do dialeto, se houver"""
+    if dialeto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialeto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+def incrementar_contagens(sorteio_id, numeros):
+    """Soma as novas apostas aos contadores do sorteio (sem commit)"""
+    contagens = Counter(numeros)
+    if not contagens:
+        return
+
+    tabela = ContagemNumero.__table__
+    linhas = [
+        {'sorteio_id': sorteio_id, 'numero': numero, 'quantidade': quantidade}
+        for numero, quantidade in contagens.items()
+    ]
+
+    insert = _insert_com_conflito(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(tabela)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabela.c.sorteio_id, tabela.c.numero],
+            set_={'quantidade': tabela.c.quantidade + stmt.excluded.quantidade}
+        )
+        db.session.execute(stmt, linhas)
+        return
+
+    # Bancos sem upsert: atualiza os existentes e insere os que faltam
+    for linha in linhas:
+        resultado = db.session.execute(
+            db.update(tabela)
+            .where(tabela.c.sorteio_id == sorteio_id, tabela.c.numero == linha['numero'])
+            .values(quantidade=tabela.c.quantidade + linha['quantidade'])
+        )
+        if resultado.rowcount == 0:
+            db.session.execute(db.insert(tabela), [linha])
+
+
+def histograma_sorteio(sorteio_id):
+    """Retorna {numero: quantidade} do sorteio, lendo no máximo 500 linhas"""
+    linhas = db.session.query(ContagemNumero.numero, ContagemNumero.quantidade).filter(
+        ContagemNumero.sorteio_id == sorteio_id,
+        ContagemNumero.quantidade > 0
+    ).all()
+
+    return {numero: quantidade for numero, quantidade in linhas}
+
+
+def reconstruir_contagens(sorteio_id=None):
+    """Recalcula os contadores a partir da tabela de apostas (sem commit).
+
+    Sem sorteio_id, reconstrói os contadores de todos os sorteios.
+    Retorna o número de linhas de contagem gravadas.
+    """
+    from .aposta import Aposta
+
+    tabela = ContagemNumero.__table__
+
+    apagar = db.delete(tabela)
+    agregado = db.select(
+        Aposta.sorteio_id,
+        Aposta.numero_escolhido,
+        db.func.count(Aposta.id)
+    ).group_by(Aposta.sorteio_id, Aposta.numero_escolhido)
+
+    if sorteio_id is not None:
+        apagar = apagar.where(tabela.c.sorteio_id == sorteio_id)
+        agregado = agregado.where(Aposta.sorteio_id == sorteio_id)
+
+    db.session.execute(apagar)
+    resultado = db.session.execute(
+        db.insert(tabela).from_select(['sorteio_id', 'numero', 'quantidade'], agregado)
+    )
+    return resultado.rowcount
@@ -1,11 +1,94 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from datetime import datetime
 
 db = SQLAlchemy()
 
+# Perfis de engine, escolhidos por BANCO_PERFIL (ou pelo dialeto da URL).
+# ``pragmas`` são aplicados pelo SQLite em cada nova conexão; ``engine`` vai
+# para SQLALCHEMY_ENGINE_OPTIONS (pool, timeouts).
+PERFIS_BANCO = {
+    'sqlite': {
+        'pragmas': {
+            'journal_mode': 'WAL',  # leitores não bloqueiam o escritor
+            'synchronous': 'NORMAL',  # com WAL, fsync só nos checkpoints
+            'busy_timeout': 5000,  # espera o lock de escrita em vez de "database is locked"
+            'foreign_keys': 'ON',
+            'cache_size': -64000,  # em KiB: 64 MiB de cache de páginas
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'MEMORY',
+        },
+        'engine': {},
+    },
+    # Configuração padrão do SQLite, sem ajustes (referência para benchmarks)
+    'sqlite-padrao': {
+        'pragmas': {},
+        'engine': {},
+    },
+    'postgres': {
+        'pragmas': {},
+        'engine': {
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_timeout': 30,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+        },
+    },
+}
+
+
+def normalizar_url_banco(url):
+    """Aceita o esquema postgres:// (Heroku e afins), que o SQLAlchemy 2 não reconhece"""
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def perfil_banco(app):
+    """Nome do perfil de engine da aplicação: BANCO_PERFIL ou o deduzido da URL"""
+    perfil = app.config.get('BANCO_PERFIL')
+    if perfil:
+        if perfil not in PERFIS_BANCO:
+            raise ValueError(f'Perfil de banco desconhecido: {perfil}')
+        return perfil
+
+    url = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    return 'postgres' if url.startswith('postgresql') else 'sqlite'
+
+
+def aplicar_pragmas(engine, pragmas):
+    """Executa os PRAGMAs do perfil em cada conexão aberta pelo engine"""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _configurar_conexao(conexao_dbapi, registro):
+        cursor = conexao_dbapi.cursor()
+        try:
+            for nome, valor in pragmas.items():
+                cursor.execute(f'PRAGMA {nome}={valor}')
+        finally:
+            cursor.close()
+
+
 def init_db(app):
     """Inicializa o banco de dados com a aplicação Flask"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalizar_url_banco(app.config['SQLALCHEMY_DATABASE_URI'])
+    perfil = PERFIS_BANCO[perfil_banco(app)]
+
+    # Opções explícitas da aplicação prevalecem sobre as do perfil
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **perfil['engine'], **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+
     db.init_app(app)
     with app.app_context():
-        db.create_all()
+        if db.engine.dialect.name == 'sqlite':
+            aplicar_pragmas(db.engine, perfil['pragmas'])
 
+        # create_all() não altera tabelas existentes; índices e colunas novas
+        # chegam aos bancos já em uso pelas migrações versionadas. Os dois rodam
+        # sob a trava de migrações, porque todos os workers passam por aqui ao subir
+        from .migracoes import aplicar_migracoes
+        aplicar_migracoes(criar_tabelas=True)
@@ -0,0 +1,373 @@
+from .database import db
+from .user import User
+from .sorteio import Sorteio
+from .contagem_numeros import _insert_com_conflito
+from sqlalchemy import event
+from collections import Counter
+from datetime import date
+import random
+
+# Id da linha que reconstruir_estatisticas grava com os totais consolidados
+ID_GERAL = 1
+
+# Quantidade de linhas (fatias) entre as quais os incrementos são espalhados
+FATIAS_GERAIS = 16
+
+
+class EstatisticaGeral(db.Model):
+    """Totais acumulados de todo o histórico, divididos em fatias.
+
+    Mantidos na mesma transação das operações que os alteram (cadastro,
+    movimentação de saldo, apostas, sorteio e liquidação), para que as telas
+    de estatísticas leiam até FATIAS_GERAIS linhas em vez de agregar as tabelas
+    inteiras. Cada conexão incrementa sempre a mesma fatia, então transações
+    concorrentes não disputam o lock de uma única linha; o total é a soma das fatias.
+    """
+    __tablename__ = 'estatisticas_gerais'
+
+    id = db.Column(db.Integer, primary_key=True)
+    total_usuarios = db.Column(db.Integer, nullable=False, default=0)
+    usuarios_ativos = db.Column(db.Integer, nullable=False, default=0)
+    saldo_total_usuarios = db.Column(db.Float, nullable=False, default=0.0)
+    total_sorteios = db.Column(db.Integer, nullable=False, default=0)
+    sorteios_realizados = db.Column(db.Integer, nullable=False, default=0)
+    sorteios_finalizados = db.Column(db.Integer, nullable=False, default=0)
+    total_apostas = db.Column(db.Integer, nullable=False, default=0)
+    total_arrecadado = db.Column(db.Float, nullable=False, default=0.0)
+    total_premiado = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Incrementada a cada aposta, sorteio e liquidação; compõe a chave do cache de respostas
+    versao = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Incrementada só quando um sorteio é realizado ou liquidado; chave do cache de /historico,
+    # que não deve mudar a cada aposta como a versão acima
+    versao_historico = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Incrementada a cada alteração do catálogo de modalidades pelo admin (services/catalogo.py)
+    versao_catalogo = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'total_usuarios': self.total_usuarios,
+            'usuarios_ativos': self.usuarios_ativos,
+            'saldo_total_usuarios': self.saldo_total_usuarios,
+            'total_sorteios': self.total_sorteios,
+            'sorteios_realizados': self.sorteios_realizados,
+            'sorteios_finalizados': self.sorteios_finalizados,
+            'total_apostas': self.total_apostas,
+            'total_arrecadado': self.total_arrecadado,
+            'total_premiado': self.total_premiado
+        }
+
+
+class EstatisticaDiaria(db.Model):
+    """Totais por dia: apostas e prêmios pela data do sorteio, cadastros pela data de criação"""
+    __tablename__ = 'estatisticas_diarias'
+
+    data = db.Column(db.Date, primary_key=True)
+    total_apostas = db.Column(db.Integer, nullable=False, default=0)
+    total_arrecadado = db.Column(db.Float, nullable=False, default=0.0)
+    total_premiado = db.Column(db.Float, nullable=False, default=0.0)
+    sorteios_realizados = db.Column(db.Integer, nullable=False, default=0)
+    novos_usuarios = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'data': self.data.isoformat(),
+            'total_apostas': self.total_apostas,
+            'total_arrecadado': self.total_arrecadado,
+            'total_premiado': self.total_premiado,
+            'sorteios_realizados': self.sorteios_realizados,
+            'novos_usuarios': self.novos_usuarios
+        }
+
+
+class EstatisticaNumero(db.Model):
+    """Quantas vezes cada número (1 a 500) foi apostado e sorteado em todo o histórico"""
+    __tablename__ = 'estatisticas_numeros'
+
+    numero = db.Column(db.Integer, primary_key=True)
+    vezes_apostado = db.Column(db.Integer, nullable=False, default=0)
+    vezes_sorteado = db.Column(db.Integer, nullable=False, default=0)
+
+
+def _dialeto(executor):
+    """Nome do dialeto de uma sessão ou de uma conexão"""
+    if hasattr(executor, 'get_bind'):
+        return executor.get_bind().dialect.name
+    return executor.dialect.name
+
+
+def _somar(executor, modelo, chave, incrementos):
+    """Soma os incrementos às colunas da linha identificada por ``chave``, criando-a se preciso.
+
+    ``executor`` é a sessão ou, dentro de eventos de flush, a conexão em uso.
+    """
+    incrementos = {coluna: valor for coluna, valor in incrementos.items() if valor}
+    if not incrementos:
+        return
+
+    tabela = modelo.__table__
+    insert = _insert_com_conflito(_dialeto(executor))
+    if insert is not None:
+        stmt = insert(tabela).values(**chave, **incrementos)
+        executor.execute(stmt.on_conflict_do_update(
+            index_elements=[tabela.c[coluna] for coluna in chave],
+            set_={coluna: tabela.c[coluna] + stmt.excluded[coluna] for coluna in incrementos}
+        ))
+        return
+
+    # Bancos sem upsert: atualiza a linha existente ou a insere
+    resultado = executor.execute(
+        db.update(tabela)
+        .where(*[tabela.c[coluna] == valor for coluna, valor in chave.items()])
+        .values({coluna: tabela.c[coluna] + valor for coluna, valor in incrementos.items()})
+    )
+    if resultado.rowcount == 0:
+        executor.execute(db.insert(tabela).values(**chave, **incrementos))
+
+
+def _fatia(executor):
+    """Id da fatia de EstatisticaGeral usada pela conexão do executor.
+
+    Sorteada uma vez por conexão do pool e guardada em ``Connection.info``: uma
+    transação nunca toca duas fatias (sem risco de deadlock entre elas) e
+    conexões diferentes tendem a cair em linhas diferentes.
+    """
+    conexao = executor.connection() if hasattr(executor, 'get_bind') else executor
+    return conexao.info.setdefault('fatia_estatisticas', random.randint(1, FATIAS_GERAIS))
+
+
+def somar_gerais(executor=None, **incrementos):
+    """Soma incrementos aos totais gerais, na fatia da conexão em uso (sem commit)"""
+    executor = executor or db.session
+    if any(incrementos.values()):
+        _somar(executor, EstatisticaGeral, {'id': _fatia(executor)}, incrementos)
+
+
+def somar_diarias(data, executor=None, **incrementos):
+    """Soma incrementos aos totais do dia (sem commit)"""
+    _somar(executor or db.session, EstatisticaDiaria, {'data': data}, incrementos)
+
+
+def registrar_apostas_estatisticas(sorteio, numeros, valor_total):
+    """Contabiliza um lote de apostas aceitas nos totais gerais, do dia e por número (sem commit)"""
+    quantidade = len(numeros)
+    somar_gerais(versao=1, total_apostas=quantidade, total_arrecadado=valor_total)
+    somar_diarias(sorteio.data_sorteio, total_apostas=quantidade, total_arrecadado=valor_total)
+
+    contagens = Counter(numeros)
+    tabela = EstatisticaNumero.__table__
+    insert = _insert_com_conflito(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(tabela)
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[tabela.c.numero],
+                set_={'vezes_apostado': tabela.c.vezes_apostado + stmt.excluded.vezes_apostado}
+            ),
+            [{'numero': numero, 'vezes_apostado': vezes} for numero, vezes in contagens.items()]
+        )
+        return
+
+    for numero, vezes in contagens.items():
+        _somar(db.session, EstatisticaNumero, {'numero': numero}, {'vezes_apostado': vezes})
+
+
+def registrar_sorteio_realizado(sorteio):
+    """Contabiliza o número sorteado e o prêmio de um sorteio recém-realizado (sem commit)"""
+    somar_gerais(versao=1, versao_historico=1, sorteios_realizados=1, total_premiado=sorteio.premio_total)
+    somar_diarias(sorteio.data_sorteio, sorteios_realizados=1, total_premiado=sorteio.premio_total)
+    _somar(db.session, EstatisticaNumero, {'numero': sorteio.numero_sorteado}, {'vezes_sorteado': 1})
+
+
+_COLUNAS_GERAIS = (
+    'total_usuarios', 'usuarios_ativos', 'saldo_total_usuarios', 'total_sorteios',
+    'sorteios_realizados', 'sorteios_finalizados', 'total_apostas', 'total_arrecadado',
+    'total_premiado', 'versao', 'versao_historico', 'versao_catalogo'
+)
+
+
+def somar_fatias(*colunas):
+    """SELECT com a soma de cada coluna de EstatisticaGeral sobre todas as fatias (zero se vazias)"""
+    return db.select(*[db.func.coalesce(db.func.sum(coluna), 0) for coluna in colunas])
+
+
+def estatisticas_gerais():
+    """Retorna os totais gerais somados das fatias, em um objeto transiente (zerado se não houver linhas)"""
+    totais = db.session.execute(
+        somar_fatias(*[getattr(EstatisticaGeral, coluna) for coluna in _COLUNAS_GERAIS])
+    ).one()
+    return EstatisticaGeral(id=ID_GERAL, **dict(zip(_COLUNAS_GERAIS, totais)))
+
+
+def numeros_mais_frequentes(coluna, limite=10):
+    """Retorna [(numero, vezes)] dos números com mais apostas ou sorteios, lendo a tabela de 500 linhas"""
+    return db.session.query(EstatisticaNumero.numero, coluna).filter(
+        coluna > 0
+    ).order_by(coluna.desc(), EstatisticaNumero.numero).limit(limite).all()
+
+
+def ultimos_dias(quantidade=30):
+    """Retorna as linhas diárias mais recentes, da mais nova para a mais antiga"""
+    return EstatisticaDiaria.query.order_by(EstatisticaDiaria.data.desc()).limit(quantidade).all()
+
+
+def reconstruir_estatisticas(sessao=None):
+    """Recalcula do zero todas as tabelas de estatísticas a partir dos dados (sem commit).
+
+    Usa a sessão informada ou db.session. Retorna o número de linhas diárias e
+    por número gravadas.
+    """
+    from .aposta import Aposta
+
+    sessao = sessao or db.session
+
+    # As versões só avançam, para não reaproveitar chaves de cache antigas
+    versao, versao_historico, versao_catalogo = sessao.execute(somar_fatias(
+        EstatisticaGeral.versao, EstatisticaGeral.versao_historico, EstatisticaGeral.versao_catalogo
+    )).one()
+
+    for modelo in (EstatisticaGeral, EstatisticaDiaria, EstatisticaNumero):
+        sessao.execute(db.delete(modelo.__table__))
+
+    realizado = Sorteio.status != 'aberto'
+    sorteios = sessao.query(
+        db.func.count(Sorteio.id),
+        db.func.count(db.case((realizado, 1))),
+        db.func.count(db.case((Sorteio.status == 'finalizado', 1))),
+        db.func.coalesce(db.func.sum(Sorteio.total_apostas), 0),
+        db.func.coalesce(db.func.sum(Sorteio.total_arrecadado), 0.0),
+        db.func.coalesce(db.func.sum(db.case((realizado, Sorteio.premio_total), else_=0.0)), 0.0)
+    ).one()
+    usuarios = sessao.query(
+        db.func.count(User.id),
+        db.func.count(db.case((User.ativo.is_(True), 1))),
+        db.func.coalesce(db.func.sum(User.saldo), 0.0)
+    ).one()
+
+    # Os totais consolidados ficam em uma fatia só; as demais voltam a ser criadas pelo uso
+    sessao.add(EstatisticaGeral(
+        id=ID_GERAL,
+        total_usuarios=usuarios[0],
+        usuarios_ativos=usuarios[1],
+        saldo_total_usuarios=usuarios[2],
+        total_sorteios=sorteios[0],
+        sorteios_realizados=sorteios[1],
+        sorteios_finalizados=sorteios[2],
+        total_apostas=sorteios[3],
+        total_arrecadado=sorteios[4],
+        total_premiado=sorteios[5],
+        versao=versao + 1,
+        versao_historico=versao_historico + 1,
+        versao_catalogo=versao_catalogo
+    ))
+
+    # Diárias: os totais por sorteio já estão nas colunas de sorteios
+    dias = {}
+
+    def dia(data):
+        if data not in dias:
+            dias[data] = EstatisticaDiaria(
+                data=data, total_apostas=0, total_arrecadado=0.0, total_premiado=0.0,
+                sorteios_realizados=0, novos_usuarios=0
+            )
+        return dias[data]
+
+    for sorteio in sessao.query(
+        Sorteio.data_sorteio, Sorteio.status, Sorteio.total_apostas,
+        Sorteio.total_arrecadado, Sorteio.premio_total
+    ):
+        linha = dia(sorteio.data_sorteio)
+        linha.total_apostas += sorteio.total_apostas or 0
+        linha.total_arrecadado += sorteio.total_arrecadado or 0.0
+        if sorteio.status != 'aberto':
+            linha.sorteios_realizados += 1
+            linha.total_premiado += sorteio.premio_total or 0.0
+
+    for data_criacao, quantidade in sessao.query(
+        db.func.date(User.data_criacao), db.func.count(User.id)
+    ).group_by(db.func.date(User.data_criacao)):
+        if data_criacao is not None:
+            if isinstance(data_criacao, str):
+                data_criacao = date.fromisoformat(data_criacao)
+            dia(data_criacao).novos_usuarios += quantidade
+
+    sessao.add_all(dias.values())
+
+    # Por número: apostas agregadas uma única vez aqui, sorteios pelo número sorteado
+    numeros = {}
+    for numero, vezes in sessao.query(
+        Aposta.numero_escolhido, db.func.count(Aposta.id)
+    ).group_by(Aposta.numero_escolhido):
+        numeros[numero] = EstatisticaNumero(numero=numero, vezes_apostado=vezes, vezes_sorteado=0)
+
+    for numero, vezes in sessao.query(
+        Sorteio.numero_sorteado, db.func.count(Sorteio.id)
+    ).filter(Sorteio.numero_sorteado.isnot(None), realizado).group_by(Sorteio.numero_sorteado):
+        numeros.setdefault(
+            numero, EstatisticaNumero(numero=numero, vezes_apostado=0, vezes_sorteado=0)
+        ).vezes_sorteado = vezes
+
+    sessao.add_all(numeros.values())
+    sessao.flush()
+
+    return len(dias) + len(numeros)
+
+
+def _carregar_valor_anterior(target, value, oldvalue, initiator):
+    """Não faz nada: existe só para registrar o evento com ``active_history=True``.
+
+    Com essa opção o SQLAlchemy carrega o valor anterior antes de uma atribuição,
+    mesmo com o atributo expirado (depois de um commit ou de um UPDATE relativo
+    da carteira), e o after_update abaixo recebe a diferença no histórico. As
+    colunas são declaradas no modelo User, fora deste módulo; o evento liga a
+    opção sem mexer na declaração delas.
+    """
+
+
+for _atributo in (User.ativo, User.saldo):
+    event.listen(_atributo, 'set', _carregar_valor_anterior, active_history=True)
+
+
+@event.listens_for(User, 'after_insert')
+def _contar_usuario_novo(mapper, connection, target):
+    """Cadastros entram nos totais gerais e do dia"""
+    somar_gerais(
+        connection,
+        total_usuarios=1,
+        usuarios_ativos=1 if target.ativo else 0,
+        saldo_total_usuarios=target.saldo or 0.0
+    )
+    data_criacao = target.data_criacao.date() if target.data_criacao else date.today()
+    somar_diarias(data_criacao, connection, novos_usuarios=1)
+
+
+@event.listens_for(User, 'after_update')
+def _contar_usuario_alterado(mapper, connection, target):
+    """Mudanças de status e de saldo feitas pelo ORM ajustam os totais gerais.
+
+    As movimentações da carteira (UPDATE relativo) não passam por aqui e
+    ajustam o saldo total diretamente.
+    """
+    estado = db.inspect(target)
+    incrementos = {}
+
+    ativo = estado.attrs.ativo.history
+    if ativo.has_changes():
+        antes = bool(ativo.deleted[0]) if ativo.deleted else False
+        incrementos['usuarios_ativos'] = int(bool(target.ativo)) - int(antes)
+
+    saldo = estado.attrs.saldo.history
+    if saldo.has_changes():
+        antes = saldo.deleted[0] if saldo.deleted and saldo.deleted[0] is not None else 0.0
+        incrementos['saldo_total_usuarios'] = (target.saldo or 0.0) - antes
+
+    somar_gerais(connection, **incrementos)
+
+
+@event.listens_for(Sorteio, 'after_insert')
+def _contar_sorteio_novo(mapper, connection, target):
+    somar_gerais(connection, total_sorteios=1)
@@ -0,0 +1,409 @@
+from src.models.database import db
+from src.models.user import User
+from src.models.sorteio import Sorteio, SorteioFechado
+from src.models.bitset_numeros import BitsetNumeros
+from src.models.numeros_usuario_sorteio import carregar_numeros_apostados
+from src.services.registro_apostas import (
+    registrar_apostas, numero_valido, VALOR_APOSTA,
+    MOTIVO_NUMERO_INVALIDO, MOTIVO_REPETIDO_NO_LOTE, MOTIVO_JA_APOSTADO, MOTIVO_SALDO_INSUFICIENTE
+)
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+import atexit
+import itertools
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MOTIVO_SORTEIO_FECHADO = 'Sorteio não está aberto para apostas'
+
+
+class ReservaParcial(Exception):
+    """Só parte dos números da reserva caberia na gravação; nada dela é gravado"""
+
+
+class Reserva:
+    """Apostas validadas e aceitas, aguardando gravação pelo escritor"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, user_id, sorteio_id, numeros, valor_aposta, resultados):
+        self.id = next(self._ids)
+        self.user_id = user_id
+        self.sorteio_id = sorteio_id
+        self.numeros = numeros
+        self.valor_aposta = valor_aposta
+        self.resultados = resultados
+        self.estado = 'pendente'  # pendente, gravada, rejeitada
+        self.erro = None
+        self.liberada = False  # retenção e marcações já soltas pela escritora
+        self.criada_em = datetime.utcnow()
+        self.gravada_em = None
+
+    def rejeitar(self, motivo):
+        """Marca a reserva como rejeitada na gravação, junto com os números que estavam aceitos"""
+        self.estado, self.erro = 'rejeitada', motivo
+        for resultado in self.resultados:
+            if resultado['numero'] in self.numeros:
+                resultado.pop('aposta_id', None)
+                resultado.update(aceita=False, motivo=motivo)
+
+    @property
+    def valor_total(self):
+        return self.valor_aposta * len(self.numeros)
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'id': self.id,
+            'sorteio_id': self.sorteio_id,
+            'estado': self.estado,
+            'numeros': self.numeros,
+            'valor_total': self.valor_total,
+            'resultados': self.resultados,
+            'erro': self.erro,
+            'criada_em': self.criada_em.isoformat(),
+            'gravada_em': self.gravada_em.isoformat() if self.gravada_em else None
+        }
+
+
+class FilaApostas:
+    """Ingestão de apostas com gravação posterior (write-behind), opcional.
+
+    Com INGESTAO_APOSTAS_ASSINCRONA habilitada, cada aposta validada vira uma
+    reserva: o valor fica retido do saldo disponível e os números ficam
+    marcados para o usuário, e a resposta sai sem esperar o banco. Uma única
+    thread escritora grava as reservas em apostas com registrar_apostas(), em
+    transações que agrupam centenas de números, o que troca um commit (e uma
+    disputa pelo lock de escrita do SQLite) por aposta por um commit por lote.
+
+    O corte é uma barreira: drenar() fecha o sorteio para novas reservas e
+    espera a fila dele esvaziar, e só então o sorteio pode ser realizado.
+
+    A conferência de saldo e de duplicadas soma o banco com o que está retido
+    em memória, e os dois precisam ser do mesmo instante. A escritora solta as
+    retenções de um commit sob o lock, no mesmo passo que o confirma, e conta
+    cada commit em ``_geracao`` (ímpar enquanto ele está em curso). reservar()
+    lê o banco fora do lock e refaz a leitura se a geração mudou nesse meio
+    tempo, então nunca conta uma aposta gravada duas vezes (banco e retenção)
+    nem nenhuma vez.
+
+    As reservas vivem na memória deste processo; o modo assíncrono supõe que
+    um único processo receba as apostas. A gravação revalida saldo, números e
+    status do sorteio, então uma reserva que não caiba mais é rejeitada, nunca
+    gravada pela metade.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.habilitada = False
+        self.maximo_lote = 500
+        self.janela_agrupamento = 0.02
+        self._fila = queue.Queue()
+        self._lock = threading.Lock()
+        self._drenada = threading.Condition(self._lock)
+        self._reservado = defaultdict(float)  # user_id -> valor retido
+        self._marcados = {}  # (user_id, sorteio_id) -> BitsetNumeros pendentes
+        self._pendentes = defaultdict(int)  # sorteio_id -> reservas não gravadas
+        self._fechados = set()
+        self._geracao = 0  # commits da escritora; ímpar durante um commit
+        self._gravacao = threading.Condition(self._lock)
+        self._reservas = OrderedDict()  # últimas reservas, para consulta do estado
+        self._maximo_reservas = 10000
+        self._thread = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configura a fila (INGESTAO_APOSTAS_ASSINCRONA, INGESTAO_MAXIMO_LOTE, INGESTAO_JANELA_SEGUNDOS)"""
+        self.app = app
+        self.habilitada = app.config.get('INGESTAO_APOSTAS_ASSINCRONA', False)
+        self.maximo_lote = app.config.get('INGESTAO_MAXIMO_LOTE', self.maximo_lote)
+        self.janela_agrupamento = app.config.get('INGESTAO_JANELA_SEGUNDOS', self.janela_agrupamento)
+
+        if self.habilitada:
+            atexit.register(self.drenar_tudo)
+
+    def _iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._escrever, name='escritor-apostas', daemon=True)
+            self._thread.start()
+
+    # Recepção
+
+    def reservar(self, user_id, sorteio, numeros, valor_aposta=VALOR_APOSTA):
+        """Valida os números e reserva os aceitos; retorna (reserva ou None, resultados).
+
+        Faz o mesmo que registrar_apostas() sem escrever no banco: a conferência
+        de duplicadas e de saldo considera o que já está gravado mais o que está
+        reservado e ainda não foi gravado. Levanta SorteioFechado após o corte.
+        """
+        resultados = []
+        candidatos = []
+        vistos = set()
+
+        for numero in numeros:
+            if not numero_valido(numero):
+                resultados.append({'numero': numero, 'aceita': False, 'motivo': MOTIVO_NUMERO_INVALIDO})
+            elif numero in vistos:
+                resultados.append({'numero': numero, 'aceita': False, 'motivo': MOTIVO_REPETIDO_NO_LOTE})
+            else:
+                vistos.add(numero)
+                resultado = {'numero': numero, 'aceita': True}
+                resultados.append(resultado)
+                candidatos.append(resultado)
+
+        while True:
+            with self._lock:
+                if sorteio.id in self._fechados:
+                    raise SorteioFechado()
+                # Um commit em curso muda o banco e as retenções juntos: espera ele terminar
+                self._gravacao.wait_for(lambda: self._geracao % 2 == 0)
+                geracao = self._geracao
+
+            # Leituras do banco fora do lock, sem segurar as outras requisições nem a escritora
+            apostados = carregar_numeros_apostados(user_id, sorteio.id)
+            saldo = db.session.execute(db.select(User.saldo).where(User.id == user_id)).scalar_one()
+
+            with self._lock:
+                if self._geracao != geracao:
+                    # A escritora confirmou um lote durante as leituras: relê
+                    continue
+                reserva = self._reservar(
+                    user_id, sorteio, apostados, saldo, resultados, candidatos, valor_aposta
+                )
+            break
+
+        if reserva is not None:
+            self._fila.put(reserva)
+        return reserva, resultados
+
+    def _reservar(self, user_id, sorteio, apostados, saldo, resultados, candidatos, valor_aposta):
+        """Confere os candidatos contra o banco lido e as retenções e reserva os aceitos (com o lock)"""
+        if sorteio.id in self._fechados:
+            raise SorteioFechado()
+
+        chave = (user_id, sorteio.id)
+        marcados = self._marcados.get(chave)
+        if marcados is not None:
+            apostados = apostados | marcados
+        disponivel = saldo - self._reservado[user_id]
+
+        aceitos = []
+        for resultado in candidatos:
+            numero = resultado['numero']
+            if numero in apostados:
+                resultado.update(aceita=False, motivo=MOTIVO_JA_APOSTADO)
+            elif disponivel < valor_aposta:
+                resultado.update(aceita=False, motivo=MOTIVO_SALDO_INSUFICIENTE)
+            else:
+                disponivel -= valor_aposta
+                aceitos.append(numero)
+
+        if not aceitos:
+            return None
+
+        reserva = Reserva(user_id, sorteio.id, aceitos, valor_aposta, resultados)
+        self._reservado[user_id] += reserva.valor_total
+        self._marcados.setdefault(chave, BitsetNumeros()).bits |= BitsetNumeros(aceitos).bits
+        self._pendentes[sorteio.id] += 1
+        self._guardar(reserva)
+
+        self._iniciar()
+        return reserva
+
+    def saldo_disponivel(self, user_id, saldo):
+        """Saldo do usuário descontado do que está retido em reservas"""
+        with self._lock:
+            return saldo - self._reservado.get(user_id, 0.0)
+
+    def total_pendentes(self):
+        """Reservas aceitas e ainda não gravadas, em todos os sorteios"""
+        with self._lock:
+            return sum(self._pendentes.values())
+
+    def obter_reserva(self, reserva_id):
+        with self._lock:
+            return self._reservas.get(reserva_id)
+
+    def _guardar(self, reserva):
+        self._reservas[reserva.id] = reserva
+        while len(self._reservas) > self._maximo_reservas:
+            self._reservas.popitem(last=False)
+
+    # Barreira do corte
+
+    def drenar(self, sorteio_id, timeout=60):
+        """Fecha o sorteio para novas reservas e espera todas as dele serem gravadas.
+
+        Retorna True se a fila do sorteio esvaziou dentro do prazo.
+        """
+        with self._lock:
+            self._fechados.add(sorteio_id)
+            return self._drenada.wait_for(lambda: self._pendentes.get(sorteio_id, 0) == 0, timeout=timeout)
+
+    def drenar_tudo(self, timeout=30):
+        """Espera a gravação de todas as reservas (ao encerrar o processo)"""
+        with self._lock:
+            return self._drenada.wait_for(
+                lambda: not any(self._pendentes.values()), timeout=timeout
+            )
+
+    # Gravação
+
+    def _proximo_lote(self):
+        """Espera a primeira reserva e junta as que chegarem na janela, até o máximo do lote"""
+        lote = [self._fila.get()]
+        numeros = len(lote[0].numeros)
+        limite = time.monotonic() + self.janela_agrupamento
+
+        while numeros < self.maximo_lote:
+            restante = limite - time.monotonic()
+            try:
+                reserva = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+            except queue.Empty:
+                break
+            lote.append(reserva)
+            numeros += len(reserva.numeros)
+
+        return lote
+
+    def _escrever(self):
+        while True:
+            lote = self._proximo_lote()
+            try:
+                with self.app.app_context():
+                    try:
+                        self._gravar_lote(lote)
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                logger.error(f"Erro ao gravar lote de {len(lote)} reservas: {str(e)}")
+                for reserva in lote:
+                    if reserva.estado == 'pendente':
+                        reserva.rejeitar(str(e))
+            finally:
+                # Rejeitadas não mudaram o banco: podem ser soltas a qualquer momento
+                self._liberar([reserva for reserva in lote if not reserva.liberada])
+
+    def _confirmar(self, lote):
+        """Faz o commit das reservas aplicadas e solta as retenções delas no mesmo passo.
+
+        Enquanto o commit está em curso a geração fica ímpar e reservar() espera,
+        para não ler o banco já com as apostas e as retenções ainda com elas.
+        """
+        with self._lock:
+            self._geracao += 1
+        gravadas = []
+        try:
+            db.session.commit()
+            gravadas = [reserva for reserva in lote if reserva.estado == 'gravada']
+        finally:
+            with self._lock:
+                self._soltar(gravadas)
+                self._geracao += 1
+                self._gravacao.notify_all()
+                self._drenada.notify_all()
+
+    def _gravar_lote(self, lote):
+        """Grava o lote em uma única transação; se ela falhar, grava reserva por reserva"""
+        inicio = time.perf_counter()
+        try:
+            self._aplicar(lote)
+            self._confirmar(lote)
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Lote de {len(lote)} reservas falhou ({str(e)}); gravando individualmente")
+            for reserva in lote:
+                reserva.estado = 'pendente'
+                try:
+                    self._aplicar([reserva])
+                    self._confirmar([reserva])
+                except Exception as erro:
+                    db.session.rollback()
+                    reserva.rejeitar(str(erro))
+                else:
+                    self._marcar_gravada(reserva)
+            return
+
+        for reserva in lote:
+            self._marcar_gravada(reserva)
+        logger.debug(
+            f"{len(lote)} reservas gravadas em {round((time.perf_counter() - inicio) * 1000, 3)} ms"
+        )
+
+    @staticmethod
+    def _marcar_gravada(reserva):
+        if reserva.estado == 'gravada':
+            reserva.gravada_em = datetime.utcnow()
+
+    def _aplicar(self, lote):
+        """Registra as reservas na sessão, sem commit"""
+        usuarios = {
+            user.id: user
+            for user in User.query.filter(User.id.in_({reserva.user_id for reserva in lote})).all()
+        }
+        sorteios = {
+            sorteio.id: sorteio
+            for sorteio in Sorteio.query.filter(Sorteio.id.in_({reserva.sorteio_id for reserva in lote})).all()
+        }
+
+        for reserva in lote:
+            sorteio = sorteios[reserva.sorteio_id]
+            if sorteio.status != 'aberto':
+                reserva.rejeitar(MOTIVO_SORTEIO_FECHADO)
+                continue
+
+            aceitas, resultados = registrar_apostas(
+                usuarios[reserva.user_id], sorteio, reserva.numeros, reserva.valor_aposta
+            )
+
+            if not aceitas:
+                reserva.rejeitar(next(resultado['motivo'] for resultado in resultados if not resultado['aceita']))
+                continue
+
+            # registrar_apostas aceita número a número; uma reserva que só caberia em
+            # parte desfaz a transação e, na gravação individual, é rejeitada inteira
+            if len(aceitas) != len(reserva.numeros):
+                raise ReservaParcial(
+                    next(resultado['motivo'] for resultado in resultados if not resultado['aceita'])
+                )
+
+            # O resultado final de cada número é o da gravação
+            finais = {resultado['numero']: resultado for resultado in resultados}
+            for resultado in reserva.resultados:
+                if resultado['aceita']:
+                    resultado.update(finais[resultado['numero']])
+
+            reserva.estado = 'gravada'
+
+    def _liberar(self, lote):
+        """Solta retenções e marcações das reservas rejeitadas do lote e avisa a barreira"""
+        with self._lock:
+            self._soltar(lote)
+            self._drenada.notify_all()
+
+    def _soltar(self, lote):
+        """Tira as reservas da retenção, das marcações e das pendências do sorteio (com o lock)"""
+        for reserva in lote:
+            reserva.liberada = True
+            self._reservado[reserva.user_id] -= reserva.valor_total
+            if self._reservado[reserva.user_id] <= 1e-9:
+                del self._reservado[reserva.user_id]
+
+            chave = (reserva.user_id, reserva.sorteio_id)
+            marcados = self._marcados.get(chave)
+            if marcados is not None:
+                marcados.bits &= ~BitsetNumeros(reserva.numeros).bits
+                if not marcados.bits:
+                    del self._marcados[chave]
+
+            self._pendentes[reserva.sorteio_id] -= 1
+            if self._pendentes[reserva.sorteio_id] == 0:
+                del self._pendentes[reserva.sorteio_id]
+
+fila_apostas = FilaApostas()
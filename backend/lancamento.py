@@ -0,0 +1,41 @@
+from .database import db
+from datetime import datetime
+
+class Lancamento(db.Model):
+    """Lançamento do extrato de saldo do usuário (somente inclusão)
+
+    Cada movimentação de saldo gera uma linha com o valor (positivo para
+    créditos, negativo para débitos) e o saldo resultante, gravada na mesma
+    transação que atualiza users.saldo.
+    """
+    __tablename__ = 'lancamentos'
+    __table_args__ = (
+        # Extrato do usuário: filter_by(user_id).order_by(id.desc())
+        db.Index('ix_lancamentos_user_id', 'user_id', 'id'),
+    )
+
+    TIPOS = ('deposito', 'aposta', 'premio', 'ajuste')
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)  # deposito, aposta, premio, ajuste
+    valor = db.Column(db.Float, nullable=False)
+    saldo_apos = db.Column(db.Float, nullable=False)
+    sorteio_id = db.Column(db.Integer, db.ForeignKey('sorteios.id'), nullable=True)
+    descricao = db.Column(db.String(255), nullable=False)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'valor': self.valor,
+            'saldo_apos': self.saldo_apos,
+            'sorteio_id': self.sorteio_id,
+            'descricao': self.descricao,
+            'data': self.data_criacao.isoformat() if self.data_criacao else None
+        }
+
+    def __repr__(self):
+        return f'<Lancamento {self.id} - {self.tipo} {self.valor:+.2f}>'
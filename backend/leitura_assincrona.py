@@ -0,0 +1,397 @@
+from src.models.database import db, PERFIS_BANCO, perfil_banco, aplicar_pragmas
+from src.models.sorteio import Sorteio
+from src.models.contagem_numeros import ContagemNumero
+from src.models.estatisticas import EstatisticaGeral, somar_fatias
+from src.services.cache_respostas import cache_respostas, BackendMemoria
+from src.services.metricas import CHAVE_MEDICAO
+from src.services.paginacao import (
+    MAXIMO_POR_PAGINA, CursorInvalido, usar_cursor, parametros_cursor, campos_cursor,
+    aplicar_cursor, montar_pagina_cursor
+)
+from src.services.serializadores import (
+    consulta_ganhadores, ganhadores_dict, serializar_sorteio_atual, serializar_historico
+)
+from sqlalchemy import event
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.http import parse_etags
+from werkzeug.test import EnvironBuilder
+from contextvars import ContextVar
+from datetime import date
+from urllib.parse import parse_qsl
+import asyncio
+import functools
+import importlib.util
+import logging
+import math
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Driver assíncrono de cada dialeto: (drivername do SQLAlchemy, módulo a instalar)
+DRIVERS_ASSINCRONOS = {
+    'sqlite': ('sqlite+aiosqlite', 'aiosqlite'),
+    'postgresql': ('postgresql+asyncpg', 'asyncpg'),
+}
+
+# Consultas da requisição em curso (a task do asyncio); os eventos do engine
+# rodam no greenlet da task, que herda o contexto dela
+_medicao_atual = ContextVar('medicao_leitura_assincrona', default=None)
+
+
+class LeitorSorteiosAssincrono:
+    """Leituras públicas de sorteios (/sorteio-atual, /historico, /resultado/<id>) com engine assíncrono.
+
+    Cada leitura é uma coroutine sobre um engine async do SQLAlchemy
+    (aiosqlite ou asyncpg, conforme o dialeto da aplicação): enquanto espera o
+    banco, a requisição não ocupa nenhuma thread. As respostas são idênticas às
+    das views síncronas do blueprint de sorteios, com as mesmas chaves no cache
+    de respostas, a mesma ETag e o mesmo 304.
+
+    Sem o driver instalado (ou com LEITURA_ASSINCRONA desligada, ou com SQLite
+    em memória) o leitor fica indisponível e tudo segue pelas views síncronas.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.engine = None
+        self._sessoes = None
+
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def disponivel(self):
+        return self.engine is not None
+
+    def init_app(self, app):
+        """Cria o engine assíncrono com a URL e o perfil de engine da aplicação"""
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        self.app = app
+        self.engine = None
+        if not app.config.get('LEITURA_ASSINCRONA', True):
+            return
+
+        with app.app_context():
+            url = db.engine.url
+
+        driver = DRIVERS_ASSINCRONOS.get(url.get_backend_name())
+        if driver is None or url.database in (None, '', ':memory:'):
+            logger.info(f'Leitura assíncrona indisponível para {url.get_backend_name()}; usando as views síncronas')
+            return
+        if importlib.util.find_spec(driver[1]) is None:
+            logger.warning(f'Leitura assíncrona indisponível: instale {driver[1]}; usando as views síncronas')
+            return
+
+        perfil = PERFIS_BANCO[perfil_banco(app)]
+        self.engine = create_async_engine(
+            url.set(drivername=driver[0]), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        )
+        if url.get_backend_name() == 'sqlite':
+            aplicar_pragmas(self.engine.sync_engine, perfil['pragmas'])
+
+        event.listen(self.engine.sync_engine, 'before_cursor_execute', self._antes_consulta)
+        event.listen(self.engine.sync_engine, 'after_cursor_execute', self._depois_consulta)
+
+        self._sessoes = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def fechar(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    # Medição (mesmo formato da medição das requisições síncronas em metricas.py)
+
+    @staticmethod
+    def _antes_consulta(conexao, cursor, sql, parametros, contexto, executemany):
+        conexao.info.setdefault('leitura_inicio_consulta', []).append(time.perf_counter())
+
+    @staticmethod
+    def _depois_consulta(conexao, cursor, sql, parametros, contexto, executemany):
+        inicios = conexao.info.get('leitura_inicio_consulta')
+        medicao = _medicao_atual.get()
+        if not inicios or medicao is None:
+            return
+        medicao['consultas'] += 1
+        medicao['tempo_sql'] += time.perf_counter() - inicios.pop()
+
+    # Cache de respostas
+
+    @staticmethod
+    async def _cache(metodo, *args, **kwargs):
+        backend = cache_respostas.backend
+        if isinstance(backend, BackendMemoria):
+            return getattr(backend, metodo)(*args, **kwargs)
+        # Backends de rede (Redis) bloqueiam: rodam numa thread para não parar o loop
+        return await asyncio.to_thread(functools.partial(getattr(backend, metodo), *args, **kwargs))
+
+    async def _responder(self, etags, chave, gerar, imutavel=False):
+        """Equivalente assíncrono de cache_respostas.responder; ``gerar`` devolve o dicionário do corpo"""
+        corpo = await self._cache('obter', chave)
+        if corpo is None:
+            corpo = self.app.json.response(await gerar()).get_data()
+            await self._cache('guardar', chave, corpo, imutavel=imutavel)
+
+        etag = cache_respostas.etag(corpo)
+        if etags.contains(etag):
+            corpo = None
+        return cache_respostas.montar_resposta(etag, corpo, imutavel, self.app.response_class)
+
+    def _erro(self, status, mensagem):
+        resposta = self.app.json.response({'error': mensagem})
+        resposta.status_code = status
+        return resposta
+
+    # Leituras: devolvem a resposta, ou None quando a view síncrona deve atender
+
+    async def sorteio_atual(self, etags, query_string):
+        async with self._sessoes() as sessao:
+            sorteio = (await sessao.execute(
+                db.select(Sorteio).filter_by(data_sorteio=date.today())
+            )).scalars().first()
+            if sorteio is None:
+                # A view síncrona cria o sorteio do dia
+                return None
+
+            async def gerar():
+                linhas = await sessao.execute(
+                    db.select(ContagemNumero.numero, ContagemNumero.quantidade).where(
+                        ContagemNumero.sorteio_id == sorteio.id,
+                        ContagemNumero.quantidade > 0
+                    )
+                )
+                return serializar_sorteio_atual(sorteio, {numero: quantidade for numero, quantidade in linhas})
+
+            return await self._responder(
+                etags, cache_respostas.chave('sorteio-atual', sorteio.id, sorteio.versao), gerar
+            )
+
+    async def historico(self, etags, query_string):
+        args = MultiDict(parse_qsl(query_string, keep_blank_values=True))
+        async with self._sessoes() as sessao:
+            versao_historico = await sessao.scalar(somar_fatias(EstatisticaGeral.versao_historico))
+            chave = cache_respostas.chave('historico', versao_historico, query_string)
+            try:
+                return await self._responder(etags, chave, lambda: self._historico(sessao, args))
+            except CursorInvalido:
+                return self._erro(400, 'Cursor inválido')
+
+    async def _historico(self, sessao, args):
+        consulta = db.select(Sorteio).where(Sorteio.status.in_(['sorteado', 'finalizado']))
+
+        def contar():
+            return sessao.scalar(db.select(db.func.count()).select_from(consulta.subquery()))
+
+        if usar_cursor(args):
+            parametros = parametros_cursor(10, args)
+            chaves = [Sorteio.data_sorteio]
+            por_pagina = max(1, min(parametros['por_pagina'], MAXIMO_POR_PAGINA))
+            total = await contar() if parametros['incluir_total'] else None
+
+            paginada, direcao = aplicar_cursor(consulta, chaves, parametros['cursor'])
+            itens = list((await sessao.execute(paginada.limit(por_pagina + 1))).scalars())
+            pagina = montar_pagina_cursor(itens, chaves, por_pagina, direcao, parametros['cursor'])
+            if parametros['incluir_total']:
+                pagina['total'] = total
+            return serializar_historico(pagina['itens'], campos_cursor(pagina))
+
+        # Mesmos limites do paginate(error_out=False) da view síncrona
+        page = args.get('page', 1, type=int)
+        per_page = args.get('per_page', 10, type=int)
+        pagina = page if page >= 1 else 1
+        por_pagina = per_page if per_page >= 1 else 20
+
+        total = await contar()
+        itens = (await sessao.execute(
+            consulta.order_by(Sorteio.data_sorteio.desc()).limit(por_pagina).offset((pagina - 1) * por_pagina)
+        )).scalars().all()
+        return serializar_historico(itens, {
+            'total': total,
+            'pages': math.ceil(total / por_pagina) if total else 0,
+            'current_page': page
+        })
+
+    async def resultado(self, etags, query_string, sorteio_id):
+        async with self._sessoes() as sessao:
+            sorteio = await sessao.get(Sorteio, sorteio_id)
+            if not sorteio:
+                return self._erro(404, 'Sorteio não encontrado')
+            if sorteio.status == 'aberto':
+                return self._erro(400, 'Sorteio ainda não foi realizado')
+
+            async def gerar():
+                linhas = []
+                if sorteio.numero_sorteado is not None:
+                    linhas = (await sessao.execute(consulta_ganhadores(sorteio))).all()
+                sorteio_dict = sorteio.to_dict()
+                sorteio_dict['ganhadores'] = ganhadores_dict(sorteio, linhas)
+                return {'resultado': sorteio_dict}
+
+            # O resultado de um sorteio finalizado não muda mais: fica em cache para sempre
+            if sorteio.status == 'finalizado':
+                return await self._responder(
+                    etags, cache_respostas.chave('resultado', sorteio.id, 'finalizado'), gerar, imutavel=True
+                )
+            return await self._responder(
+                etags, cache_respostas.chave('resultado', sorteio.id, sorteio.versao), gerar
+            )
+
+
+# (padrão do caminho, endpoint da view síncrona equivalente, método do leitor)
+ROTAS_ASSINCRONAS = [
+    (re.compile(r'/api/sorteios/sorteio-atual'), 'sorteios.sorteio_atual', 'sorteio_atual'),
+    (re.compile(r'/api/sorteios/historico'), 'sorteios.historico_sorteios', 'historico'),
+    (re.compile(r'/api/sorteios/resultado/(?P<sorteio_id>\d+)'), 'sorteios.resultado_sorteio', 'resultado'),
+]
+
+# Transmissão SSE (/api/sorteios/stream): atendida no loop, sem prender uma thread por conexão
+ROTA_TRANSMISSAO = '/api/sorteios/stream'
+
+
+class AplicacaoAsgi:
+    """Aplicação ASGI: leituras públicas de sorteios no leitor assíncrono, o resto na aplicação Flask.
+
+    Os GETs de ROTAS_ASSINCRONAS são atendidos por coroutines no loop do
+    servidor ASGI; todas as outras requisições (e essas mesmas, se o leitor
+    estiver indisponível ou pedir) vão para a aplicação WSGI pelo adaptador
+    do asgiref, que as executa numa thread como um servidor WSGI faria. As
+    respostas assíncronas passam pelos after_request da aplicação (CORS,
+    sessão, métricas), como as das views.
+
+    Com um ``transmissor``, as conexões de ROTA_TRANSMISSAO também ficam no
+    loop: cada uma é uma coroutine esperando a sua fila, e não uma thread do
+    adaptador WSGI presa pelo tempo em que o navegador mantiver a página aberta.
+    """
+
+    def __init__(self, app, leitor, transmissor=None):
+        try:
+            from asgiref.wsgi import WsgiToAsgi
+        except ImportError:
+            raise RuntimeError('A aplicação ASGI requer o pacote asgiref (pip install "flask[async]")')
+
+        self.app = app
+        self.leitor = leitor
+        self.transmissor = transmissor
+        self.wsgi = WsgiToAsgi(app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._ciclo_de_vida(receive, send)
+
+        if (scope['type'] == 'http' and scope['method'] == 'GET' and self.transmissor is not None
+                and scope['path'] == ROTA_TRANSMISSAO):
+            return await self._transmitir(scope, receive, send)
+
+        if scope['type'] == 'http' and scope['method'] == 'GET' and self.leitor.disponivel:
+            for padrao, endpoint, metodo in ROTAS_ASSINCRONAS:
+                encontrada = padrao.fullmatch(scope['path'])
+                if encontrada:
+                    resposta = await self._atender(scope, endpoint, metodo, encontrada.groupdict())
+                    if resposta is not None:
+                        return await self._enviar(resposta, send)
+                    break
+
+        await self.wsgi(scope, receive, send)
+
+    async def _atender(self, scope, endpoint, metodo, parametros):
+        medicao = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_sql': 0.0}
+        _medicao_atual.set(medicao)
+
+        cabecalhos = Headers([(nome.decode('latin-1'), valor.decode('latin-1')) for nome, valor in scope['headers']])
+        query_string = scope['query_string'].decode('latin-1')
+        try:
+            resposta = await getattr(self.leitor, metodo)(
+                parse_etags(cabecalhos.get('If-None-Match')), query_string,
+                **{nome: int(valor) for nome, valor in parametros.items()}
+            )
+        except Exception as e:
+            logger.error(f'Erro na leitura assíncrona de {endpoint}: {str(e)}')
+            resposta = self.leitor._erro(500, str(e))
+
+        if resposta is None:
+            return None
+        return self._processar(scope, cabecalhos, query_string, medicao, resposta)
+
+    def _processar(self, scope, cabecalhos, query_string, medicao, resposta):
+        """Passa a resposta pelos after_request da aplicação com um contexto de requisição equivalente"""
+        ambiente = EnvironBuilder(
+            path=scope['path'], query_string=query_string, method='GET', headers=cabecalhos
+        ).get_environ()
+        ambiente[CHAVE_MEDICAO] = medicao
+        with self.app.request_context(ambiente) as contexto:
+            contexto.match_request()
+            resposta = self.app.process_response(resposta)
+        return resposta
+
+    async def _transmitir(self, scope, receive, send):
+        """Equivalente assíncrono da view /stream: cabeçalhos pelos after_request, corpo pelo transmissor"""
+        medicao = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_sql': 0.0}
+        cabecalhos = Headers([(nome.decode('latin-1'), valor.decode('latin-1')) for nome, valor in scope['headers']])
+        query_string = scope['query_string'].decode('latin-1')
+
+        try:
+            # Leitura curta (e criação do sorteio do dia, se for o caso) pela sessão síncrona
+            inicial = await asyncio.to_thread(self.transmissor.estado_inicial)
+        except Exception as e:
+            logger.error(f'Erro ao abrir a transmissão dos sorteios: {str(e)}')
+            resposta = self._processar(
+                scope, cabecalhos, query_string, medicao, self.leitor._erro(500, str(e))
+            )
+            return await self._enviar(resposta, send)
+
+        resposta = self._processar(scope, cabecalhos, query_string, medicao, self.app.response_class(
+            status=200, mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        ))
+        await send({
+            'type': 'http.response.start',
+            'status': resposta.status_code,
+            'headers': [(nome.lower().encode('latin-1'), valor.encode('latin-1'))
+                        for nome, valor in resposta.headers.items()],
+        })
+
+        async def enviar_eventos():
+            async for bloco in self.transmissor.eventos_assincronos(inicial):
+                await send({'type': 'http.response.body', 'body': bloco.encode(), 'more_body': True})
+
+        async def esperar_desconexao():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        # Termina quando o cliente sai ou o transmissor o desconecta; a outra tarefa é cancelada
+        tarefas = [asyncio.create_task(enviar_eventos()), asyncio.create_task(esperar_desconexao())]
+        try:
+            await asyncio.wait(tarefas, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+
+        try:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        except Exception:
+            # Cliente já desconectado
+            pass
+
+    @staticmethod
+    async def _enviar(resposta, send):
+        await send({
+            'type': 'http.response.start',
+            'status': resposta.status_code,
+            'headers': [(nome.lower().encode('latin-1'), valor.encode('latin-1'))
+                        for nome, valor in resposta.headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': resposta.get_data()})
+
+    async def _ciclo_de_vida(self, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                await self.leitor.fechar()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+leitor_sorteios = LeitorSorteiosAssincrono()
@@ -0,0 +1,125 @@
+from src.models.database import db
+from src.models.aposta import Aposta
+from src.models.sorteio import Sorteio
+from src.models.estatisticas import somar_gerais
+from src.services.carteira import creditar_premios
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Cronometro:
+    """Mede o tempo gasto em cada fase da liquidação"""
+
+    def __init__(self):
+        self.tempos = {}
+        self._inicio = time.perf_counter()
+        self._marca = self._inicio
+
+    def fase(self, nome):
+        agora = time.perf_counter()
+        self.tempos[nome] = round((agora - self._marca) * 1000, 3)
+        self._marca = agora
+
+    def total(self):
+        return round((time.perf_counter() - self._inicio) * 1000, 3)
+
+
+def liquidar_sorteio(sorteio):
+    """Finaliza um sorteio já sorteado e distribui os prêmios com operações em conjunto.
+
+    Em vez de carregar cada aposta no ORM, marca ganhadoras e perdedoras com
+    dois UPDATEs sobre (sorteio_id, numero_escolhido) e credita os ganhadores
+    com um único UPDATE agregado por usuário, registrando os prêmios no extrato
+    com um INSERT ... SELECT. Tudo acontece em uma única transação. Retorna um
+    resumo com o tempo (ms) de cada fase, ou None se o sorteio não estiver no
+    status 'sorteado'.
+
+    A passagem para 'finalizado' é o primeiro UPDATE da transação e só vale
+    se o sorteio ainda está 'sorteado' no banco: duas liquidações simultâneas
+    (uma execução retomada enquanto a original ainda roda, por exemplo) não
+    creditam os prêmios duas vezes, porque a segunda não encontra a linha.
+    """
+    if sorteio.status != 'sorteado':
+        return None
+
+    cronometro = Cronometro()
+    numero = sorteio.numero_sorteado
+
+    # Fase 0: reserva a transição; quem chegar depois encontra o sorteio já finalizado
+    resultado = db.session.execute(
+        db.update(Sorteio)
+        .where(Sorteio.id == sorteio.id, Sorteio.status == 'sorteado')
+        .values(status='finalizado')
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount == 0:
+        db.session.rollback()
+        logger.warning(f"Sorteio {sorteio.id} não está mais 'sorteado'; liquidação ignorada")
+        return None
+    cronometro.fase('finalizar_sorteio')
+
+    filtro_ganhadoras = db.and_(
+        Aposta.sorteio_id == sorteio.id,
+        Aposta.numero_escolhido == numero
+    )
+
+    # Fase 1: marca as apostas ganhadoras (o rowcount é o total de ganhadores)
+    resultado = db.session.execute(
+        db.update(Aposta)
+        .where(filtro_ganhadoras)
+        .values(status='ganhadora')
+        .execution_options(synchronize_session=False)
+    )
+    total_ganhadores = resultado.rowcount
+    cronometro.fase('marcar_ganhadoras')
+
+    # Fase 2: marca todas as outras apostas do sorteio como perdedoras
+    resultado = db.session.execute(
+        db.update(Aposta)
+        .where(Aposta.sorteio_id == sorteio.id, Aposta.numero_escolhido != numero)
+        .values(status='perdedora')
+        .execution_options(synchronize_session=False)
+    )
+    total_perdedoras = resultado.rowcount
+    cronometro.fase('marcar_perdedoras')
+
+    # Fase 3: credita o prêmio de cada usuário ganhador de uma só vez
+    premio_por_ganhador = 0.0
+    if total_ganhadores:
+        premio_por_ganhador = sorteio.premio_total / total_ganhadores
+        creditar_premios(sorteio, filtro_ganhadoras, premio_por_ganhador)
+    cronometro.fase('creditar_premios')
+
+    # Prêmios creditados entram no saldo total; o sorteio passa a contar como finalizado
+    somar_gerais(
+        versao=1,
+        versao_historico=1,
+        sorteios_finalizados=1,
+        saldo_total_usuarios=premio_por_ganhador * total_ganhadores
+    )
+
+    sorteio.status = 'finalizado'
+    sorteio.total_ganhadores = total_ganhadores
+    sorteio.premio_por_ganhador = premio_por_ganhador
+    sorteio.versao = Sorteio.versao + 1
+    db.session.commit()
+    cronometro.fase('commit')
+
+    resumo = {
+        'sorteio_id': sorteio.id,
+        'numero_sorteado': numero,
+        'total_ganhadores': total_ganhadores,
+        'total_perdedoras': total_perdedoras,
+        'premio_por_ganhador': premio_por_ganhador,
+        'tempos_ms': cronometro.tempos,
+        'tempo_total_ms': cronometro.total()
+    }
+
+    logger.info(
+        f"Sorteio {sorteio.id} liquidado em {resumo['tempo_total_ms']} ms - "
+        f"{total_ganhadores} ganhadores, {total_perdedoras} perdedoras - fases: {cronometro.tempos}"
+    )
+
+    return resumo
@@ -6,6 +6,12 @@ from src.models.database import db, init_db
 from src.models.user import User
 from src.models.aposta import Aposta
 from src.models.sorteio import Sorteio
+from src.models.contagem_numeros import ContagemNumero
+from src.models.lancamento import Lancamento
+from src.models.numeros_usuario_sorteio import NumerosUsuarioSorteio
+from src.models.estatisticas import EstatisticaGeral, EstatisticaDiaria, EstatisticaNumero
+from src.models.agendamento import LiderScheduler, ExecucaoSorteio
+from src.models.modalidade import Modalidade, BilhetePredefinido, BilheteNumero, Premiacao, ApostaModalidade, ResultadoModalidade
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), '..', 'frontend'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -14,12 +20,61 @@ app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 CORS(app, origins=['*'], supports_credentials=True)
 
 # Configuração do banco de dados
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///app.db"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', "sqlite:///app.db")
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Perfil de engine (database.PERFIS_BANCO): 'sqlite', 'sqlite-padrao' ou 'postgres';
+# sem valor, é deduzido da URL do banco
+app.config['BANCO_PERFIL'] = os.environ.get('BANCO_PERFIL')
+
+# Grava o bitset dos números apostados por usuário e sorteio (numeros_usuario_sorteio)
+app.config['PERSISTIR_NUMEROS_APOSTADOS'] = True
+
+# Intervalo (s) em que as mudanças dos sorteios são agrupadas e enviadas por SSE
+app.config['SSE_TICK_SEGUNDOS'] = 1.0
+
+# Espera (s) do navegador antes de reconectar o SSE; independente do keepalive (15 s)
+app.config['SSE_RETRY_SEGUNDOS'] = 3.0
+
+# Validade (s) da liderança do scheduler; só o líder recupera os sorteios perdidos
+app.config['SCHEDULER_LIDERANCA_SEGUNDOS'] = 60
+
+# Ingestão assíncrona de apostas: reserva na hora e grava em lotes (um único processo)
+app.config['INGESTAO_APOSTAS_ASSINCRONA'] = False
+
+# Consultas SQL acima deste tempo (ms) vão para o log 'bilhetes.consultas_lentas';
+# com METRICAS_TOKEN definido, /api/admin/metrics também aceita "Authorization: Bearer <token>"
+app.config['METRICAS_CONSULTA_LENTA_MS'] = 100
+app.config['METRICAS_TOKEN'] = os.environ.get('METRICAS_TOKEN')
+
+# Política de hash de senhas (método do Werkzeug); hashes antigos são refeitos no login.
+# A verificação roda em um pool de SENHAS_TRABALHADORES threads com fila limitada
+app.config['SENHAS_METODO'] = os.environ.get('SENHAS_METODO', 'pbkdf2:sha256:600000')
+app.config['SENHAS_TRABALHADORES'] = None  # padrão: metade dos núcleos
+app.config['SENHAS_FILA_MAXIMA'] = 64
+
+# Servida por asgi.py, a aplicação lê sorteio atual, histórico e resultados com
+# um engine assíncrono (aiosqlite/asyncpg); desligada, tudo passa pelas views
+app.config['LEITURA_ASSINCRONA'] = True
+
+# Intervalo (s) em que cada processo confere se outro publicou uma nova versão do catálogo
+app.config['CATALOGO_VERIFICAR_SEGUNDOS'] = 5
+
 # Inicializa o banco de dados
 init_db(app)
 
+# Instrumenta requisições e consultas SQL (/api/admin/metrics)
+from src.services.metricas import metricas_aplicacao
+metricas_aplicacao.init_app(app)
+
+# Pool de hash e verificação de senhas
+from src.services.senhas import servico_senhas
+servico_senhas.init_app(app)
+
+# Catálogo de modalidades, bilhetes e premiações servido da memória
+from src.services.catalogo import catalogo_modalidades
+catalogo_modalidades.init_app(app)
+
 # Importa e registra as rotas
 from src.routes.auth import auth_bp
 from src.routes.user import user_bp
@@ -39,6 +94,18 @@ app.register_blueprint(admin_bp, url_prefix='/api/admin')
 # Inicializa o scheduler de sorteios
 sorteio_scheduler.init_app(app)
 
+# Inicializa a transmissão do estado dos sorteios (/api/sorteios/stream)
+from src.services.transmissao import transmissor_sorteios
+transmissor_sorteios.init_app(app)
+
+# Inicializa a fila de ingestão de apostas (usada se INGESTAO_APOSTAS_ASSINCRONA)
+from src.services.ingestao_apostas import fila_apostas
+fila_apostas.init_app(app)
+
+# Registra os comandos de manutenção (flask <comando>)
+from src.services.comandos import registrar_comandos
+registrar_comandos(app)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -0,0 +1,267 @@
+from flask import request, has_request_context
+from sqlalchemy import event
+from src.services.orcamento_consultas import orcamento_da_rota
+from datetime import date
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Log próprio das consultas lentas, para poder ser direcionado a outro destino
+logger_consultas_lentas = logging.getLogger('bilhetes.consultas_lentas')
+
+# Limites superiores (le) dos buckets dos histogramas
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# Endpoint usado para o SQL executado fora de requisições (scheduler, fila de apostas)
+FORA_DE_REQUISICAO = '-'
+
+# Medição da requisição em curso, guardada no environ do WSGI e não em ``g``:
+# rotas que abrem um app_context próprio (sorteio manual) têm outro ``g``
+CHAVE_MEDICAO = 'bilhetes.metricas'
+
+
+class Histograma:
+    """Histograma cumulativo no modelo do Prometheus (buckets, soma e contagem)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for indice, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[indice] += 1
+        self.soma += valor
+        self.total += 1
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class MetricasAplicacao:
+    """Métricas do processo: latência por endpoint, SQL por requisição e sorteios.
+
+    Cada requisição é cronometrada e, pelos eventos before/after_cursor_execute
+    do engine, conta quantas consultas executou e quanto tempo passou no
+    banco. Consultas acima de METRICAS_CONSULTA_LENTA_MS vão para o log
+    'bilhetes.consultas_lentas' com o endpoint que as executou. Tudo é exposto
+    no formato texto do Prometheus por texto_prometheus(). Os valores são do
+    processo: com vários processos, cada um é coletado separadamente.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.limite_consulta_lenta = 0.1
+        self._histogramas = {}  # (nome, rótulos) -> Histograma
+        self._contadores = {}  # (nome, rótulos) -> valor
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Instala os hooks de requisição e os eventos do engine (METRICAS_CONSULTA_LENTA_MS)"""
+        from src.models.database import db
+
+        self.app = app
+        self.limite_consulta_lenta = app.config.get('METRICAS_CONSULTA_LENTA_MS', 100) / 1000
+
+        app.before_request(self._iniciar_requisicao)
+        app.after_request(self._concluir_requisicao)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._antes_consulta)
+            event.listen(db.engine, 'after_cursor_execute', self._depois_consulta)
+
+    # Registro
+
+    def observar(self, nome, valor, buckets=BUCKETS_SEGUNDOS, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma(buckets)
+            histograma.observar(valor)
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar_execucao_sorteio(self, status, duracao_ms, tempos_ms=None):
+        """Registra uma execução do scheduler e o tempo de cada fase da liquidação"""
+        self.observar('bilhetes_sorteio_execucao_segundos', duracao_ms / 1000, status=status)
+        for fase, ms in (tempos_ms or {}).items():
+            self.observar('bilhetes_liquidacao_fase_segundos', ms / 1000, fase=fase)
+
+    # Hooks de requisição
+
+    @staticmethod
+    def _endpoint():
+        if has_request_context():
+            return request.endpoint or 'nao_encontrado'
+        return FORA_DE_REQUISICAO
+
+    @staticmethod
+    def _medicao():
+        if has_request_context():
+            return request.environ.get(CHAVE_MEDICAO)
+        return None
+
+    def _iniciar_requisicao(self):
+        request.environ[CHAVE_MEDICAO] = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_sql': 0.0}
+
+    def _concluir_requisicao(self, resposta):
+        medicao = self._medicao()
+        if medicao is None:
+            return resposta
+
+        endpoint = self._endpoint()
+        # Respostas em streaming (SSE) só contam até o início do corpo
+        self.observar(
+            'bilhetes_http_requisicao_segundos', time.perf_counter() - medicao['inicio'],
+            endpoint=endpoint, metodo=request.method
+        )
+        self.incrementar('bilhetes_http_requisicoes_total', endpoint=endpoint, status=resposta.status_code)
+        self.observar(
+            'bilhetes_sql_consultas_por_requisicao', medicao['consultas'],
+            buckets=BUCKETS_CONSULTAS, endpoint=endpoint
+        )
+        self.observar('bilhetes_sql_segundos_por_requisicao', medicao['tempo_sql'], endpoint=endpoint)
+
+        maximo = orcamento_da_rota(endpoint)
+        if maximo is not None and medicao['consultas'] > maximo:
+            self.incrementar('bilhetes_sql_orcamento_excedido_total', endpoint=endpoint)
+            logger.warning(
+                f"{endpoint} executou {medicao['consultas']} consultas, orçamento de {maximo}"
+            )
+        return resposta
+
+    # Eventos do engine
+
+    @staticmethod
+    def _antes_consulta(conexao, cursor, sql, parametros, contexto, executemany):
+        conexao.info.setdefault('metricas_inicio_consulta', []).append(time.perf_counter())
+
+    def _depois_consulta(self, conexao, cursor, sql, parametros, contexto, executemany):
+        inicios = conexao.info.get('metricas_inicio_consulta')
+        if not inicios:
+            return
+        duracao = time.perf_counter() - inicios.pop()
+
+        medicao = self._medicao()
+        if medicao is not None:
+            medicao['consultas'] += 1
+            medicao['tempo_sql'] += duracao
+        else:
+            self.incrementar('bilhetes_sql_consultas_fora_de_requisicao_total')
+
+        if duracao >= self.limite_consulta_lenta:
+            endpoint = self._endpoint() if medicao is not None else FORA_DE_REQUISICAO
+            self.incrementar('bilhetes_sql_consultas_lentas_total', endpoint=endpoint)
+            logger_consultas_lentas.warning(
+                f"Consulta lenta ({round(duracao * 1000, 3)} ms) em {endpoint}: {' '.join(sql.split())}"
+            )
+
+    # Exposição
+
+    def texto_prometheus(self, medidores=()):
+        """Monta a exposição no formato texto do Prometheus.
+
+        ``medidores`` são gauges calculados na hora da coleta, como tuplas
+        (nome, valor, rótulos).
+        """
+        with self._lock:
+            histogramas = sorted(
+                (nome, rotulos, list(h.buckets), list(h.contagens), h.soma, h.total)
+                for (nome, rotulos), h in self._histogramas.items()
+            )
+            contadores = sorted(self._contadores.items())
+
+        linhas = []
+        tipos = set()
+
+        def declarar(nome, tipo):
+            if nome not in tipos:
+                tipos.add(nome)
+                linhas.append(f'# TYPE {nome} {tipo}')
+
+        for nome, rotulos, buckets, contagens, soma, total in histogramas:
+            declarar(nome, 'histogram')
+            for limite, contagem in zip(buckets, contagens):
+                linhas.append(f'{nome}_bucket{_rotulos(rotulos + (("le", _numero(limite)),))} {contagem}')
+            linhas.append(f'{nome}_bucket{_rotulos(rotulos + (("le", "+Inf"),))} {total}')
+            linhas.append(f'{nome}_sum{_rotulos(rotulos)} {_numero(soma)}')
+            linhas.append(f'{nome}_count{_rotulos(rotulos)} {total}')
+
+        for (nome, rotulos), valor in contadores:
+            declarar(nome, 'counter')
+            linhas.append(f'{nome}{_rotulos(rotulos)} {_numero(valor)}')
+
+        for nome, valor, rotulos in medidores:
+            declarar(nome, 'gauge')
+            linhas.append(f'{nome}{_rotulos(tuple(sorted(rotulos.items())))} {_numero(valor)}')
+
+        return '\n'.join(linhas) + '\n'
+
+
+def medidores_atuais():
+    """Gauges lidos na hora da coleta: sorteio de hoje, fila de apostas e scheduler (requer app context)"""
+    from src.models.database import db
+    from src.models.sorteio import Sorteio
+    from src.models.contagem_numeros import ContagemNumero
+    from src.models.agendamento import ExecucaoSorteio
+    from src.services.ingestao_apostas import fila_apostas
+    from src.services.scheduler import sorteio_scheduler
+
+    # Só leitura: a coleta não cria o sorteio do dia (get_sorteio_atual criaria e faria commit)
+    sorteio = db.session.execute(
+        db.select(Sorteio).where(Sorteio.data_sorteio == date.today())
+    ).scalars().first()
+    numeros_com_apostas = 0
+    if sorteio is not None:
+        numeros_com_apostas = db.session.execute(
+            db.select(db.func.count()).where(ContagemNumero.sorteio_id == sorteio.id, ContagemNumero.quantidade > 0)
+        ).scalar()
+
+    medidores = [
+        ('bilhetes_sorteio_atual_apostas', sorteio.total_apostas if sorteio else 0, {}),
+        ('bilhetes_sorteio_atual_arrecadado', sorteio.total_arrecadado if sorteio else 0.0, {}),
+        ('bilhetes_sorteio_atual_numeros_com_apostas', numeros_com_apostas, {}),
+        ('bilhetes_fila_apostas_pendentes', fila_apostas.total_pendentes(), {}),
+    ]
+
+    if sorteio_scheduler.scheduler is not None:
+        lideranca = sorteio_scheduler.get_lideranca()
+        medidores.append(('bilhetes_scheduler_ativo', int(sorteio_scheduler.scheduler.running), {}))
+        medidores.append((
+            'bilhetes_scheduler_lider',
+            int(bool(lideranca and lideranca['vigente'] and lideranca['este_processo'])), {}
+        ))
+
+    ultima = ExecucaoSorteio.query.order_by(ExecucaoSorteio.data_sorteio.desc()).first()
+    if ultima is not None and ultima.duracao_ms is not None:
+        medidores.append((
+            'bilhetes_sorteio_ultima_execucao_segundos', ultima.duracao_ms / 1000, {'status': ultima.status}
+        ))
+
+    return medidores
+
+
+metricas_aplicacao = MetricasAplicacao()
@@ -0,0 +1,457 @@
+from .database import db
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+import json
+import logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - fora do Unix o SQLite migra sem trava entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Chave do advisory lock do PostgreSQL que serializa as migrações entre processos
+CHAVE_BLOQUEIO_MIGRACOES = 0x62696c68
+
+class VersaoSchema(db.Model):
+    """Registro das migrações de schema já aplicadas ao banco"""
+    __tablename__ = 'schema_versao'
+
+    versao = db.Column(db.Integer, primary_key=True)
+    descricao = db.Column(db.String(255), nullable=False)
+    aplicada_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'versao': self.versao,
+            'descricao': self.descricao,
+            'aplicada_em': self.aplicada_em.isoformat() if self.aplicada_em else None
+        }
+
+
+# Lista de (versao, descricao, funcao) em ordem de aplicação
+MIGRACOES = []
+
+
+def migracao(versao, descricao):
+    """Registra uma função como migração de schema.
+
+    A função recebe uma conexão aberta dentro de uma transação e deve ser
+    idempotente: bancos novos já recebem o schema completo via create_all()
+    e, ainda assim, passam por todas as migrações.
+    """
+    def decorador(funcao):
+        MIGRACOES.append((versao, descricao, funcao))
+        MIGRACOES.sort(key=lambda item: item[0])
+        return funcao
+    return decorador
+
+
+def criar_indices(conexao, modelo, nomes):
+    """Cria (se ainda não existirem) os índices declarados no modelo com os nomes dados"""
+    indices = {indice.name: indice for indice in modelo.__table__.indexes}
+    for nome in nomes:
+        indices[nome].create(conexao, checkfirst=True)
+
+
+def adicionar_coluna(conexao, modelo, nome):
+    """Adiciona ao banco (se ainda não existir) uma coluna declarada no modelo"""
+    tabela = modelo.__table__
+    existentes = {coluna['name'] for coluna in db.inspect(conexao).get_columns(tabela.name)}
+    if nome in existentes:
+        return False
+
+    coluna = tabela.c[nome]
+    ddl = f'ALTER TABLE {tabela.name} ADD COLUMN {nome} {coluna.type.compile(dialect=conexao.dialect)}'
+    if coluna.server_default is not None:
+        ddl += f" DEFAULT {coluna.server_default.arg}"
+    if not coluna.nullable:
+        ddl += ' NOT NULL'
+    conexao.execute(db.text(ddl))
+    return True
+
+
+def atualizar_estatisticas(conexao):
+    """Atualiza as estatísticas do planejador para que os novos índices sejam usados"""
+    if conexao.dialect.name in ('sqlite', 'postgresql'):
+        conexao.execute(db.text('ANALYZE'))
+
+
+def estornar_apostas_duplicadas(conexao):
+    """Remove apostas repetidas (user_id, sorteio_id, numero_escolhido) e devolve o valor.
+
+    A verificação seguida de inserção da versão original deixava passar
+    apostas repetidas em requisições simultâneas. Fica a de menor id; o valor
+    das demais volta ao saldo com um lançamento de ajuste no extrato (antes
+    dele, o de abertura, se o usuário ainda não tem nenhum) e sai do
+    arrecadado dos sorteios ainda abertos. Retorna o número de apostas removidas.
+    """
+    from .aposta import Aposta
+    from .sorteio import Sorteio
+    from .user import User
+    from .lancamento import Lancamento
+
+    apostas = Aposta.__table__
+    anterior = apostas.alias('anterior')
+    duplicadas = conexao.execute(
+        db.select(apostas.c.id, apostas.c.user_id, apostas.c.sorteio_id, apostas.c.valor_aposta)
+        .where(db.exists().where(
+            anterior.c.user_id == apostas.c.user_id,
+            anterior.c.sorteio_id == apostas.c.sorteio_id,
+            anterior.c.numero_escolhido == apostas.c.numero_escolhido,
+            anterior.c.id < apostas.c.id
+        ))
+        .order_by(apostas.c.id)
+    ).all()
+    if not duplicadas:
+        return 0
+
+    estornos = {}
+    for _, user_id, sorteio_id, valor in duplicadas:
+        estornos[(user_id, sorteio_id)] = estornos.get((user_id, sorteio_id), 0.0) + (valor or 0.0)
+
+    usuarios = User.__table__
+    lancamentos = Lancamento.__table__
+    agora = datetime.utcnow()
+    com_extrato = db.inspect(conexao).has_table(lancamentos.name)
+
+    if com_extrato:
+        # Abertura do extrato com o saldo anterior ao estorno, como na migração 4
+        conexao.execute(
+            db.insert(lancamentos).from_select(
+                ['user_id', 'tipo', 'valor', 'saldo_apos', 'descricao', 'data_criacao'],
+                db.select(
+                    usuarios.c.id, db.literal('ajuste'), usuarios.c.saldo, usuarios.c.saldo,
+                    db.literal('Saldo de abertura do extrato'), db.literal(agora)
+                ).where(
+                    usuarios.c.id.in_({user_id for user_id, _ in estornos}),
+                    ~db.exists().where(lancamentos.c.user_id == usuarios.c.id)
+                )
+            )
+        )
+
+    for (user_id, sorteio_id), valor in estornos.items():
+        conexao.execute(
+            db.update(usuarios).where(usuarios.c.id == user_id).values(saldo=usuarios.c.saldo + valor)
+        )
+        saldo = conexao.execute(db.select(usuarios.c.saldo).where(usuarios.c.id == user_id)).scalar()
+        if com_extrato and saldo is not None:
+            conexao.execute(db.insert(lancamentos).values(
+                user_id=user_id,
+                tipo='ajuste',
+                valor=valor,
+                saldo_apos=saldo,
+                sorteio_id=sorteio_id,
+                descricao='Estorno de apostas duplicadas',
+                data_criacao=agora
+            ))
+
+    sorteios = Sorteio.__table__
+    for sorteio_id in {sorteio_id for _, sorteio_id in estornos}:
+        conexao.execute(
+            db.update(sorteios)
+            .where(sorteios.c.id == sorteio_id, sorteios.c.status == 'aberto')
+            .values(total_arrecadado=sorteios.c.total_arrecadado - sum(
+                valor for (_, sorteio), valor in estornos.items() if sorteio == sorteio_id
+            ))
+        )
+
+    ids = [id_aposta for id_aposta, _, _, _ in duplicadas]
+    for inicio in range(0, len(ids), 500):
+        conexao.execute(db.delete(apostas).where(apostas.c.id.in_(ids[inicio:inicio + 500])))
+
+    logger.warning(f"{len(ids)} apostas duplicadas removidas e estornadas em {len(estornos)} lançamentos")
+    return len(ids)
+
+
+@migracao(1, 'Índices compostos e único em apostas; índice de histórico em sorteios')
+def _indices_apostas_sorteios(conexao):
+    from .aposta import Aposta
+    from .sorteio import Sorteio
+
+    estornar_apostas_duplicadas(conexao)
+
+    criar_indices(conexao, Aposta, [
+        'uq_apostas_user_sorteio_numero',
+        'ix_apostas_sorteio_numero',
+        'ix_apostas_user_data',
+    ])
+    criar_indices(conexao, Sorteio, ['ix_sorteios_status_data'])
+    atualizar_estatisticas(conexao)
+
+
+@migracao(2, 'Resumo desnormalizado em sorteios: total_apostas, total_ganhadores, premio_por_ganhador')
+def _resumo_sorteios(conexao):
+    from .sorteio import Sorteio
+
+    for nome in ('total_apostas', 'total_ganhadores', 'premio_por_ganhador'):
+        adicionar_coluna(conexao, Sorteio, nome)
+
+    conexao.execute(db.text(
+        'UPDATE sorteios SET total_apostas = ('
+        ' SELECT COUNT(*) FROM apostas WHERE apostas.sorteio_id = sorteios.id'
+        ')'
+    ))
+    conexao.execute(db.text(
+        'UPDATE sorteios SET total_ganhadores = ('
+        ' SELECT COUNT(*) FROM apostas'
+        ' WHERE apostas.sorteio_id = sorteios.id'
+        ' AND apostas.numero_escolhido = sorteios.numero_sorteado'
+        ') WHERE numero_sorteado IS NOT NULL'
+    ))
+    conexao.execute(db.text(
+        'UPDATE sorteios SET premio_por_ganhador = CASE'
+        ' WHEN total_ganhadores > 0 THEN premio_total / total_ganhadores'
+        ' ELSE 0 END'
+    ))
+
+
+@migracao(3, 'Papel de administrador em users (is_admin)')
+def _papel_administrador(conexao):
+    from .user import User
+
+    if adicionar_coluna(conexao, User, 'is_admin'):
+        # Antes do papel existir, o usuário de id 1 era tratado como administrador
+        conexao.execute(
+            db.text(f'UPDATE {User.__tablename__} SET is_admin = :admin WHERE id = 1'),
+            {'admin': True}
+        )
+
+
+@migracao(4, 'Extrato de saldo (lancamentos) com lançamento de abertura por usuário')
+def _extrato_saldo(conexao):
+    from .user import User
+    from .lancamento import Lancamento
+
+    Lancamento.__table__.create(conexao, checkfirst=True)
+    criar_indices(conexao, Lancamento, ['ix_lancamentos_user_id'])
+
+    # O saldo atual de cada usuário vira o lançamento de abertura do extrato
+    conexao.execute(
+        db.text(
+            'INSERT INTO lancamentos (user_id, tipo, valor, saldo_apos, descricao, data_criacao)'
+            f' SELECT id, :tipo, saldo, saldo, :descricao, :agora FROM {User.__tablename__}'
+            ' WHERE NOT EXISTS (SELECT 1 FROM lancamentos WHERE lancamentos.user_id = '
+            f'{User.__tablename__}.id)'
+        ),
+        {'tipo': 'ajuste', 'descricao': 'Saldo de abertura do extrato', 'agora': datetime.utcnow()}
+    )
+
+
+@migracao(5, 'Índice (data_criacao, id) em users para a listagem paginada por cursor')
+def _indice_usuarios_data_criacao(conexao):
+    from .user import User
+
+    conexao.execute(db.text(
+        f'CREATE INDEX IF NOT EXISTS ix_users_data_criacao ON {User.__tablename__} (data_criacao, id)'
+    ))
+
+
+@migracao(6, 'Bitset dos números apostados por usuário e sorteio (numeros_usuario_sorteio)')
+def _numeros_usuario_sorteio(conexao):
+    from .numeros_usuario_sorteio import NumerosUsuarioSorteio
+    from .bitset_numeros import BitsetNumeros
+    from .sorteio import Sorteio
+
+    tabela = NumerosUsuarioSorteio.__table__
+    tabela.create(conexao, checkfirst=True)
+
+    # Só os sorteios abertos são preenchidos; nos demais a linha ausente é
+    # montada a partir das apostas quando (e se) for lida
+    linhas = conexao.execute(db.text(
+        'SELECT apostas.user_id, apostas.sorteio_id, apostas.numero_escolhido FROM apostas'
+        ' JOIN sorteios ON sorteios.id = apostas.sorteio_id'
+        " WHERE sorteios.status = 'aberto'"
+    ))
+
+    bitsets = {}
+    for user_id, sorteio_id, numero in linhas:
+        bitsets.setdefault((user_id, sorteio_id), BitsetNumeros()).adicionar(numero)
+
+    conexao.execute(db.delete(tabela).where(
+        tabela.c.sorteio_id.in_(db.select(Sorteio.id).where(Sorteio.status == 'aberto'))
+    ))
+    if bitsets:
+        conexao.execute(db.insert(tabela), [
+            {'user_id': user_id, 'sorteio_id': sorteio_id, 'bits': bitset.para_bytes()}
+            for (user_id, sorteio_id), bitset in bitsets.items()
+        ])
+
+
+@migracao(7, 'Estatísticas acumuladas: totais gerais, diários e por número')
+def _estatisticas(conexao):
+    from sqlalchemy.orm import Session
+    from .estatisticas import (
+        EstatisticaGeral, EstatisticaDiaria, EstatisticaNumero, reconstruir_estatisticas
+    )
+
+    for modelo in (EstatisticaGeral, EstatisticaDiaria, EstatisticaNumero):
+        modelo.__table__.create(conexao, checkfirst=True)
+
+    # A sessão participa da transação da migração, sem confirmá-la
+    with Session(bind=conexao) as sessao:
+        reconstruir_estatisticas(sessao)
+
+
+@migracao(8, 'Contadores de versão em sorteios e estatisticas_gerais para o cache de respostas')
+def _versoes_cache(conexao):
+    from .sorteio import Sorteio
+    from .estatisticas import EstatisticaGeral
+
+    adicionar_coluna(conexao, Sorteio, 'versao')
+    adicionar_coluna(conexao, EstatisticaGeral, 'versao')
+
+
+@migracao(9, 'Liderança do scheduler e histórico de execuções dos sorteios')
+def _agendamento(conexao):
+    from .agendamento import LiderScheduler, ExecucaoSorteio
+
+    LiderScheduler.__table__.create(conexao, checkfirst=True)
+    ExecucaoSorteio.__table__.create(conexao, checkfirst=True)
+
+
+@migracao(10, 'Modalidades: catálogo, bilhetes comprados por sorteio e resultados da apuração')
+def _modalidades(conexao):
+    from .modalidade import Modalidade, BilhetePredefinido, Premiacao, ApostaModalidade, ResultadoModalidade
+
+    for modelo in (Modalidade, BilhetePredefinido, Premiacao, ApostaModalidade, ResultadoModalidade):
+        modelo.__table__.create(conexao, checkfirst=True)
+
+    # Catálogos criados pela versão anterior não têm as colunas novas
+    adicionar_coluna(conexao, Modalidade, 'quantidade_numeros')
+    adicionar_coluna(conexao, Premiacao, 'acertos')
+
+    # Números por bilhete deduzidos do primeiro bilhete do catálogo de cada modalidade
+    linhas = conexao.execute(
+        db.select(BilhetePredefinido.modalidade_id, BilhetePredefinido.numeros)
+        .join(Modalidade, Modalidade.id == BilhetePredefinido.modalidade_id)
+        .where(Modalidade.quantidade_numeros.is_(None))
+        .order_by(BilhetePredefinido.id)
+    )
+    quantidades = {}
+    for modalidade_id, numeros in linhas:
+        try:
+            quantidades.setdefault(modalidade_id, len(json.loads(numeros)))
+        except (ValueError, TypeError):
+            continue
+    for modalidade_id, quantidade in quantidades.items():
+        conexao.execute(
+            db.update(Modalidade.__table__)
+            .where(Modalidade.__table__.c.id == modalidade_id)
+            .values(quantidade_numeros=quantidade)
+        )
+
+
+@migracao(11, 'Catálogo de bilhetes: números em bitset e índice invertido número -> bilhete')
+def _indice_bilhetes(conexao):
+    from .modalidade import BilhetePredefinido, BilheteNumero, indexar_bilhetes
+
+    adicionar_coluna(conexao, BilhetePredefinido, 'bits')
+    BilheteNumero.__table__.create(conexao, checkfirst=True)
+    criar_indices(conexao, BilhetePredefinido, ['ix_bilhetes_predefinidos_modalidade_bits'])
+    criar_indices(conexao, BilheteNumero, ['ix_bilhetes_numeros_bilhete'])
+
+    # Bilhetes gravados só com o JSON
+    linhas = conexao.execute(
+        db.select(BilhetePredefinido.id, BilhetePredefinido.numeros)
+        .where(BilhetePredefinido.bits.is_(None))
+        .order_by(BilhetePredefinido.id)
+    ).all()
+    for inicio in range(0, len(linhas), 10000):
+        indexar_bilhetes(conexao, linhas[inicio:inicio + 10000])
+    atualizar_estatisticas(conexao)
+
+
+@migracao(12, 'Versão do catálogo de modalidades em estatisticas_gerais')
+def _versao_catalogo(conexao):
+    from .estatisticas import EstatisticaGeral
+
+    adicionar_coluna(conexao, EstatisticaGeral, 'versao_catalogo')
+
+
+@migracao(13, 'Versão do histórico de sorteios em estatisticas_gerais')
+def _versao_historico(conexao):
+    from .estatisticas import EstatisticaGeral
+
+    adicionar_coluna(conexao, EstatisticaGeral, 'versao_historico')
+
+
+def versoes_aplicadas():
+    """Retorna o conjunto de versões já registradas no banco"""
+    return {versao for (versao,) in db.session.query(VersaoSchema.versao).all()}
+
+
+@contextmanager
+def bloqueio_migracoes(engine):
+    """Trava entre processos para o create_all() e as migrações.
+
+    Todos os workers migram ao subir, e dois DDLs iguais ao mesmo tempo
+    (CREATE INDEX com checkfirst, ALTER TABLE depois da inspeção) falham no
+    segundo com erro de tabela/coluna duplicada. No PostgreSQL a trava é um
+    advisory lock de sessão; no SQLite em arquivo, um flock ao lado do banco.
+    """
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as conexao:
+            conexao.execute(db.text('SELECT pg_advisory_lock(:chave)'), {'chave': CHAVE_BLOQUEIO_MIGRACOES})
+            conexao.commit()
+            try:
+                yield
+            finally:
+                conexao.execute(db.text('SELECT pg_advisory_unlock(:chave)'), {'chave': CHAVE_BLOQUEIO_MIGRACOES})
+                conexao.commit()
+        return
+
+    caminho = engine.url.database if engine.dialect.name == 'sqlite' else None
+    if fcntl is None or not caminho or caminho == ':memory:':
+        yield
+        return
+
+    with open(f'{caminho}.migracoes.lock', 'a') as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def aplicar_migracoes(criar_tabelas=False):
+    """Aplica, em ordem, as migrações que ainda não constam em schema_versao.
+
+    Roda sob bloqueio_migracoes(): um processo migra e os demais esperam e
+    encontram as versões já registradas. Com criar_tabelas, o create_all()
+    da inicialização roda antes, sob a mesma trava. Cada migração roda em sua
+    própria transação junto com o registro da versão; um registro duplicado
+    (outro processo sem a trava, como um SQLite fora do Unix) é descartado e
+    a migração segue como já aplicada. Retorna as versões aplicadas.
+    """
+    with bloqueio_migracoes(db.engine):
+        if criar_tabelas:
+            db.create_all()
+        VersaoSchema.__table__.create(db.engine, checkfirst=True)
+        aplicadas = versoes_aplicadas()
+        db.session.remove()
+
+        novas = []
+        for versao, descricao, funcao in MIGRACOES:
+            if versao in aplicadas:
+                continue
+
+            logger.info(f"Aplicando migração {versao}: {descricao}")
+            try:
+                with db.engine.begin() as conexao:
+                    funcao(conexao)
+                    conexao.execute(db.insert(VersaoSchema.__table__).values(
+                        versao=versao,
+                        descricao=descricao,
+                        aplicada_em=datetime.utcnow()
+                    ))
+            except IntegrityError:
+                logger.info(f"Migração {versao} já aplicada por outro processo")
+                continue
+
+            novas.append(versao)
+
+    return novas
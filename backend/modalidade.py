@@ -0,0 +1,306 @@
+from .database import db
+from .bitset_numeros import BitsetNumeros
+from datetime import datetime
+import json
+
+class Modalidade(db.Model):
+    """Modalidade de bilhetes com vários números ("2 pra 500", "Mega Sorte", ...)"""
+    __tablename__ = 'modalidades'
+
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False)
+    descricao = db.Column(db.String(255), nullable=False)
+    cor = db.Column(db.String(50), nullable=False)
+    ativo = db.Column(db.Boolean, default=True)
+
+    # Números por bilhete; também é a quantidade de números sorteados na apuração
+    quantidade_numeros = db.Column(db.Integer, nullable=True)
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'id': self.id,
+            'nome': self.nome,
+            'descricao': self.descricao,
+            'cor': self.cor,
+            'ativo': self.ativo,
+            'quantidade_numeros': self.quantidade_numeros
+        }
+
+    def __repr__(self):
+        return f'<Modalidade {self.nome}>'
+
+class BilhetePredefinido(db.Model):
+    """Bilhete do catálogo de uma modalidade, com os números já escolhidos.
+
+    Os números ficam em ``bits`` (BitsetNumeros, 63 bytes) e, um por linha, em
+    bilhetes_numeros, o índice invertido usado para achar bilhetes com um
+    número ou que se sobrepõem a outro sem ler e decodificar o catálogo
+    inteiro. A coluna JSON ``numeros`` continua sendo gravada para os bancos
+    criados pela versão anterior, mas não é mais lida.
+    """
+    __tablename__ = 'bilhetes_predefinidos'
+    __table_args__ = (
+        # Bilhetes idênticos: comparação do bitset inteiro dentro da modalidade
+        db.Index('ix_bilhetes_predefinidos_modalidade_bits', 'modalidade_id', 'bits'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    modalidade_id = db.Column(db.Integer, db.ForeignKey('modalidades.id'), nullable=False)
+    numeros = db.deferred(db.Column(db.Text, nullable=False))  # JSON string com os números (legado)
+    bits = db.Column(db.LargeBinary(63), nullable=True)  # BitsetNumeros.para_bytes()
+    preco = db.Column(db.Float, nullable=False)
+    ativo = db.Column(db.Boolean, default=True)
+
+    # Relacionamento com a modalidade
+    modalidade = db.relationship('Modalidade', backref='bilhetes_predefinidos')
+
+    # Linhas do índice invertido, regravadas por set_numeros
+    indice_numeros = db.relationship('BilheteNumero', cascade='all, delete-orphan')
+
+    def get_numeros(self):
+        if self.bits is not None:
+            return list(BitsetNumeros.de_bytes(self.bits))
+        # Linha ainda não migrada (migração 11)
+        try:
+            return json.loads(self.numeros)
+        except (json.JSONDecodeError, TypeError):
+            return []
+
+    def set_numeros(self, numeros_list):
+        bitset = BitsetNumeros(numeros_list)
+        self.bits = bitset.para_bytes()
+        self.numeros = json.dumps(list(bitset))
+        self.indice_numeros = [BilheteNumero(numero=numero) for numero in bitset]
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'id': self.id,
+            'modalidade_id': self.modalidade_id,
+            'numeros': self.get_numeros(),
+            'preco': self.preco,
+            'ativo': self.ativo
+        }
+
+class BilheteNumero(db.Model):
+    """Índice invertido do catálogo: uma linha por (número, bilhete)"""
+    __tablename__ = 'bilhetes_numeros'
+    __table_args__ = (
+        # Regravação dos números de um bilhete
+        db.Index('ix_bilhetes_numeros_bilhete', 'bilhete_id'),
+    )
+
+    numero = db.Column(db.Integer, primary_key=True)
+    bilhete_id = db.Column(db.Integer, db.ForeignKey('bilhetes_predefinidos.id'), primary_key=True)
+
+    def __repr__(self):
+        return f'<BilheteNumero {self.numero} - bilhete {self.bilhete_id}>'
+
+class Premiacao(db.Model):
+    """Faixa de prêmio de uma modalidade: valor pago por bilhete com ``acertos`` acertos"""
+    __tablename__ = 'premiacoes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    modalidade_id = db.Column(db.Integer, db.ForeignKey('modalidades.id'), nullable=False)
+    posicao = db.Column(db.String(50), nullable=False)  # "1º Prêmio", "2º Prêmio", etc.
+    valor = db.Column(db.Float, nullable=False)
+
+    # Acertos exigidos; sem valor, a faixa de maior prêmio exige todos os números,
+    # a seguinte um a menos, e assim por diante (apuracao_modalidades.faixas_premiacao)
+    acertos = db.Column(db.Integer, nullable=True)
+
+    # Relacionamento com a modalidade
+    modalidade = db.relationship('Modalidade', backref='premiacoes')
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'id': self.id,
+            'modalidade_id': self.modalidade_id,
+            'posicao': self.posicao,
+            'valor': self.valor,
+            'acertos': self.acertos
+        }
+
+class ApostaModalidade(db.Model):
+    """Bilhete de uma modalidade comprado para um sorteio.
+
+    Os números ficam no mesmo bitset de 63 bytes de numeros_usuario_sorteio,
+    para que a apuração leia os bilhetes como uma matriz de bytes e conte os
+    acertos de todos de uma vez. ``acertos``, ``premiacao_id`` e ``premio`` só
+    são gravados nos bilhetes premiados.
+    """
+    __tablename__ = 'apostas_modalidades'
+    __table_args__ = (
+        # Apuração: bilhetes ativos de (sorteio_id, modalidade_id)
+        db.Index('ix_apostas_modalidades_sorteio', 'sorteio_id', 'modalidade_id', 'status'),
+        # Histórico do usuário
+        db.Index('ix_apostas_modalidades_user', 'user_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    sorteio_id = db.Column(db.Integer, db.ForeignKey('sorteios.id'), nullable=False)
+    modalidade_id = db.Column(db.Integer, db.ForeignKey('modalidades.id'), nullable=False)
+    bilhete_id = db.Column(db.Integer, db.ForeignKey('bilhetes_predefinidos.id'), nullable=True)
+    numeros = db.Column(db.LargeBinary(63), nullable=False)  # BitsetNumeros.para_bytes()
+    valor = db.Column(db.Float, nullable=False)
+    data_aposta = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), nullable=False, default='ativa')  # ativa, ganhadora, perdedora
+    acertos = db.Column(db.Integer, nullable=True)
+    premiacao_id = db.Column(db.Integer, db.ForeignKey('premiacoes.id'), nullable=True)
+    premio = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+
+    def get_numeros(self):
+        return list(BitsetNumeros.de_bytes(self.numeros))
+
+    def set_numeros(self, numeros_list):
+        self.numeros = BitsetNumeros(numeros_list).para_bytes()
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'sorteio_id': self.sorteio_id,
+            'modalidade_id': self.modalidade_id,
+            'bilhete_id': self.bilhete_id,
+            'numeros': self.get_numeros(),
+            'valor': self.valor,
+            'data_aposta': self.data_aposta.isoformat() if self.data_aposta else None,
+            'status': self.status,
+            'acertos': self.acertos,
+            'premio': self.premio
+        }
+
+    def __repr__(self):
+        return f'<ApostaModalidade {self.id} - Modalidade {self.modalidade_id}>'
+
+class ResultadoModalidade(db.Model):
+    """Resultado da apuração de uma modalidade em um sorteio (uma linha por apuração concluída)"""
+    __tablename__ = 'resultados_modalidades'
+
+    sorteio_id = db.Column(db.Integer, db.ForeignKey('sorteios.id'), primary_key=True)
+    modalidade_id = db.Column(db.Integer, db.ForeignKey('modalidades.id'), primary_key=True)
+    numeros_sorteados = db.Column(db.Text, nullable=False)  # JSON string com os números
+    total_bilhetes = db.Column(db.Integer, nullable=False, default=0)
+    total_ganhadores = db.Column(db.Integer, nullable=False, default=0)
+    total_premios = db.Column(db.Float, nullable=False, default=0.0)
+    duracao_ms = db.Column(db.Float, nullable=True)
+    data_apuracao = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'sorteio_id': self.sorteio_id,
+            'modalidade_id': self.modalidade_id,
+            'numeros_sorteados': json.loads(self.numeros_sorteados),
+            'total_bilhetes': self.total_bilhetes,
+            'total_ganhadores': self.total_ganhadores,
+            'total_premios': self.total_premios,
+            'duracao_ms': self.duracao_ms,
+            'data_apuracao': self.data_apuracao.isoformat() if self.data_apuracao else None
+        }
+
+
+def _filtrar_bilhetes(consulta, modalidade_id, apenas_ativos):
+    if modalidade_id is not None:
+        consulta = consulta.where(BilhetePredefinido.modalidade_id == modalidade_id)
+    if apenas_ativos:
+        consulta = consulta.where(BilhetePredefinido.ativo.is_(True))
+    return consulta
+
+
+def bilhetes_com_numeros(numeros, minimo=1, modalidade_id=None, apenas_ativos=True):
+    """Bilhetes do catálogo com pelo menos ``minimo`` dos números dados.
+
+    Usa só o índice invertido: conta, por bilhete, as linhas de
+    bilhetes_numeros com esses números. Retorna [(BilhetePredefinido, comuns)]
+    do maior para o menor número de números em comum.
+    """
+    numeros = list(BitsetNumeros(numeros))
+    if not numeros:
+        return []
+
+    comuns = db.func.count().label('comuns')
+    encontrados = (
+        db.select(BilheteNumero.bilhete_id, comuns)
+        .where(BilheteNumero.numero.in_(numeros))
+        .group_by(BilheteNumero.bilhete_id)
+        .having(comuns >= minimo)
+        .subquery()
+    )
+    consulta = (
+        db.select(BilhetePredefinido, encontrados.c.comuns)
+        .join(encontrados, encontrados.c.bilhete_id == BilhetePredefinido.id)
+        .order_by(encontrados.c.comuns.desc(), BilhetePredefinido.id)
+    )
+    return db.session.execute(_filtrar_bilhetes(consulta, modalidade_id, apenas_ativos)).all()
+
+
+def bilhetes_sobrepostos(bilhete, minimo=1, apenas_ativos=True):
+    """Outros bilhetes da mesma modalidade com pelo menos ``minimo`` números em comum com ``bilhete``"""
+    return [
+        (outro, comuns)
+        for outro, comuns in bilhetes_com_numeros(bilhete.get_numeros(), minimo, bilhete.modalidade_id, apenas_ativos)
+        if outro.id != bilhete.id
+    ]
+
+
+def bilhetes_identicos(numeros, modalidade_id=None, apenas_ativos=True):
+    """Bilhetes do catálogo com exatamente os números dados (igualdade do bitset, pelo índice)"""
+    consulta = (
+        db.select(BilhetePredefinido)
+        .where(BilhetePredefinido.bits == BitsetNumeros(numeros).para_bytes())
+        .order_by(BilhetePredefinido.id)
+    )
+    return db.session.execute(_filtrar_bilhetes(consulta, modalidade_id, apenas_ativos)).scalars().all()
+
+
+def indexar_bilhetes(conexao, linhas):
+    """Grava ``bits`` e o índice invertido de [(bilhete_id, numeros JSON)] (sem commit).
+
+    Usada pela migração 11 e por reconstruir_indice_bilhetes(); linhas com
+    JSON inválido ficam sem bitset e sem índice. Retorna os bilhetes gravados.
+    """
+    bilhetes = BilhetePredefinido.__table__
+    indice = BilheteNumero.__table__
+
+    atualizacoes = []
+    numeros = []
+    for bilhete_id, texto in linhas:
+        try:
+            bitset = BitsetNumeros(json.loads(texto))
+        except (ValueError, TypeError):
+            continue
+        atualizacoes.append({'b_id': bilhete_id, 'b_bits': bitset.para_bytes()})
+        numeros.extend({'numero': numero, 'bilhete_id': bilhete_id} for numero in bitset)
+
+    if atualizacoes:
+        conexao.execute(
+            db.update(bilhetes).where(bilhetes.c.id == db.bindparam('b_id')).values(bits=db.bindparam('b_bits')),
+            atualizacoes
+        )
+        conexao.execute(
+            db.delete(indice).where(indice.c.bilhete_id.in_([linha['b_id'] for linha in atualizacoes]))
+        )
+    if numeros:
+        conexao.execute(db.insert(indice), numeros)
+    return len(atualizacoes)
+
+
+def reconstruir_indice_bilhetes(modalidade_id=None):
+    """Recalcula bitsets e índice invertido do catálogo a partir da coluna JSON (sem commit).
+
+    Sem modalidade_id, reconstrói o catálogo inteiro. Retorna os bilhetes gravados.
+    """
+    consulta = db.select(BilhetePredefinido.id, BilhetePredefinido.numeros).order_by(BilhetePredefinido.id)
+    if modalidade_id is not None:
+        consulta = consulta.where(BilhetePredefinido.modalidade_id == modalidade_id)
+
+    total = 0
+    linhas = db.session.execute(consulta.execution_options(yield_per=10000))
+    for lote in linhas.partitions():
+        total += indexar_bilhetes(db.session, lote)
+    return total
@@ -12,15 +12,19 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     telefone = db.Column(db.String(20), nullable=True)
     saldo = db.Column(db.Float, default=2.0) # Saldo inicial conforme requisitos
+    is_admin = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
 
     # >>> RELACIONAMENTO COM APOSTAS <<< 
     # Esta linha é crucial para o funcionamento da ForeignKey em Aposta
     apostas = db.relationship('Aposta', backref='usuario', lazy=True)
 
-    def __init__(self, nome, email, password, telefone=None):
+    def __init__(self, nome, email, password=None, telefone=None, password_hash=None):
         self.nome = nome
         self.email = email
-        self.set_password(password) # Hasheia a senha no momento da criação
+        if password_hash is not None:
+            self.password_hash = password_hash # Hash já gerado (servico_senhas)
+        else:
+            self.set_password(password) # Hasheia a senha no momento da criação
         self.telefone = telefone
 
     def set_password(self, password):
@@ -0,0 +1,152 @@
+from flask import current_app
+from .database import db
+from .bitset_numeros import BitsetNumeros
+from .contagem_numeros import _insert_com_conflito
+
+class NumerosUsuarioSorteio(db.Model):
+    """Números apostados por um usuário em um sorteio, guardados como bitset de 500 bits.
+
+    Mantido na mesma transação em que as apostas são registradas, para que a
+    tela de escolha de números e a verificação de duplicadas leiam uma única
+    linha de 63 bytes em vez das apostas do usuário no sorteio.
+    """
+    __tablename__ = 'numeros_usuario_sorteio'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    sorteio_id = db.Column(db.Integer, db.ForeignKey('sorteios.id'), primary_key=True)
+    bits = db.Column(db.LargeBinary(63), nullable=False)
+
+    def __repr__(self):
+        return f'<NumerosUsuarioSorteio user {self.user_id} - sorteio {self.sorteio_id}>'
+
+
+def persistencia_habilitada():
+    """Indica se o bitset é gravado em numeros_usuario_sorteio (PERSISTIR_NUMEROS_APOSTADOS).
+
+    Ao reabilitar a persistência, rode ``flask reconstruir-numeros-apostados``:
+    as apostas feitas com ela desligada não constam das linhas existentes.
+    """
+    return current_app.config.get('PERSISTIR_NUMEROS_APOSTADOS', True)
+
+
+def _numeros_das_apostas(user_id, sorteio_id):
+    """Monta o bitset a partir das apostas, usando o índice único (user_id, sorteio_id, numero)"""
+    from .aposta import Aposta
+
+    linhas = db.session.query(Aposta.numero_escolhido).filter(
+        Aposta.user_id == user_id,
+        Aposta.sorteio_id == sorteio_id
+    ).all()
+
+    return BitsetNumeros(numero for (numero,) in linhas)
+
+
+def carregar_numeros_apostados(user_id, sorteio_id):
+    """Retorna o BitsetNumeros com os números que o usuário já apostou no sorteio.
+
+    Com a persistência habilitada lê uma única linha pela chave primária; sem
+    ela, ou se a linha ainda não existe, monta o conjunto a partir das apostas.
+    """
+    if persistencia_habilitada():
+        bits = db.session.execute(
+            db.select(NumerosUsuarioSorteio.bits).where(
+                NumerosUsuarioSorteio.user_id == user_id,
+                NumerosUsuarioSorteio.sorteio_id == sorteio_id
+            )
+        ).scalar_one_or_none()
+        if bits is not None:
+            return BitsetNumeros.de_bytes(bits)
+
+    return _numeros_das_apostas(user_id, sorteio_id)
+
+
+def registrar_numeros_apostados(user_id, sorteio_id, anterior, novos):
+    """Grava o bitset com os números recém-apostados (sem commit).
+
+    ``anterior`` é o conjunto lido por carregar_numeros_apostados(). A gravação
+    só vale se a linha não mudou desde a leitura; se outra transação gravou
+    antes, o conjunto é remontado a partir das apostas (já com as desta
+    transação) e regravado. Deve ser chamada depois do flush das apostas.
+    """
+    if not persistencia_habilitada():
+        return
+
+    tabela = NumerosUsuarioSorteio.__table__
+    chave = (tabela.c.user_id == user_id, tabela.c.sorteio_id == sorteio_id)
+    atual = anterior | novos
+
+    if anterior.bits:
+        gravou = db.session.execute(
+            db.update(tabela).where(*chave, tabela.c.bits == anterior.para_bytes())
+            .values(bits=atual.para_bytes())
+        ).rowcount
+    else:
+        linha = {'user_id': user_id, 'sorteio_id': sorteio_id, 'bits': atual.para_bytes()}
+        insert = _insert_com_conflito(db.session.get_bind().dialect.name)
+        if insert is not None:
+            gravou = db.session.execute(
+                insert(tabela).values(**linha).on_conflict_do_nothing()
+            ).rowcount
+        else:
+            gravou = db.session.execute(db.insert(tabela).values(**linha)).rowcount
+
+    if not gravou:
+        # Outra transação gravou antes (ou a linha ainda não existia para apostas
+        # anteriores): as apostas são a fonte da verdade
+        _gravar(user_id, sorteio_id, _numeros_das_apostas(user_id, sorteio_id))
+
+
+def _gravar(user_id, sorteio_id, bitset):
+    """Grava o bitset incondicionalmente, criando a linha se necessário"""
+    tabela = NumerosUsuarioSorteio.__table__
+    linha = {'user_id': user_id, 'sorteio_id': sorteio_id, 'bits': bitset.para_bytes()}
+
+    insert = _insert_com_conflito(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(tabela).values(**linha)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[tabela.c.user_id, tabela.c.sorteio_id],
+            set_={'bits': stmt.excluded.bits}
+        ))
+        return
+
+    resultado = db.session.execute(
+        db.update(tabela)
+        .where(tabela.c.user_id == user_id, tabela.c.sorteio_id == sorteio_id)
+        .values(bits=linha['bits'])
+    )
+    if resultado.rowcount == 0:
+        db.session.execute(db.insert(tabela), [linha])
+
+
+def reconstruir_numeros_apostados(sorteio_id=None):
+    """Recalcula os bitsets a partir da tabela de apostas (sem commit).
+
+    Sem sorteio_id, reconstrói os bitsets de todos os sorteios.
+    Retorna o número de linhas gravadas.
+    """
+    from .aposta import Aposta
+
+    tabela = NumerosUsuarioSorteio.__table__
+
+    apagar = db.delete(tabela)
+    consulta = db.session.query(
+        Aposta.user_id, Aposta.sorteio_id, Aposta.numero_escolhido
+    ).order_by(Aposta.user_id, Aposta.sorteio_id)
+
+    if sorteio_id is not None:
+        apagar = apagar.where(tabela.c.sorteio_id == sorteio_id)
+        consulta = consulta.filter(Aposta.sorteio_id == sorteio_id)
+
+    db.session.execute(apagar)
+
+    bitsets = {}
+    for user_id, id_sorteio, numero in consulta.yield_per(10000):
+        bitsets.setdefault((user_id, id_sorteio), BitsetNumeros()).adicionar(numero)
+
+    if bitsets:
+        db.session.execute(db.insert(tabela), [
+            {'user_id': user_id, 'sorteio_id': id_sorteio, 'bits': bitset.para_bytes()}
+            for (user_id, id_sorteio), bitset in bitsets.items()
+        ])
+    return len(bitsets)
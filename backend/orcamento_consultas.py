@@ -0,0 +1,155 @@
+from src.models.database import db
+from sqlalchemy import event
+from contextlib import contextmanager
+import functools
+import threading
+
+# Máximo de instruções SQL por chamada de cada rota (endpoint do Flask), com
+# qualquer tamanho de página ou volume de dados. Rotas que gravam um número
+# variável de linhas somam ``por_item`` para cada item recebido. Conferido por
+# benchmarks/orcamento_consultas.py e, em produção, pelas métricas (um aviso
+# no log quando uma requisição passa do orçamento). Os orçamentos não contam a
+# criação do sorteio do dia (Sorteio.get_sorteio_atual), que a primeira
+# requisição do dia faz: até 4 consultas a mais (INSERT, estatísticas e as
+# releituras depois do commit), com um aviso no log uma vez por dia.
+ORCAMENTOS = {
+    # auth
+    'auth.register': {'maximo': 6},
+    'auth.login': {'maximo': 2},  # + UPDATE quando o hash é refeito na política atual
+    'auth.logout': {'maximo': 0},
+    'auth.get_current_user': {'maximo': 1},
+    # user
+    'user.get_perfil': {'maximo': 1},
+    'user.update_perfil': {'maximo': 4},
+    'user.alterar_senha': {'maximo': 2},
+    'user.get_saldo': {'maximo': 1},
+    # UPDATE e leitura do saldo, estatísticas, lançamento e a leitura dele para a resposta
+    'user.adicionar_saldo': {'maximo': 5},
+    'user.historico_transacoes': {'maximo': 2},
+    # apostas: usuário, sorteio, bitset dos números, débito (UPDATE + saldo), estatísticas
+    # do saldo, lançamento, INSERT das apostas (um só para o lote inteiro), contagens,
+    # três estatísticas, totais do sorteio e bitset gravado
+    'apostas.fazer_aposta': {'maximo': 15},  # + leitura dos números já apostados
+    'apostas.fazer_apostas_lote': {'maximo': 14},
+    # bilhete, modalidade, sorteio travado, débito (UPDATE + saldo), estatísticas, lançamento e INSERT
+    'apostas.comprar_bilhete_modalidade': {'maximo': 10},
+    'apostas.estado_reserva': {'maximo': 0},
+    'apostas.minhas_apostas': {'maximo': 3},
+    'apostas.apostas_hoje': {'maximo': 2},
+    'apostas.numeros_disponiveis': {'maximo': 2},
+    # catálogo servido da memória; 1 consulta quando confere a versão, 5 quando recarrega
+    'apostas.get_modalidades': {'maximo': 5},
+    'apostas.get_bilhetes_modalidade': {'maximo': 5},
+    'apostas.get_premiacoes_modalidade': {'maximo': 5},
+    # sorteios (respostas geradas; com o cache de respostas há menos consultas)
+    'sorteios.sorteio_atual': {'maximo': 2},
+    'sorteios.historico_sorteios': {'maximo': 3},
+    'sorteios.resultado_sorteio': {'maximo': 2},
+    'sorteios.estatisticas': {'maximo': 3},
+    'sorteios.stream_sorteio': {'maximo': 2},
+    # admin
+    # Sorteio e liquidação do número único; cada modalidade com bilhetes no sorteio (itens)
+    # soma as consultas de apurar_modalidade, que não dependem do número de bilhetes
+    'admin.executar_sorteio_manual': {'maximo': 21, 'por_item': 10},
+    'admin.status_scheduler': {'maximo': 3},
+    'admin.parar_scheduler': {'maximo': 1},
+    'admin.reiniciar_scheduler': {'maximo': 1},
+    'admin.estatisticas_admin': {'maximo': 2},
+    'admin.listar_usuarios': {'maximo': 2},
+    'admin.ajustar_saldo': {'maximo': 6},
+    'admin.metricas': {'maximo': 4},
+    # escritas do catálogo: + 5 consultas (versão do catálogo incrementada, conferida e
+    # as três leituras da recarga depois do commit)
+    'admin.criar_modalidade': {'maximo': 6},
+    'admin.atualizar_modalidade': {'maximo': 7},
+    # um INSERT por bilhete: o índice de números precisa do id de cada um
+    'admin.criar_bilhetes': {'maximo': 7, 'por_item': 1},
+    'admin.atualizar_bilhete': {'maximo': 12},
+    'admin.criar_premiacao': {'maximo': 7},
+    'admin.alterar_premiacao': {'maximo': 8},  # DELETE confere antes se há apostas na faixa
+}
+
+
+def orcamento_da_rota(endpoint, itens=None):
+    """Máximo de consultas da rota para uma chamada com ``itens`` itens.
+
+    Retorna None se a rota não tem orçamento, ou se ele depende do número de
+    itens e ``itens`` não foi informado.
+    """
+    orcamento = ORCAMENTOS.get(endpoint)
+    if orcamento is None:
+        return None
+    if 'por_item' in orcamento:
+        if itens is None:
+            return None
+        return orcamento['maximo'] + orcamento['por_item'] * itens
+    return orcamento['maximo']
+
+
+class OrcamentoExcedido(AssertionError):
+    """Uma chamada executou mais instruções SQL que o orçamento declarado"""
+
+    def __init__(self, maximo, instrucoes, descricao=None):
+        self.maximo = maximo
+        self.instrucoes = instrucoes
+        alvo = f'{descricao}: ' if descricao else ''
+        listagem = '\n'.join(f'  {indice}. {sql}' for indice, sql in enumerate(instrucoes, 1))
+        super().__init__(
+            f'{alvo}{len(instrucoes)} consultas executadas, orçamento de {maximo}\n{listagem}'
+        )
+
+
+class ContadorConsultas:
+    """Registra as instruções SQL que o engine executa enquanto o contador está ativo.
+
+    Só conta o que roda na thread que abriu o contador, para que o scheduler
+    e a fila de apostas não interfiram. Requer app context.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.instrucoes = []
+        self._thread = None
+
+    @property
+    def total(self):
+        return len(self.instrucoes)
+
+    def _registrar(self, conexao, cursor, sql, parametros, contexto, executemany):
+        if threading.get_ident() == self._thread:
+            self.instrucoes.append(' '.join(sql.split()))
+
+    def __enter__(self):
+        if self.engine is None:
+            self.engine = db.engine
+        self._thread = threading.get_ident()
+        event.listen(self.engine, 'before_cursor_execute', self._registrar)
+        return self
+
+    def __exit__(self, *excecao):
+        event.remove(self.engine, 'before_cursor_execute', self._registrar)
+        return False
+
+
+@contextmanager
+def orcamento_consultas(maximo, descricao=None, engine=None):
+    """Levanta OrcamentoExcedido se o bloco executar mais de ``maximo`` instruções SQL.
+
+        with orcamento_consultas(3, 'minhas-apostas'):
+            cliente.get('/api/apostas/minhas-apostas?per_page=100')
+    """
+    with ContadorConsultas(engine) as contador:
+        yield contador
+    if contador.total > maximo:
+        raise OrcamentoExcedido(maximo, contador.instrucoes, descricao)
+
+
+def limite_consultas(maximo):
+    """Decorator: a função falha com OrcamentoExcedido se passar de ``maximo`` consultas"""
+    def decorator(funcao):
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            with orcamento_consultas(maximo, funcao.__qualname__):
+                return funcao(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,153 @@
+from flask import request
+from src.models.database import db
+from datetime import date, datetime
+import base64
+import binascii
+import json
+
+# Maior página aceita nas listagens
+MAXIMO_POR_PAGINA = 100
+
+
+class CursorInvalido(ValueError):
+    """O cursor recebido não foi gerado por esta API ou está corrompido"""
+
+
+def _serializar_valor(valor):
+    if isinstance(valor, datetime):
+        return {'dt': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    return valor
+
+
+def _desserializar_valor(valor):
+    if isinstance(valor, dict):
+        if 'dt' in valor:
+            return datetime.fromisoformat(valor['dt'])
+        if 'd' in valor:
+            return date.fromisoformat(valor['d'])
+        raise CursorInvalido()
+    return valor
+
+
+def codificar_cursor(valores, direcao):
+    """Gera um token opaco com os valores das chaves de ordenação de uma linha"""
+    dados = {'v': [_serializar_valor(valor) for valor in valores], 'd': direcao}
+    bruto = json.dumps(dados, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+
+def decodificar_cursor(token, quantidade_chaves):
+    """Recupera (valores, direcao) de um token gerado por codificar_cursor"""
+    try:
+        bruto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        dados = json.loads(bruto)
+        valores = [_desserializar_valor(valor) for valor in dados['v']]
+        direcao = dados['d']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise CursorInvalido()
+
+    if len(valores) != quantidade_chaves or direcao not in ('proxima', 'anterior'):
+        raise CursorInvalido()
+    return valores, direcao
+
+
+def usar_cursor(args=None):
+    """Indica se a requisição pediu paginação por cursor em vez de page/per_page"""
+    args = request.args if args is None else args
+    return 'cursor' in args or args.get('paginacao') == 'cursor'
+
+
+def aplicar_cursor(consulta, chaves, cursor=None):
+    """Filtra e ordena a consulta (Query ou Select) a partir do cursor.
+
+    Retorna (consulta, direcao). Sem cursor, a página é a primeira em ordem
+    decrescente das chaves.
+    """
+    direcao = 'proxima'
+    if cursor:
+        valores, direcao = decodificar_cursor(cursor, len(chaves))
+        linha = db.tuple_(*chaves) if len(chaves) > 1 else chaves[0]
+        referencia = db.tuple_(*valores) if len(chaves) > 1 else valores[0]
+        if direcao == 'proxima':
+            consulta = consulta.filter(linha < referencia)
+        else:
+            consulta = consulta.filter(linha > referencia)
+
+    if direcao == 'proxima':
+        consulta = consulta.order_by(*[chave.desc() for chave in chaves])
+    else:
+        consulta = consulta.order_by(*[chave.asc() for chave in chaves])
+    return consulta, direcao
+
+
+def montar_pagina_cursor(itens, chaves, por_pagina, direcao, cursor=None):
+    """Monta a página a partir das até ``por_pagina + 1`` linhas lidas com aplicar_cursor"""
+    ha_mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
+
+    if direcao == 'anterior':
+        itens.reverse()
+
+    def valores_da_linha(item):
+        return [getattr(item, chave.key) for chave in chaves]
+
+    next_cursor = prev_cursor = None
+    if itens:
+        # Seguindo adiante, há próxima página se sobrou linha; voltando, sempre há
+        if ha_mais or direcao == 'anterior':
+            next_cursor = codificar_cursor(valores_da_linha(itens[-1]), 'proxima')
+        # Há página anterior se viemos de um cursor ou, voltando, se sobrou linha
+        if (cursor and direcao == 'proxima') or (direcao == 'anterior' and ha_mais):
+            prev_cursor = codificar_cursor(valores_da_linha(itens[0]), 'anterior')
+
+    return {
+        'itens': itens,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+    }
+
+
+def paginar_por_cursor(query, chaves, por_pagina, cursor=None, incluir_total=False):
+    """Pagina uma consulta em ordem decrescente das chaves usando keyset.
+
+    ``chaves`` são as colunas de ordenação (a última deve ser única, como o id),
+    cobertas por um índice. Em vez de OFFSET, cada página filtra a partir dos
+    valores da última (ou primeira) linha da página anterior, então qualquer
+    página custa o mesmo que a primeira. O COUNT(*) só é feito se pedido.
+
+    Retorna um dicionário com 'itens', 'next_cursor', 'prev_cursor' e, quando
+    incluir_total, 'total'.
+    """
+    por_pagina = max(1, min(por_pagina, MAXIMO_POR_PAGINA))
+    total = query.order_by(None).count() if incluir_total else None
+
+    paginada, direcao = aplicar_cursor(query, chaves, cursor)
+    itens = paginada.limit(por_pagina + 1).all()
+
+    pagina = montar_pagina_cursor(itens, chaves, por_pagina, direcao, cursor)
+    if incluir_total:
+        pagina['total'] = total
+    return pagina
+
+
+def parametros_cursor(por_pagina_padrao, args=None):
+    """Lê cursor, per_page e incluir_total da query string"""
+    args = request.args if args is None else args
+    return {
+        'cursor': args.get('cursor') or None,
+        'por_pagina': args.get('per_page', por_pagina_padrao, type=int),
+        'incluir_total': args.get('incluir_total', '0').lower() in ('1', 'true', 'sim'),
+    }
+
+
+def campos_cursor(pagina):
+    """Campos de paginação por cursor para incluir na resposta JSON"""
+    campos = {
+        'next_cursor': pagina['next_cursor'],
+        'prev_cursor': pagina['prev_cursor'],
+    }
+    if 'total' in pagina:
+        campos['total'] = pagina['total']
+    return campos
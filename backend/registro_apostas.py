@@ -0,0 +1,147 @@
+from src.models.database import db
+from src.models.aposta import Aposta
+from src.models.modalidade import ApostaModalidade
+from src.models.contagem_numeros import incrementar_contagens
+from src.models.bitset_numeros import BitsetNumeros
+from src.models.estatisticas import registrar_apostas_estatisticas
+from src.models.numeros_usuario_sorteio import carregar_numeros_apostados, registrar_numeros_apostados
+from src.services.carteira import lancar
+
+VALOR_APOSTA = 2.0
+NUMERO_MINIMO = 1
+NUMERO_MAXIMO = 500
+
+# Motivos de rejeição devolvidos por número
+MOTIVO_NUMERO_INVALIDO = 'Número deve estar entre 1 e 500'
+MOTIVO_REPETIDO_NO_LOTE = 'Número repetido no lote'
+MOTIVO_JA_APOSTADO = 'Você já apostou neste número hoje'
+MOTIVO_SALDO_INSUFICIENTE = 'Saldo insuficiente'
+
+
+def numero_valido(numero):
+    """Verifica se o número está dentro da faixa aceita"""
+    # bool é subclasse de int, mas True/False não são números de aposta
+    return (
+        isinstance(numero, int)
+        and not isinstance(numero, bool)
+        and NUMERO_MINIMO <= numero <= NUMERO_MAXIMO
+    )
+
+
+def registrar_apostas(user, sorteio, numeros, valor_aposta=VALOR_APOSTA):
+    """Valida e registra um conjunto de apostas do usuário no sorteio.
+
+    Todo o trabalho é feito na sessão atual, sem commit: quem chama decide
+    quando confirmar a transação. Retorna uma tupla (aceitas, resultados), onde
+    ``aceitas`` são os objetos Aposta criados e ``resultados`` traz, na ordem
+    recebida, o resultado de cada número.
+
+    O débito é feito por carteira.lancar(), que levanta SaldoInsuficiente se
+    outra transação consumir o saldo entre a leitura e a gravação.
+
+    As duplicadas são verificadas no bitset dos números já apostados pelo
+    usuário no sorteio (uma leitura pela chave primária). O índice único
+    uq_apostas_user_sorteio_numero continua barrando a corrida entre duas
+    requisições simultâneas: a aposta repetida levanta IntegrityError.
+    """
+    resultados = []
+    candidatos = []
+    vistos = set()
+
+    for numero in numeros:
+        if not numero_valido(numero):
+            resultados.append({'numero': numero, 'aceita': False, 'motivo': MOTIVO_NUMERO_INVALIDO})
+        elif numero in vistos:
+            resultados.append({'numero': numero, 'aceita': False, 'motivo': MOTIVO_REPETIDO_NO_LOTE})
+        else:
+            vistos.add(numero)
+            resultado = {'numero': numero, 'aceita': True}
+            resultados.append(resultado)
+            candidatos.append(resultado)
+
+    ja_apostados = carregar_numeros_apostados(user.id, sorteio.id)
+
+    saldo_disponivel = user.saldo
+    numeros_aceitos = []
+
+    for resultado in candidatos:
+        numero = resultado['numero']
+
+        if numero in ja_apostados:
+            resultado.update(aceita=False, motivo=MOTIVO_JA_APOSTADO)
+            continue
+
+        if saldo_disponivel < valor_aposta:
+            resultado.update(aceita=False, motivo=MOTIVO_SALDO_INSUFICIENTE)
+            continue
+
+        saldo_disponivel -= valor_aposta
+        numeros_aceitos.append(numero)
+
+    aceitas = []
+    if numeros_aceitos:
+        valor_total = valor_aposta * len(numeros_aceitos)
+
+        # Um único débito, uma única inserção em lote e um único incremento no sorteio,
+        # nos contadores por número e nas estatísticas
+        lancar(
+            user.id, 'aposta', -valor_total,
+            f'Aposta em {len(numeros_aceitos)} número(s) do sorteio de {sorteio.data_sorteio.isoformat()}',
+            sorteio_id=sorteio.id
+        )
+
+        # INSERT com RETURNING de várias linhas: no SQLite o flush do ORM gravaria
+        # uma aposta por instrução, porque a ordem do RETURNING não é garantida
+        aceitas = db.session.scalars(db.insert(Aposta).returning(Aposta), [
+            {'user_id': user.id, 'sorteio_id': sorteio.id, 'numero_escolhido': numero, 'valor_aposta': valor_aposta}
+            for numero in numeros_aceitos
+        ]).all()
+        ordem = {numero: posicao for posicao, numero in enumerate(numeros_aceitos)}
+        aceitas.sort(key=lambda aposta: ordem[aposta.numero_escolhido])
+
+        sorteio.adicionar_aposta(valor_total, quantidade=len(aceitas), commit=False)
+        incrementar_contagens(sorteio.id, numeros_aceitos)
+        registrar_apostas_estatisticas(sorteio, numeros_aceitos, valor_total)
+        db.session.flush()
+        registrar_numeros_apostados(
+            user.id, sorteio.id, ja_apostados,
+            BitsetNumeros(numeros_aceitos)
+        )
+
+        apostas_por_numero = {aposta.numero_escolhido: aposta for aposta in aceitas}
+        for resultado in candidatos:
+            if resultado['aceita']:
+                resultado['aposta_id'] = apostas_por_numero[resultado['numero']].id
+
+    return aceitas, resultados
+
+
+def comprar_bilhete(user, sorteio, bilhete):
+    """Compra um bilhete do catálogo de uma modalidade para o sorteio (sem commit).
+
+    Confirma que o sorteio segue aberto (travando-o até o commit), debita o
+    preço com carteira.lancar(), que levanta SaldoInsuficiente se ele não
+    couber no saldo, e grava o bilhete em apostas_modalidades com o bitset
+    dos números, como ativo: a apuração da modalidade o lê depois do sorteio.
+    Levanta SorteioFechado se o sorteio já foi realizado. Retorna a
+    ApostaModalidade criada.
+    """
+    sorteio.garantir_aberto()
+
+    lancar(
+        user.id, 'aposta', -bilhete.preco,
+        f'Bilhete {bilhete.modalidade.nome} do sorteio de {sorteio.data_sorteio.isoformat()}',
+        sorteio_id=sorteio.id
+    )
+
+    aposta = ApostaModalidade(
+        user_id=user.id,
+        sorteio_id=sorteio.id,
+        modalidade_id=bilhete.modalidade_id,
+        bilhete_id=bilhete.id,
+        valor=bilhete.preco
+    )
+    aposta.set_numeros(bilhete.get_numeros())
+    db.session.add(aposta)
+    db.session.flush()
+    return aposta
@@ -1,125 +1,459 @@
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.base import ConflictingIdError
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, date
+from sqlalchemy.exc import IntegrityError
+from src.services.metricas import metricas_aplicacao
+from datetime import datetime, date, timedelta
+import json
 import logging
 import atexit
+import os
+import socket
+import time
+import uuid
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Horário do sorteio diário
+HORA_SORTEIO = 20
+
+# Nome da concessão de liderança do scheduler de sorteios
+LIDERANCA = 'sorteios'
+
+# Uma execução 'executando' mais antiga que isso é considerada abandonada
+EXECUCAO_ABANDONADA = timedelta(minutes=10)
+
+
+def executar_sorteio_agendado():
+    """Ponto de entrada do job persistido (referenciado por nome no job store)"""
+    sorteio_scheduler.executar_sorteio_diario()
+
+
 class SorteioScheduler:
-    """Classe responsável pelo agendamento automático dos sorteios"""
-    
+    """Classe responsável pelo agendamento automático dos sorteios
+
+    O job diário fica em um job store no banco, compartilhado por todos os
+    processos. O APScheduler não coordena um job store entre processos:
+    qualquer um deles pode disparar o job (e adiantar o next_run_time para o
+    dia seguinte), então quem disparar executa o sorteio. Cada execução é
+    registrada em execucoes_sorteio, cuja data é única: mesmo que dois
+    processos disparem o job, só um roda o sorteio. A concessão de liderança
+    fica para a recuperação dos sorteios perdidos.
+    """
+
     def __init__(self, app=None):
-        self.scheduler = BackgroundScheduler()
+        self.scheduler = None
         self.app = app
-        
+        self.identidade = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.duracao_lideranca = 60
+
         if app is not None:
             self.init_app(app)
-    
+
     def init_app(self, app):
         """Inicializa o scheduler com a aplicação Flask"""
+        from src.models.database import db
+
         self.app = app
-        
-        # Configura o scheduler para executar o sorteio diariamente às 20:00
+        self.duracao_lideranca = app.config.get('SCHEDULER_LIDERANCA_SEGUNDOS', self.duracao_lideranca)
+
+        with app.app_context():
+            engine = db.engine
+
+        self.scheduler = BackgroundScheduler(
+            jobstores={
+                # Job diário compartilhado entre processos e preservado entre reinícios
+                'default': SQLAlchemyJobStore(engine=engine, tablename='apscheduler_jobs'),
+                # Jobs de manutenção de cada processo
+                'processo': MemoryJobStore()
+            },
+            job_defaults={'coalesce': True}
+        )
+
+        # Inicia pausado: nenhum job é processado antes de o job diário ser conferido abaixo
+        self.scheduler.start(paused=True)
+
+        # Configura o scheduler para executar o sorteio diariamente às 20:00. O job
+        # gravado por um processo anterior é mantido (replace_existing=False) com o
+        # seu next_run_time: se o horário passou com todos os processos parados, o
+        # job atrasado roda ao retomar, dentro de misfire_grace_time, e a
+        # recuperação abaixo cobre o restante. Substituí-lo recalcularia o
+        # next_run_time a partir de agora e pularia o sorteio perdido
+        gatilho = CronTrigger(hour=HORA_SORTEIO, minute=0)  # 20:00 todos os dias
+        try:
+            self.scheduler.add_job(
+                func='src.services.scheduler:executar_sorteio_agendado',
+                trigger=gatilho,
+                id='sorteio_diario',
+                name='Sorteio Diário às 20:00',
+                misfire_grace_time=6 * 3600,
+                replace_existing=False
+            )
+        except ConflictingIdError:
+            # Já registrado (por um boot anterior ou por outro processo agora)
+            job = self.scheduler.get_job('sorteio_diario')
+            if job is not None and str(job.trigger) != str(gatilho):
+                # O horário mudou no código: só então o job é reagendado
+                self.scheduler.reschedule_job('sorteio_diario', trigger=gatilho)
+                logger.info(f"Job do sorteio diário reagendado para {gatilho}")
+
         self.scheduler.add_job(
-            func=self.executar_sorteio_diario,
-            trigger=CronTrigger(hour=20, minute=0),  # 20:00 todos os dias
-            id='sorteio_diario',
-            name='Sorteio Diário às 20:00',
+            func=self.renovar_lideranca,
+            trigger='interval',
+            seconds=max(1, self.duracao_lideranca // 3),
+            id='renovar_lideranca',
+            jobstore='processo',
             replace_existing=True
         )
-        
-        # Inicia o scheduler
-        self.scheduler.start()
-        logger.info("Scheduler de sorteios iniciado - Sorteio diário às 20:00")
-        
+        self.scheduler.add_job(
+            func=self.recuperar_sorteios_perdidos,
+            trigger='date',
+            run_date=datetime.now() + timedelta(seconds=5),
+            id='recuperar_sorteios',
+            jobstore='processo',
+            replace_existing=True
+        )
+        self.scheduler.resume()
+        logger.info(f"Scheduler de sorteios iniciado ({self.identidade}) - Sorteio diário às 20:00")
+
         # Garante que o scheduler seja finalizado quando a aplicação for fechada
-        atexit.register(lambda: self.scheduler.shutdown())
-    
-    def executar_sorteio_diario(self):
-        """Executa o sorteio diário automaticamente"""
+        atexit.register(self.parar_scheduler)
+
+    # Liderança
+
+    def renovar_lideranca(self):
+        """Obtém ou renova a concessão de liderança; retorna True se este processo é o líder"""
         try:
             with self.app.app_context():
-                from src.models.sorteio import Sorteio
                 from src.models.database import db
-                
-                logger.info(f"Iniciando sorteio automático - {datetime.now()}")
-                
-                # Pega o sorteio de hoje
-                sorteio = Sorteio.get_sorteio_atual()
-                
-                if sorteio.status != 'aberto':
-                    logger.warning(f"Sorteio do dia {sorteio.data_sorteio} não está aberto. Status: {sorteio.status}")
-                    return
-                
-                # Realiza o sorteio
-                if sorteio.realizar_sorteio():
+                from src.models.agendamento import LiderScheduler
+
+                agora = datetime.utcnow()
+                valores = {
+                    'dono': self.identidade,
+                    'expira_em': agora + timedelta(seconds=self.duracao_lideranca),
+                    'renovada_em': agora
+                }
+
+                # Assume se a concessão é deste processo ou já expirou
+                resultado = db.session.execute(
+                    db.update(LiderScheduler)
+                    .where(
+                        LiderScheduler.nome == LIDERANCA,
+                        db.or_(LiderScheduler.dono == self.identidade, LiderScheduler.expira_em < agora)
+                    )
+                    .values(**valores)
+                )
+
+                if resultado.rowcount == 0:
+                    existe = db.session.get(LiderScheduler, LIDERANCA)
+                    if existe is not None:
+                        db.session.rollback()
+                        return False
+                    db.session.add(LiderScheduler(nome=LIDERANCA, **valores))
+
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+                    return False
+
+                return True
+
+        except Exception as e:
+            logger.error(f"Erro ao renovar a liderança do scheduler: {str(e)}")
+            return False
+
+    def liberar_lideranca(self):
+        """Devolve a concessão, para que outro processo assuma sem esperar a expiração"""
+        try:
+            with self.app.app_context():
+                from src.models.database import db
+                from src.models.agendamento import LiderScheduler
+
+                db.session.execute(
+                    db.update(LiderScheduler)
+                    .where(LiderScheduler.nome == LIDERANCA, LiderScheduler.dono == self.identidade)
+                    .values(expira_em=datetime.utcnow())
+                )
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Erro ao liberar a liderança do scheduler: {str(e)}")
+
+    def get_lideranca(self):
+        """Retorna a concessão de liderança atual (ou None)"""
+        from src.models.agendamento import LiderScheduler
+        from src.models.database import db
+
+        lider = db.session.get(LiderScheduler, LIDERANCA)
+        if lider is None:
+            return None
+
+        lideranca = lider.to_dict()
+        lideranca['vigente'] = lider.expira_em >= datetime.utcnow()
+        lideranca['este_processo'] = lider.dono == self.identidade
+        return lideranca
+
+    # Execução
+
+    def _reservar_execucao(self, data_sorteio, origem):
+        """Grava a execução do sorteio da data; retorna False se outro processo já a tem.
+
+        Uma execução anterior com erro, ou abandonada no meio, pode ser retomada.
+        """
+        from src.models.database import db
+        from src.models.agendamento import ExecucaoSorteio
+
+        agora = datetime.utcnow()
+        try:
+            db.session.add(ExecucaoSorteio(
+                data_sorteio=data_sorteio,
+                origem=origem,
+                status='executando',
+                executado_por=self.identidade,
+                iniciado_em=agora
+            ))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+
+        resultado = db.session.execute(
+            db.update(ExecucaoSorteio)
+            .where(
+                ExecucaoSorteio.data_sorteio == data_sorteio,
+                db.or_(
+                    ExecucaoSorteio.status == 'erro',
+                    db.and_(
+                        ExecucaoSorteio.status == 'executando',
+                        ExecucaoSorteio.iniciado_em < agora - EXECUCAO_ABANDONADA
+                    )
+                )
+            )
+            .values(
+                origem=origem,
+                status='executando',
+                executado_por=self.identidade,
+                iniciado_em=agora,
+                finalizado_em=None,
+                erro=None,
+                tentativas=ExecucaoSorteio.tentativas + 1
+            )
+        )
+        db.session.commit()
+        return resultado.rowcount == 1
+
+    def _concluir_execucao(self, data_sorteio, inicio, liquidacao=None, erro=None):
+        """Registra o resultado e a duração da execução"""
+        from src.models.database import db
+        from src.models.agendamento import ExecucaoSorteio
+
+        db.session.rollback()
+        valores = {
+            'status': 'erro' if erro else 'sucesso',
+            'finalizado_em': datetime.utcnow(),
+            'duracao_ms': round((time.perf_counter() - inicio) * 1000, 3),
+            'erro': erro
+        }
+        if liquidacao:
+            valores.update(
+                numero_sorteado=liquidacao['numero_sorteado'],
+                total_ganhadores=liquidacao['total_ganhadores'],
+                tempos_ms=json.dumps(liquidacao['tempos_ms'])
+            )
+
+        db.session.execute(
+            db.update(ExecucaoSorteio)
+            .where(
+                ExecucaoSorteio.data_sorteio == data_sorteio,
+                ExecucaoSorteio.executado_por == self.identidade
+            )
+            .values(**valores)
+        )
+        db.session.commit()
+
+        metricas_aplicacao.observar_execucao_sorteio(
+            valores['status'], valores['duracao_ms'], liquidacao['tempos_ms'] if liquidacao else None
+        )
+
+    def _executar_para_data(self, data_sorteio, origem, criar=True):
+        """Realiza e liquida o sorteio da data, registrando a execução (requer app context).
+
+        O sorteio de um número é liquidado antes das modalidades, para que uma
+        modalidade com erro não deixe os ganhadores dele sem prêmio. As
+        modalidades que falharem deixam a execução com status 'erro' e são
+        apuradas quando ela for retomada (o sorteio já finalizado não é refeito).
+
+        Retorna o resumo da liquidação, ou False se o sorteio não pôde ou não
+        precisou ser executado por este processo.
+        """
+        from src.models.sorteio import Sorteio
+        from src.models.database import db
+        from src.services.liquidacao import liquidar_sorteio
+        from src.services.apuracao_modalidades import apurar_modalidades, modalidades_pendentes
+        from src.services.ingestao_apostas import fila_apostas
+
+        # Busca ou cria o sorteio para a data especificada
+        sorteio = Sorteio.query.filter_by(data_sorteio=data_sorteio).first()
+
+        if not sorteio:
+            if not criar:
+                return False
+            sorteio = Sorteio(data_sorteio=data_sorteio)
+            db.session.add(sorteio)
+            db.session.commit()
+
+        if sorteio.status == 'finalizado' and not modalidades_pendentes(sorteio):
+            logger.warning(f"Sorteio do dia {sorteio.data_sorteio} já foi finalizado")
+            return False
+
+        if not self._reservar_execucao(data_sorteio, origem):
+            logger.info(f"Sorteio do dia {data_sorteio} já está sendo (ou foi) executado por outro processo")
+            return False
+
+        inicio = time.perf_counter()
+        try:
+            db.session.refresh(sorteio)
+            if sorteio.status != 'finalizado':
+                # Barreira do corte: as apostas ainda na fila de ingestão entram antes do sorteio
+                if sorteio.status == 'aberto' and not fila_apostas.drenar(sorteio.id):
+                    raise RuntimeError('A fila de apostas do sorteio não esvaziou a tempo')
+
+                # Realiza o sorteio; um sorteio já sorteado (execução interrompida) só é liquidado
+                db.session.refresh(sorteio)
+                if sorteio.status == 'aberto':
+                    if not sorteio.realizar_sorteio():
+                        raise RuntimeError('Erro ao realizar o sorteio')
                     logger.info(f"Sorteio realizado! Número sorteado: {sorteio.numero_sorteado}")
-                    
-                    # Finaliza o sorteio (distribui prêmios)
-                    if sorteio.finalizar_sorteio():
-                        apostas_ganhadoras = sorteio.get_apostas_ganhadoras()
-                        logger.info(f"Sorteio finalizado! {len(apostas_ganhadoras)} ganhadores")
-                        
-                        if apostas_ganhadoras:
-                            premio_por_ganhador = sorteio.premio_total / len(apostas_ganhadoras)
-                            logger.info(f"Prêmio por ganhador: R$ {premio_por_ganhador:.2f}")
-                        else:
-                            logger.info("Nenhum ganhador neste sorteio")
-                    else:
-                        logger.error("Erro ao finalizar o sorteio")
+
+                # Finaliza o sorteio (distribui prêmios)
+                liquidacao = liquidar_sorteio(sorteio)
+                if not liquidacao:
+                    raise RuntimeError('Erro ao finalizar o sorteio')
+
+                logger.info(f"Sorteio finalizado! {liquidacao['total_ganhadores']} ganhadores")
+                if liquidacao['total_ganhadores']:
+                    logger.info(f"Prêmio por ganhador: R$ {liquidacao['premio_por_ganhador']:.2f}")
                 else:
-                    logger.error("Erro ao realizar o sorteio")
-                    
+                    logger.info("Nenhum ganhador neste sorteio")
+            else:
+                # Retomada de uma execução com modalidades pendentes
+                logger.info(f"Sorteio do dia {data_sorteio} já finalizado; apurando as modalidades pendentes")
+                liquidacao = {
+                    'sorteio_id': sorteio.id,
+                    'numero_sorteado': sorteio.numero_sorteado,
+                    'total_ganhadores': sorteio.total_ganhadores,
+                    'premio_por_ganhador': sorteio.premio_por_ganhador,
+                    'tempos_ms': {}
+                }
+
+            # Bilhetes das modalidades; cada modalidade é confirmada à parte e não é
+            # apurada de novo se a execução for retomada
+            modalidades, falhas = apurar_modalidades(sorteio)
+            if modalidades:
+                liquidacao['modalidades'] = modalidades
+                liquidacao['tempos_ms']['apurar_modalidades'] = round(
+                    sum(resumo['tempo_total_ms'] for resumo in modalidades), 3
+                )
+
+            erro = None
+            if falhas:
+                liquidacao['modalidades_com_erro'] = falhas
+                erro = 'Modalidades não apuradas: ' + '; '.join(
+                    f'{nome}: {mensagem}' for nome, mensagem in falhas.items()
+                )
+                logger.error(f"Sorteio do dia {data_sorteio}: {erro}")
+
+            self._concluir_execucao(data_sorteio, inicio, liquidacao=liquidacao, erro=erro)
+            return liquidacao
+
+        except Exception as e:
+            logger.error(f"Erro ao executar o sorteio do dia {data_sorteio}: {str(e)}")
+            self._concluir_execucao(data_sorteio, inicio, erro=str(e))
+            return False
+
+    def executar_sorteio_diario(self):
+        """Executa o sorteio diário automaticamente.
+
+        Não depende da liderança: o processo que disparou o job é o único que o
+        verá vencido hoje, e a reserva em execucoes_sorteio impede uma segunda
+        execução se outro processo também o disparar.
+        """
+        try:
+            with self.app.app_context():
+                logger.info(f"Iniciando sorteio automático - {datetime.now()}")
+                self._executar_para_data(date.today(), 'agendado')
+
         except Exception as e:
             logger.error(f"Erro durante execução do sorteio automático: {str(e)}")
-    
-    def executar_sorteio_manual(self, data_sorteio=None):
-        """Executa um sorteio manualmente (para testes ou casos especiais)"""
+
+    def recuperar_sorteios_perdidos(self):
+        """Executa os sorteios cujo horário passou sem que fossem realizados (apenas no líder)
+
+        Cobre sorteios de dias anteriores que ficaram abertos ou sorteados sem
+        liquidação e o de hoje, se já passou das 20:00, além dos finalizados
+        com modalidades que falharam na apuração.
+        """
         try:
+            if not self.renovar_lideranca():
+                return
+
             with self.app.app_context():
                 from src.models.sorteio import Sorteio
                 from src.models.database import db
-                
+                from src.models.agendamento import ExecucaoSorteio
+
+                agora = datetime.now()
+                limite = agora.date() if agora.hour >= HORA_SORTEIO else agora.date() - timedelta(days=1)
+
+                # Inclui os finalizados cuja execução terminou com modalidades não apuradas
+                com_erro = db.select(ExecucaoSorteio.data_sorteio).where(ExecucaoSorteio.status == 'erro')
+                pendentes = Sorteio.query.filter(
+                    db.or_(
+                        Sorteio.status.in_(['aberto', 'sorteado']),
+                        db.and_(Sorteio.status == 'finalizado', Sorteio.data_sorteio.in_(com_erro))
+                    ),
+                    Sorteio.data_sorteio <= limite
+                ).order_by(Sorteio.data_sorteio).all()
+                datas = [sorteio.data_sorteio for sorteio in pendentes]
+
+                for data_sorteio in datas:
+                    logger.warning(f"Recuperando sorteio perdido do dia {data_sorteio}")
+                    self._executar_para_data(data_sorteio, 'recuperacao', criar=False)
+
+        except Exception as e:
+            logger.error(f"Erro ao recuperar sorteios perdidos: {str(e)}")
+
+    def executar_sorteio_manual(self, data_sorteio=None):
+        """Executa um sorteio manualmente (para testes ou casos especiais)
+
+        Retorna o resumo da liquidação em caso de sucesso ou False em caso de erro.
+        """
+        try:
+            with self.app.app_context():
                 if data_sorteio is None:
                     data_sorteio = date.today()
-                
+
                 logger.info(f"Iniciando sorteio manual para {data_sorteio}")
-                
-                # Busca ou cria o sorteio para a data especificada
-                sorteio = Sorteio.query.filter_by(data_sorteio=data_sorteio).first()
-                
-                if not sorteio:
-                    sorteio = Sorteio(data_sorteio=data_sorteio)
-                    db.session.add(sorteio)
-                    db.session.commit()
-                
-                if sorteio.status != 'aberto':
-                    logger.warning(f"Sorteio do dia {sorteio.data_sorteio} não está aberto. Status: {sorteio.status}")
-                    return False
-                
-                # Realiza o sorteio
-                if sorteio.realizar_sorteio():
-                    logger.info(f"Sorteio manual realizado! Número sorteado: {sorteio.numero_sorteado}")
-                    
-                    # Finaliza o sorteio
-                    if sorteio.finalizar_sorteio():
-                        apostas_ganhadoras = sorteio.get_apostas_ganhadoras()
-                        logger.info(f"Sorteio manual finalizado! {len(apostas_ganhadoras)} ganhadores")
-                        return True
-                    else:
-                        logger.error("Erro ao finalizar o sorteio manual")
-                        return False
-                else:
-                    logger.error("Erro ao realizar o sorteio manual")
-                    return False
-                    
+                return self._executar_para_data(data_sorteio, 'manual')
+
         except Exception as e:
             logger.error(f"Erro durante execução do sorteio manual: {str(e)}")
             return False
-    
+
+    def get_historico_execucoes(self, limite=10):
+        """Retorna as execuções de sorteio mais recentes"""
+        from src.models.agendamento import ExecucaoSorteio
+
+        execucoes = ExecucaoSorteio.query.order_by(
+            ExecucaoSorteio.data_sorteio.desc()
+        ).limit(limite).all()
+        return [execucao.to_dict() for execucao in execucoes]
+
     def get_proximo_sorteio(self):
         """Retorna informações sobre o próximo sorteio agendado"""
         job = self.scheduler.get_job('sorteio_diario')
@@ -129,13 +463,14 @@ class SorteioScheduler:
                 'status': 'ativo' if self.scheduler.running else 'parado'
             }
         return None
-    
+
     def parar_scheduler(self):
         """Para o scheduler"""
-        if self.scheduler.running:
+        if self.scheduler and self.scheduler.running:
             self.scheduler.shutdown()
+            self.liberar_lideranca()
             logger.info("Scheduler de sorteios parado")
-    
+
     def reiniciar_scheduler(self):
         """Reinicia o scheduler"""
         if not self.scheduler.running:
@@ -144,4 +479,3 @@ class SorteioScheduler:
 
 # Instância global do scheduler
 sorteio_scheduler = SorteioScheduler()
-
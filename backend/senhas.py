@@ -0,0 +1,95 @@
+from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+# Política padrão: a mesma do generate_password_hash do Werkzeug 2.3, para que
+# os hashes gravados pelo cadastro já nasçam na política
+METODO_PADRAO = 'pbkdf2:sha256:600000'
+
+
+class ServicoSenhasOcupado(Exception):
+    """Há verificações demais na fila; a requisição deve ser repetida depois"""
+
+
+class ServicoSenhas:
+    """Hash e verificação de senhas em um pool limitado de threads.
+
+    PBKDF2 e scrypt do hashlib soltam o GIL durante o cálculo, então o
+    trabalho roda de fato em paralelo nas threads do pool, e o pool limita
+    quantos núcleos uma rajada de logins pode ocupar: as demais rotas do
+    processo continuam sendo atendidas. Além das SENHAS_TRABALHADORES em
+    execução, no máximo SENHAS_FILA_MAXIMA chamadas esperam; acima disso a
+    chamada falha na hora com ServicoSenhasOcupado, em vez de segurar a
+    thread da requisição numa fila longa.
+
+    A política (SENHAS_METODO) é um método do Werkzeug, completo como
+    'pbkdf2:sha256:600000' ou abreviado como 'pbkdf2' e 'scrypt' (os
+    parâmetros omitidos ficam nos padrões do Werkzeug). Hashes de outra
+    política são refeitos no próximo login bem-sucedido (precisa_rehash).
+    """
+
+    def __init__(self, app=None):
+        self.metodo = METODO_PADRAO
+        # Prefixo que os hashes da política atual gravam, com todos os parâmetros
+        self._prefixo = METODO_PADRAO
+        self.trabalhadores = max(1, (os.cpu_count() or 2) // 2)
+        self.fila_maxima = 64
+        self._executor = None
+        self._vagas = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configura a política e o pool (SENHAS_METODO, SENHAS_TRABALHADORES, SENHAS_FILA_MAXIMA)"""
+        self.metodo = app.config.get('SENHAS_METODO') or self.metodo
+        self.trabalhadores = app.config.get('SENHAS_TRABALHADORES') or self.trabalhadores
+        self.fila_maxima = app.config.get('SENHAS_FILA_MAXIMA', self.fila_maxima)
+
+        # Falha já na inicialização se a política for inválida; o hash gerado dá o
+        # prefixo completo de um método abreviado ('pbkdf2' -> 'pbkdf2:sha256:600000')
+        self._prefixo = generate_password_hash('', self.metodo).split('$', 1)[0]
+
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.trabalhadores, thread_name_prefix='senhas'
+                )
+                self._vagas = threading.BoundedSemaphore(self.trabalhadores + self.fila_maxima)
+            return self._executor, self._vagas
+
+    def _executar(self, funcao, *args):
+        executor, vagas = self._pool()
+        if not vagas.acquire(blocking=False):
+            raise ServicoSenhasOcupado()
+
+        try:
+            futuro = executor.submit(funcao, *args)
+        except BaseException:
+            vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: vagas.release())
+        return futuro.result()
+
+    def gerar_hash(self, senha):
+        """Hash da senha na política atual"""
+        return self._executar(generate_password_hash, senha, self.metodo)
+
+    def verificar(self, hash_senha, senha):
+        """Confere a senha com o hash gravado (em qualquer política)"""
+        return self._executar(check_password_hash, hash_senha, senha)
+
+    def precisa_rehash(self, hash_senha):
+        """Indica se o hash foi gerado por uma política diferente da atual"""
+        return hash_senha.split('$', 1)[0] != self._prefixo
+
+
+servico_senhas = ServicoSenhas()
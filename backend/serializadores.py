@@ -0,0 +1,111 @@
+from src.models.database import db
+from src.models.user import User
+from src.models.aposta import Aposta
+from src.models.sorteio import Sorteio
+
+
+def sorteios_por_id(ids):
+    """Carrega, com uma única consulta IN, os sorteios com os ids informados"""
+    if not ids:
+        return {}
+    return {
+        sorteio.id: sorteio
+        for sorteio in Sorteio.query.filter(Sorteio.id.in_(list(ids))).all()
+    }
+
+
+def serializar_apostas_com_sorteio(apostas):
+    """Serializa uma página de apostas, cada uma com o dicionário do seu sorteio.
+
+    Os sorteios distintos da página são carregados em uma única consulta e cada
+    um é serializado uma só vez, com o mesmo dicionário reaproveitado por todas
+    as apostas daquele sorteio. Nenhum relacionamento é acessado, então o custo
+    é de no máximo uma consulta além da que trouxe as apostas.
+    """
+    sorteios = sorteios_por_id({aposta.sorteio_id for aposta in apostas})
+    sorteios_dict = {sorteio_id: sorteio.to_dict() for sorteio_id, sorteio in sorteios.items()}
+
+    apostas_list = []
+    for aposta in apostas:
+        aposta_dict = aposta.to_dict()
+        aposta_dict['sorteio'] = sorteios_dict.get(aposta.sorteio_id)
+        apostas_list.append(aposta_dict)
+    return apostas_list
+
+
+def consulta_ganhadores(sorteio):
+    """SELECT das apostas ganhadoras do sorteio com o nome do usuário (JOIN), em ordem de id"""
+    return db.select(Aposta, User.nome).join(
+        User, User.id == Aposta.user_id
+    ).where(
+        Aposta.sorteio_id == sorteio.id,
+        Aposta.numero_escolhido == sorteio.numero_sorteado
+    ).order_by(Aposta.id)
+
+
+def ganhadores_dict(sorteio, linhas):
+    """Serializa as linhas (aposta, nome) lidas com consulta_ganhadores"""
+    return [
+        {
+            'usuario_nome': nome,
+            'numero_escolhido': aposta.numero_escolhido,
+            'data_aposta': aposta.data_aposta.isoformat(),
+            'premio_recebido': sorteio.premio_por_ganhador
+        }
+        for aposta, nome in linhas
+    ]
+
+
+def serializar_ganhadores(sorteio):
+    """Lista os ganhadores do sorteio com o nome do usuário, em uma única consulta com JOIN"""
+    if sorteio.numero_sorteado is None:
+        return []
+
+    return ganhadores_dict(sorteio, db.session.execute(consulta_ganhadores(sorteio)).all())
+
+
+# Campos de Sorteio.to_dict() transmitidos por /stream (os que mudam durante o dia)
+CAMPOS_ESTADO_SORTEIO = (
+    'status', 'total_arrecadado', 'premio_total', 'total_apostas',
+    'numero_sorteado', 'total_ganhadores', 'premio_por_ganhador'
+)
+
+
+def mais_apostados(apostas_por_numero, limite=10):
+    """[[numero, quantidade]] dos números mais apostados, do mais para o menos apostado"""
+    return [
+        [numero, quantidade]
+        for numero, quantidade in sorted(apostas_por_numero.items(), key=lambda x: (-x[1], x[0]))[:limite]
+    ]
+
+
+def serializar_sorteio_atual(sorteio, apostas_por_numero):
+    """Corpo de /sorteio-atual: o sorteio com o histograma ({numero: quantidade}) e o top 10"""
+    sorteio_dict = sorteio.to_dict()
+    sorteio_dict['apostas_por_numero'] = apostas_por_numero
+    sorteio_dict['numeros_mais_apostados'] = mais_apostados(apostas_por_numero)
+
+    return {
+        'sorteio': sorteio_dict,
+        'total_apostas': sorteio.total_apostas
+    }
+
+
+def serializar_estado_sorteio(sorteio, top10):
+    """Estado do sorteio transmitido por /stream, com os mesmos valores de /sorteio-atual.
+
+    ``top10`` são os pares (numero, quantidade) já ordenados; os demais campos
+    vêm de Sorteio.to_dict(), como no corpo de /sorteio-atual.
+    """
+    sorteio_dict = sorteio.to_dict()
+    estado = {campo: sorteio_dict[campo] for campo in CAMPOS_ESTADO_SORTEIO}
+    estado['numeros_mais_apostados'] = [[numero, quantidade] for numero, quantidade in top10]
+    return estado
+
+
+def serializar_historico(sorteios, paginacao):
+    """Corpo de /historico: os sorteios da página seguidos dos campos de paginação"""
+    return {
+        'sorteios': [sorteio.to_dict() for sorteio in sorteios],
+        **paginacao
+    }
@@ -1,10 +1,27 @@
 from .database import db
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime, date
 import random
 
+# Chave em Session.info com os sorteios alterados na transação em curso; lida
+# depois do commit pelo transmissor SSE (services/transmissao.py)
+SORTEIOS_ALTERADOS = 'sorteios_alterados'
+
+
+class SorteioFechado(Exception):
+    """O sorteio não está mais aberto para apostas"""
+
+    def __init__(self, mensagem='Sorteio não está aberto para apostas'):
+        super().__init__(mensagem)
+
+
 class Sorteio(db.Model):
     """Model para sorteios diários do sistema"""
     __tablename__ = 'sorteios'
+    __table_args__ = (
+        # Histórico: status IN (...) ordenado por data_sorteio
+        db.Index('ix_sorteios_status_data', 'status', 'data_sorteio'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     data_sorteio = db.Column(db.Date, nullable=False, unique=True)
@@ -15,6 +32,15 @@ class Sorteio(db.Model):
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     data_sorteio_realizado = db.Column(db.DateTime, nullable=True)
     
+    # Resumo desnormalizado: mantido ao registrar apostas e ao apurar o sorteio,
+    # para que serializar um sorteio seja a leitura de uma única linha
+    total_apostas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_ganhadores = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    premio_por_ganhador = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    
+    # Incrementada a cada aposta, sorteio e liquidação; compõe a chave do cache de respostas
+    versao = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relacionamentos
     apostas = db.relationship('Aposta', backref='sorteio', lazy=True)
     
@@ -22,27 +48,102 @@ class Sorteio(db.Model):
         if data_sorteio is None:
             data_sorteio = date.today()
         self.data_sorteio = data_sorteio
+        self.total_arrecadado = 0.0
+        self.total_apostas = 0
+        self.total_ganhadores = 0
+        self.premio_por_ganhador = 0.0
+        self.versao = 0
     
     def realizar_sorteio(self):
-        """Realiza o sorteio e define o número ganhador"""
+        """Realiza o sorteio e define o número ganhador
+        
+        A passagem de 'aberto' para 'sorteado' é um UPDATE condicional no banco,
+        como a finalização em liquidar_sorteio: o prêmio sai dos totais que
+        estão na linha nesse momento, e as apostas que chegarem depois não
+        encontram mais o sorteio aberto (adicionar_aposta levanta SorteioFechado).
+        """
         if self.status != 'aberto':
             return False
         
-        # Sorteia um número de 1 a 500
-        self.numero_sorteado = random.randint(1, 500)
-        self.status = 'sorteado'
-        self.data_sorteio_realizado = datetime.utcnow()
+        # Sorteia um número de 1 a 500 e reserva a transição
+        agora = datetime.utcnow()
+        linha = db.session.execute(
+            db.update(Sorteio)
+            .where(Sorteio.id == self.id, Sorteio.status == 'aberto')
+            .values(
+                numero_sorteado=random.randint(1, 500),
+                status='sorteado',
+                data_sorteio_realizado=agora,
+                # Calcula o prêmio (90% do total arrecadado)
+                premio_total=Sorteio.total_arrecadado * 0.9
+            )
+            .returning(Sorteio.numero_sorteado, Sorteio.total_arrecadado, Sorteio.total_apostas, Sorteio.premio_total)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if linha is None:
+            db.session.rollback()
+            return False
         
-        # Calcula o prêmio (90% do total arrecadado)
-        self.premio_total = self.total_arrecadado * 0.9
+        set_committed_value(self, 'status', 'sorteado')
+        set_committed_value(self, 'data_sorteio_realizado', agora)
+        for campo in ('numero_sorteado', 'total_arrecadado', 'total_apostas', 'premio_total'):
+            set_committed_value(self, campo, getattr(linha, campo))
+        
+        # Registra o resumo dos ganhadores já no momento do sorteio
+        self.total_ganhadores = self.contar_apostas_ganhadoras()
+        self.premio_por_ganhador = (
+            self.premio_total / self.total_ganhadores if self.total_ganhadores else 0.0
+        )
+        self.versao = Sorteio.versao + 1
+        
+        from .estatisticas import registrar_sorteio_realizado
+        registrar_sorteio_realizado(self)
         
         db.session.commit()
         return True
     
-    def adicionar_aposta(self, valor_aposta):
-        """Adiciona valor de uma aposta ao total arrecadado"""
-        self.total_arrecadado += valor_aposta
-        db.session.commit()
+    def adicionar_aposta(self, valor_aposta, quantidade=1, commit=True):
+        """Adiciona valor e quantidade de apostas aos totais do sorteio
+        
+        Os totais são incrementados no próprio UPDATE, para que requisições
+        simultâneas não sobrescrevam os incrementos umas das outras. O UPDATE
+        só vale enquanto o sorteio está aberto no banco: depois do sorteio
+        levanta SorteioFechado, e quem chama desfaz a transação da aposta.
+        """
+        resultado = db.session.execute(
+            db.update(Sorteio)
+            .where(Sorteio.id == self.id, Sorteio.status == 'aberto')
+            .values(
+                total_arrecadado=Sorteio.total_arrecadado + valor_aposta,
+                total_apostas=Sorteio.total_apostas + quantidade,
+                versao=Sorteio.versao + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount == 0:
+            raise SorteioFechado()
+        
+        db.session.expire(self, ['total_arrecadado', 'total_apostas', 'versao'])
+        db.session.info.setdefault(SORTEIOS_ALTERADOS, set()).add(self.id)
+        if commit:
+            db.session.commit()
+    
+    def garantir_aberto(self):
+        """Confirma no banco que o sorteio segue aberto e trava a linha até o fim da transação
+        
+        Para escritas que não mexem nos totais do sorteio (bilhetes das
+        modalidades): o UPDATE sem efeito segura a passagem para 'sorteado'
+        até o commit, como em adicionar_aposta, então o bilhete gravado entra
+        na apuração. Levanta SorteioFechado se o sorteio já não está aberto.
+        """
+        resultado = db.session.execute(
+            db.update(Sorteio)
+            .where(Sorteio.id == self.id, Sorteio.status == 'aberto')
+            .values(status='aberto')
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount == 0:
+            raise SorteioFechado()
     
     def get_apostas_ganhadoras(self):
         """Retorna as apostas ganhadoras deste sorteio"""
@@ -55,35 +156,21 @@ class Sorteio(db.Model):
             numero_escolhido=self.numero_sorteado
         ).all()
     
-    def finalizar_sorteio(self):
-        """Finaliza o sorteio e distribui os prêmios"""
-        if self.status != 'sorteado':
-            return False
-        
-        apostas_ganhadoras = self.get_apostas_ganhadoras()
-        
-        if apostas_ganhadoras:
-            # Divide o prêmio entre os ganhadores
-            premio_por_ganhador = self.premio_total / len(apostas_ganhadoras)
-            
-            for aposta in apostas_ganhadoras:
-                aposta.status = 'ganhadora'
-                # Adiciona o prêmio ao saldo do usuário
-                aposta.usuario.adicionar_saldo(premio_por_ganhador)
+    def contar_apostas_ganhadoras(self):
+        """Conta as apostas no número sorteado sem carregá-las"""
+        if self.numero_sorteado is None:
+            return 0
         
-        # Marca todas as outras apostas como perdedoras
         from .aposta import Aposta
-        apostas_perdedoras = Aposta.query.filter(
-            Aposta.sorteio_id == self.id,
-            Aposta.numero_escolhido != self.numero_sorteado
-        ).all()
-        
-        for aposta in apostas_perdedoras:
-            aposta.status = 'perdedora'
-        
-        self.status = 'finalizado'
-        db.session.commit()
-        return True
+        return Aposta.query.filter_by(
+            sorteio_id=self.id,
+            numero_escolhido=self.numero_sorteado
+        ).count()
+    
+    def finalizar_sorteio(self):
+        """Finaliza o sorteio e distribui os prêmios"""
+        from src.services.liquidacao import liquidar_sorteio
+        return liquidar_sorteio(self) is not None
     
     def to_dict(self):
         """Converte o objeto para dicionário"""
@@ -96,7 +183,9 @@ class Sorteio(db.Model):
             'status': self.status,
             'data_criacao': self.data_criacao.isoformat(),
             'data_sorteio_realizado': self.data_sorteio_realizado.isoformat() if self.data_sorteio_realizado else None,
-            'total_apostas': len(self.apostas)
+            'total_apostas': self.total_apostas,
+            'total_ganhadores': self.total_ganhadores,
+            'premio_por_ganhador': self.premio_por_ganhador
         }
     
     @staticmethod
@@ -1,9 +1,13 @@
-from flask import Blueprint, request, jsonify, session
-from src.models.database import db
-from src.models.user import User
-from src.models.aposta import Aposta
+from flask import Blueprint, Response, request, jsonify
 from src.models.sorteio import Sorteio
-from datetime import date, datetime, timedelta
+from src.models.contagem_numeros import histograma_sorteio
+from src.models.estatisticas import EstatisticaNumero, estatisticas_gerais, numeros_mais_frequentes
+from src.services.serializadores import serializar_ganhadores, serializar_sorteio_atual, serializar_historico
+from src.services.cache_respostas import cache_respostas
+from src.services.transmissao import transmissor_sorteios
+from src.services.paginacao import (
+    usar_cursor, paginar_por_cursor, parametros_cursor, campos_cursor, CursorInvalido
+)
 
 sorteios_bp = Blueprint('sorteios', __name__)
 
@@ -13,71 +17,66 @@ def sorteio_atual():
     try:
         sorteio = Sorteio.get_sorteio_atual()
         
-        # Conta total de apostas
-        total_apostas = len(sorteio.apostas)
-        
-        # Conta apostas por número (para estatísticas)
-        apostas_por_numero = {}
-        for aposta in sorteio.apostas:
-            num = aposta.numero_escolhido
-            apostas_por_numero[num] = apostas_por_numero.get(num, 0) + 1
-        
-        sorteio_dict = sorteio.to_dict()
-        sorteio_dict['apostas_por_numero'] = apostas_por_numero
-        sorteio_dict['numeros_mais_apostados'] = sorted(
-            apostas_por_numero.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )[:10]  # Top 10 números mais apostados
-        
-        return jsonify({
-            'sorteio': sorteio_dict,
-            'total_apostas': total_apostas
-        }), 200
+        # A versão do sorteio muda a cada aposta, então a resposta em cache nunca fica velha
+        return cache_respostas.responder(
+            cache_respostas.chave('sorteio-atual', sorteio.id, sorteio.versao),
+            lambda: _sorteio_atual(sorteio)
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _sorteio_atual(sorteio):
+    # Apostas por número lidas dos contadores mantidos a cada aposta
+    apostas_por_numero = histograma_sorteio(sorteio.id)
+    
+    return jsonify(serializar_sorteio_atual(sorteio, apostas_por_numero)), 200
+
 @sorteios_bp.route('/historico', methods=['GET'])
 def historico_sorteios():
     """Retorna o histórico de sorteios"""
     try:
-        # Pega parâmetros de paginação
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
-        # Busca sorteios finalizados
-        sorteios_query = Sorteio.query.filter(
-            Sorteio.status.in_(['sorteado', 'finalizado'])
-        ).order_by(Sorteio.data_sorteio.desc())
-        
-        sorteios_paginados = sorteios_query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        sorteios_list = []
-        for sorteio in sorteios_paginados.items:
-            sorteio_dict = sorteio.to_dict()
-            
-            # Adiciona informações dos ganhadores
-            apostas_ganhadoras = sorteio.get_apostas_ganhadoras()
-            sorteio_dict['total_ganhadores'] = len(apostas_ganhadoras)
-            
-            if apostas_ganhadoras:
-                sorteio_dict['premio_por_ganhador'] = sorteio.premio_total / len(apostas_ganhadoras)
-            else:
-                sorteio_dict['premio_por_ganhador'] = 0
-            
-            sorteios_list.append(sorteio_dict)
-        
-        return jsonify({
-            'sorteios': sorteios_list,
-            'total': sorteios_paginados.total,
-            'pages': sorteios_paginados.pages,
-            'current_page': page
-        }), 200
-        
+        # O histórico só muda quando algum sorteio é realizado ou liquidado,
+        # o que incrementa a versão do histórico (as apostas não a alteram)
+        return cache_respostas.responder(
+            cache_respostas.chave(
+                'historico', estatisticas_gerais().versao_historico, request.query_string.decode()
+            ),
+            _historico_sorteios
+        )
+        
+    except CursorInvalido:
+        return jsonify({'error': 'Cursor inválido'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _historico_sorteios():
+    # Busca sorteios finalizados
+    sorteios_query = Sorteio.query.filter(
+        Sorteio.status.in_(['sorteado', 'finalizado'])
+    )
+    
+    # Paginação por cursor sobre data_sorteio (única por sorteio)
+    if usar_cursor():
+        pagina = paginar_por_cursor(
+            sorteios_query, [Sorteio.data_sorteio], **parametros_cursor(10)
+        )
+        return jsonify(serializar_historico(pagina['itens'], campos_cursor(pagina))), 200
+    
+    # Pega parâmetros de paginação
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    
+    sorteios_query = sorteios_query.order_by(Sorteio.data_sorteio.desc())
+    sorteios_paginados = sorteios_query.paginate(page=page, per_page=per_page, error_out=False)
+    
+    # total_ganhadores e premio_por_ganhador já vêm da própria linha do sorteio
+    return jsonify(serializar_historico(sorteios_paginados.items, {
+        'total': sorteios_paginados.total,
+        'pages': sorteios_paginados.pages,
+        'current_page': page
+    })), 200
+
 @sorteios_bp.route('/resultado/<int:sorteio_id>', methods=['GET'])
 def resultado_sorteio(sorteio_id):
     """Retorna o resultado detalhado de um sorteio específico"""
@@ -90,76 +89,87 @@ def resultado_sorteio(sorteio_id):
         if sorteio.status == 'aberto':
             return jsonify({'error': 'Sorteio ainda não foi realizado'}), 400
         
-        sorteio_dict = sorteio.to_dict()
+        # O resultado de um sorteio finalizado não muda mais: fica em cache para sempre
+        if sorteio.status == 'finalizado':
+            return cache_respostas.responder(
+                cache_respostas.chave('resultado', sorteio.id, 'finalizado'),
+                lambda: _resultado_sorteio(sorteio),
+                imutavel=True
+            )
         
-        # Adiciona informações dos ganhadores
-        apostas_ganhadoras = sorteio.get_apostas_ganhadoras()
-        ganhadores = []
-        
-        for aposta in apostas_ganhadoras:
-            ganhadores.append({
-                'usuario_nome': aposta.usuario.nome,
-                'numero_escolhido': aposta.numero_escolhido,
-                'data_aposta': aposta.data_aposta.isoformat(),
-                'premio_recebido': sorteio.premio_total / len(apostas_ganhadoras) if apostas_ganhadoras else 0
-            })
-        
-        sorteio_dict['ganhadores'] = ganhadores
-        sorteio_dict['total_ganhadores'] = len(ganhadores)
-        
-        return jsonify({'resultado': sorteio_dict}), 200
+        return cache_respostas.responder(
+            cache_respostas.chave('resultado', sorteio.id, sorteio.versao),
+            lambda: _resultado_sorteio(sorteio)
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _resultado_sorteio(sorteio):
+    sorteio_dict = sorteio.to_dict()
+    
+    # Ganhadores com o nome do usuário em uma única consulta
+    ganhadores = serializar_ganhadores(sorteio)
+    
+    sorteio_dict['ganhadores'] = ganhadores
+    
+    return jsonify({'resultado': sorteio_dict}), 200
+
 @sorteios_bp.route('/estatisticas', methods=['GET'])
 def estatisticas():
     """Retorna estatísticas gerais dos sorteios"""
     try:
-        # Estatísticas gerais
-        total_sorteios = Sorteio.query.filter(Sorteio.status != 'aberto').count()
-        total_apostas = Aposta.query.count()
-        total_arrecadado = db.session.query(db.func.sum(Sorteio.total_arrecadado)).scalar() or 0
-        total_premiado = db.session.query(db.func.sum(Sorteio.premio_total)).scalar() or 0
-        
-        # Números mais sorteados
-        numeros_sorteados = db.session.query(
-            Sorteio.numero_sorteado,
-            db.func.count(Sorteio.numero_sorteado).label('vezes')
-        ).filter(
-            Sorteio.numero_sorteado.isnot(None)
-        ).group_by(
-            Sorteio.numero_sorteado
-        ).order_by(
-            db.func.count(Sorteio.numero_sorteado).desc()
-        ).limit(10).all()
+        # Totais mantidos incrementalmente: uma linha geral e a tabela de 500 números
+        geral = estatisticas_gerais()
         
-        # Números mais apostados (histórico)
-        numeros_apostados = db.session.query(
-            Aposta.numero_escolhido,
-            db.func.count(Aposta.numero_escolhido).label('vezes')
-        ).group_by(
-            Aposta.numero_escolhido
-        ).order_by(
-            db.func.count(Aposta.numero_escolhido).desc()
-        ).limit(10).all()
-        
-        return jsonify({
-            'estatisticas_gerais': {
-                'total_sorteios': total_sorteios,
-                'total_apostas': total_apostas,
-                'total_arrecadado': total_arrecadado,
-                'total_premiado': total_premiado,
-                'taxa_premio': (total_premiado / total_arrecadado * 100) if total_arrecadado > 0 else 0
-            },
-            'numeros_mais_sorteados': [
-                {'numero': num, 'vezes': vezes} for num, vezes in numeros_sorteados
-            ],
-            'numeros_mais_apostados': [
-                {'numero': num, 'vezes': vezes} for num, vezes in numeros_apostados
-            ]
-        }), 200
+        return cache_respostas.responder(
+            cache_respostas.chave('estatisticas', geral.versao),
+            lambda: _estatisticas(geral)
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _estatisticas(geral):
+    total_sorteios = geral.sorteios_realizados
+    total_apostas = geral.total_apostas
+    total_arrecadado = geral.total_arrecadado
+    total_premiado = geral.total_premiado
+    
+    # Números mais sorteados
+    numeros_sorteados = numeros_mais_frequentes(EstatisticaNumero.vezes_sorteado)
+    
+    # Números mais apostados (histórico)
+    numeros_apostados = numeros_mais_frequentes(EstatisticaNumero.vezes_apostado)
+    
+    return jsonify({
+        'estatisticas_gerais': {
+            'total_sorteios': total_sorteios,
+            'total_apostas': total_apostas,
+            'total_arrecadado': total_arrecadado,
+            'total_premiado': total_premiado,
+            'taxa_premio': (total_premiado / total_arrecadado * 100) if total_arrecadado > 0 else 0
+        },
+        'numeros_mais_sorteados': [
+            {'numero': num, 'vezes': vezes} for num, vezes in numeros_sorteados
+        ],
+        'numeros_mais_apostados': [
+            {'numero': num, 'vezes': vezes} for num, vezes in numeros_apostados
+        ]
+    }), 200
+
+@sorteios_bp.route('/stream', methods=['GET'])
+def stream_sorteio():
+    """Transmite por Server-Sent Events o estado do sorteio atual e suas mudanças"""
+    try:
+        inicial = transmissor_sorteios.estado_atual()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    # 'sorteio' traz o sorteio inteiro (na abertura e na virada do dia), 'estado' só os campos
+    # alterados e 'resultado' o número sorteado. Servidores ASGI atendem esta rota em asgi.py
+    return Response(
+        transmissor_sorteios.eventos(inicial),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,32 @@
+import pytest
+
+from src.models.database import db
+from src.models.user import User
+from benchmarks.carga_api import criar_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Aplicação com um banco SQLite vazio, já dentro do contexto da aplicação"""
+    app = criar_app(f"sqlite:///{tmp_path / 'testes.db'}", 'sqlite')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def criar_usuario(app):
+    """Cria usuários com o saldo informado (sem extrato); retorna o id"""
+    sequencia = iter(range(1, 10 ** 6))
+
+    def criar(saldo=0.0):
+        numero = next(sequencia)
+        resultado = db.session.execute(db.insert(User.__table__).values(
+            nome=f'Usuário {numero}', email=f'usuario{numero}@testes', telefone='0',
+            password_hash='x', saldo=saldo
+        ))
+        db.session.commit()
+        return resultado.inserted_primary_key[0]
+
+    return criar
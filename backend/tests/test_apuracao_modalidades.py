@@ -0,0 +1,105 @@
+"""Apuração das modalidades (services/apuracao_modalidades.py), com e sem NumPy"""
+import random
+
+import pytest
+
+from src.models.database import db
+from src.models.user import User
+from src.models.sorteio import Sorteio
+from src.models.bitset_numeros import BitsetNumeros
+from src.models.modalidade import Modalidade, Premiacao, ApostaModalidade, ResultadoModalidade
+from src.services import apuracao_modalidades
+from src.services.apuracao_modalidades import apurar_modalidade, contar_acertos
+
+sem_numpy = pytest.mark.skipif(apuracao_modalidades.np is None, reason='NumPy não instalado')
+
+
+@pytest.fixture(params=[pytest.param('numpy', marks=sem_numpy), 'python'])
+def motor(request, monkeypatch):
+    """Roda o teste com a contagem vetorizada e com o fallback em Python puro"""
+    if request.param == 'python':
+        monkeypatch.setattr(apuracao_modalidades, 'np', None)
+    return request.param
+
+
+@sem_numpy
+def test_contagem_numpy_igual_a_python(monkeypatch):
+    rnd = random.Random(7)
+    sorteados = sorted(rnd.sample(range(1, 501), 6))
+    bilhetes = [rnd.sample(range(1, 501), rnd.randint(1, 12)) for _ in range(2000)]
+    # Bordas do bitset e um bilhete com todos os sorteados
+    bilhetes += [[1], [500], [1, 8, 9, 500], sorteados]
+    bitsets = [BitsetNumeros(bilhete).para_bytes() for bilhete in bilhetes]
+
+    vetorizada = contar_acertos(bitsets, sorteados)
+    monkeypatch.setattr(apuracao_modalidades, 'np', None)
+    pura = contar_acertos(bitsets, sorteados)
+
+    esperado = [len(set(bilhete) & set(sorteados)) for bilhete in bilhetes]
+    assert [int(acertos) for acertos in vetorizada] == esperado
+    assert list(pura) == esperado
+
+
+def test_sorteados_nas_bordas_dos_bytes(monkeypatch):
+    sorteados = [1, 8, 9, 496, 497, 500]
+    bitsets = [BitsetNumeros(sorteados).para_bytes(), BitsetNumeros([2, 7, 10, 495, 498, 499]).para_bytes()]
+
+    assert [int(acertos) for acertos in contar_acertos(bitsets, sorteados)] == [6, 0]
+    monkeypatch.setattr(apuracao_modalidades, 'np', None)
+    assert contar_acertos(bitsets, sorteados) == [6, 0]
+
+
+@pytest.fixture
+def modalidade_com_bilhetes(app, criar_usuario):
+    """Modalidade de 3 números com três faixas e bilhetes de 3, 2, 1 e 0 acertos contra [10, 20, 30]"""
+    sorteio = Sorteio.get_sorteio_atual()
+    modalidade = Modalidade(nome='Terno', descricao='Escolha 3 números', cor='bg-blue-500', quantidade_numeros=3)
+    db.session.add(modalidade)
+    db.session.flush()
+    for posicao, valor in (('1º Prêmio', 300.0), ('2º Prêmio', 30.0), ('3º Prêmio', 3.0)):
+        db.session.add(Premiacao(modalidade_id=modalidade.id, posicao=posicao, valor=valor))
+
+    usuarios = [criar_usuario() for _ in range(2)]
+    bilhetes = [
+        (usuarios[0], [10, 20, 30]),
+        (usuarios[0], [10, 20, 31]),
+        (usuarios[1], [10, 21, 31]),
+        (usuarios[1], [11, 21, 31]),
+    ]
+    for user_id, numeros in bilhetes:
+        aposta = ApostaModalidade(
+            user_id=user_id, sorteio_id=sorteio.id, modalidade_id=modalidade.id, valor=5.0
+        )
+        aposta.set_numeros(numeros)
+        db.session.add(aposta)
+    db.session.commit()
+    return sorteio, modalidade, usuarios
+
+
+def test_apuracao_paga_cada_faixa(modalidade_com_bilhetes, motor):
+    sorteio, modalidade, usuarios = modalidade_com_bilhetes
+
+    resumo = apurar_modalidade(sorteio, modalidade, [10, 20, 30])
+
+    assert resumo['total_bilhetes'] == 4
+    assert resumo['total_ganhadores'] == 3
+    assert resumo['total_premios'] == 333.0
+
+    apostas = ApostaModalidade.query.order_by(ApostaModalidade.id).all()
+    assert [(aposta.status, aposta.acertos, aposta.premio) for aposta in apostas] == [
+        ('ganhadora', 3, 300.0),
+        ('ganhadora', 2, 30.0),
+        ('ganhadora', 1, 3.0),
+        ('perdedora', None, 0.0),
+    ]
+    assert [db.session.get(User, user_id).saldo for user_id in usuarios] == [330.0, 3.0]
+
+
+def test_apuracao_repetida_nao_paga_de_novo(modalidade_com_bilhetes):
+    sorteio, modalidade, usuarios = modalidade_com_bilhetes
+
+    assert apurar_modalidade(sorteio, modalidade, [10, 20, 30]) is not None
+    assert apurar_modalidade(sorteio, modalidade, [10, 20, 30]) is None
+
+    assert ResultadoModalidade.query.count() == 1
+    assert [db.session.get(User, user_id).saldo for user_id in usuarios] == [330.0, 3.0]
@@ -0,0 +1,80 @@
+"""Formato do bitset de números (models/bitset_numeros.py) gravado no banco e enviado pela API"""
+import base64
+
+import pytest
+
+from src.models.database import db
+from src.models.user import User
+from src.models.bitset_numeros import BitsetNumeros
+from src.models.modalidade import ApostaModalidade
+
+
+@pytest.mark.parametrize('numero, byte, bit', [(1, 0, 0), (8, 0, 7), (9, 1, 0), (256, 31, 7), (500, 62, 3)])
+def test_numero_n_e_o_bit_n_menos_1(numero, byte, bit):
+    dados = BitsetNumeros([numero]).para_bytes()
+
+    assert len(dados) == 63
+    assert dados[byte] == 1 << bit
+    assert sum(dados) == 1 << bit
+
+
+def test_base64_tem_84_caracteres_e_volta_igual():
+    numeros = [1, 2, 3, 250, 499, 500]
+    bitset = BitsetNumeros(numeros)
+
+    texto = bitset.para_base64()
+
+    assert len(texto) == 84
+    assert base64.b64decode(texto) == bitset.para_bytes()
+    assert list(BitsetNumeros.de_base64(texto)) == numeros
+    assert BitsetNumeros.de_bytes(bitset.para_bytes()) == bitset
+
+
+def test_vazio_e_cheio():
+    assert BitsetNumeros().para_bytes() == bytes(63)
+
+    cheio = BitsetNumeros().complemento()
+    assert len(cheio) == 500
+    # Os 4 bits do último byte além do 500 ficam zerados
+    assert cheio.para_bytes() == b'\xff' * 62 + b'\x0f'
+
+
+def test_bits_alem_do_maximo_sao_descartados():
+    assert list(BitsetNumeros.de_bytes(b'\xff' * 63)) == list(range(1, 501))
+    assert list(BitsetNumeros.de_bytes(b'')) == []
+
+
+@pytest.mark.parametrize('numero', [0, -1, 501])
+def test_numero_fora_da_faixa(numero):
+    with pytest.raises(ValueError):
+        BitsetNumeros([numero])
+
+
+def test_bilhete_de_modalidade_grava_o_mesmo_formato():
+    aposta = ApostaModalidade()
+    aposta.set_numeros([3, 17, 500])
+
+    assert aposta.numeros == BitsetNumeros([3, 17, 500]).para_bytes()
+    assert aposta.get_numeros() == [3, 17, 500]
+
+
+def test_numeros_disponiveis_no_formato_bitset(app):
+    cliente = app.test_client()
+    cliente.post('/api/auth/register', json={
+        'nome': 'Bitset', 'email': 'bitset@testes', 'telefone': '0', 'password': 'senha'
+    })
+    db.session.execute(db.update(User).where(User.email == 'bitset@testes').values(saldo=100.0))
+    db.session.commit()
+
+    apostados = [1, 9, 42, 500]
+    resposta = cliente.post('/api/apostas/fazer-apostas-lote', json={'numeros': apostados})
+    assert resposta.status_code == 201
+
+    dados = cliente.get('/api/apostas/numeros-disponiveis?formato=bitset').get_json()
+    assert dados['formato'] == 'bitset'
+    assert dados['total_disponiveis'] == 500 - len(apostados)
+    assert base64.b64decode(dados['numeros_apostados']) == BitsetNumeros(apostados).para_bytes()
+
+    lista = cliente.get('/api/apostas/numeros-disponiveis').get_json()
+    assert lista['numeros_apostados'] == apostados
+    assert len(lista['numeros_disponiveis']) == dados['total_disponiveis']
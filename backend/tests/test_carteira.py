@@ -0,0 +1,68 @@
+"""Movimentação de saldo pelo extrato (services/carteira.lancar)"""
+import math
+
+import pytest
+
+from src.models.database import db
+from src.models.user import User
+from src.models.lancamento import Lancamento
+from src.services.carteira import SaldoInsuficiente, lancar, valor_valido
+
+
+def test_debito_acima_do_saldo_levanta_saldo_insuficiente(criar_usuario):
+    user_id = criar_usuario(saldo=5.0)
+
+    with pytest.raises(SaldoInsuficiente):
+        lancar(user_id, 'aposta', -5.01, 'Débito acima do saldo')
+    db.session.rollback()
+
+    assert db.session.get(User, user_id).saldo == 5.0
+    assert Lancamento.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_debito_do_saldo_inteiro_e_aceito(criar_usuario):
+    user_id = criar_usuario(saldo=5.0)
+
+    lancamento = lancar(user_id, 'aposta', -5.0, 'Débito do saldo inteiro')
+    db.session.commit()
+
+    assert db.session.get(User, user_id).saldo == 0.0
+    assert (lancamento.valor, lancamento.saldo_apos) == (-5.0, 0.0)
+
+
+def test_debito_confere_o_saldo_do_banco_e_nao_o_da_sessao(criar_usuario):
+    user_id = criar_usuario(saldo=5.0)
+    user = db.session.get(User, user_id)
+
+    # Outra transação consumiu o saldo depois que o usuário foi carregado
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(saldo=1.0)
+        .execution_options(synchronize_session=False)
+    )
+    assert user.saldo == 5.0
+
+    with pytest.raises(SaldoInsuficiente):
+        lancar(user_id, 'aposta', -2.0, 'Débito com saldo desatualizado')
+    db.session.rollback()
+
+    assert db.session.get(User, user_id).saldo == 5.0
+
+
+def test_credito_atualiza_o_usuario_carregado(criar_usuario):
+    user_id = criar_usuario(saldo=1.0)
+    user = db.session.get(User, user_id)
+
+    lancar(user_id, 'deposito', 2.5, 'Depósito')
+
+    assert user.saldo == 3.5
+    assert user not in db.session.dirty
+
+
+@pytest.mark.parametrize('valor', [math.nan, math.inf, -math.inf, True, '10', None])
+def test_valor_invalido_e_recusado(criar_usuario, valor):
+    user_id = criar_usuario(saldo=5.0)
+
+    assert not valor_valido(valor)
+    with pytest.raises(ValueError):
+        lancar(user_id, 'ajuste', valor, 'Valor inválido')
+    assert Lancamento.query.filter_by(user_id=user_id).count() == 0
@@ -0,0 +1,111 @@
+"""Ingestão assíncrona de apostas (services/ingestao_apostas.py): retenção, barreira do corte e gravação"""
+import pytest
+
+from src.models.database import db
+from src.models.user import User
+from src.models.aposta import Aposta
+from src.models.sorteio import Sorteio, SorteioFechado
+from src.services.ingestao_apostas import FilaApostas, Reserva, ReservaParcial
+from src.services.registro_apostas import MOTIVO_JA_APOSTADO, MOTIVO_SALDO_INSUFICIENTE, VALOR_APOSTA
+
+
+@pytest.fixture
+def fila(app):
+    app.config['INGESTAO_APOSTAS_ASSINCRONA'] = True
+    return FilaApostas(app)
+
+
+@pytest.fixture
+def sorteio(app):
+    return Sorteio.get_sorteio_atual()
+
+
+def _apostados(user_id, sorteio):
+    return sorted(db.session.execute(
+        db.select(Aposta.numero_escolhido).where(Aposta.user_id == user_id, Aposta.sorteio_id == sorteio.id)
+    ).scalars())
+
+
+def _saldo(user_id):
+    return db.session.execute(db.select(User.saldo).where(User.id == user_id)).scalar_one()
+
+
+def test_drenar_espera_a_gravacao_e_fecha_o_sorteio(fila, sorteio, criar_usuario):
+    user_id = criar_usuario(saldo=10.0)
+
+    reserva, resultados = fila.reservar(user_id, sorteio, [5, 6, 5, 0])
+    assert reserva.numeros == [5, 6]
+    assert [resultado['aceita'] for resultado in resultados] == [True, True, False, False]
+
+    assert fila.drenar(sorteio.id, timeout=10)
+    db.session.expire_all()
+
+    assert reserva.estado == 'gravada'
+    assert _apostados(user_id, sorteio) == [5, 6]
+    assert _saldo(user_id) == 10.0 - 2 * VALOR_APOSTA
+    # Gravada, a reserva não retém mais nada além do que já saiu do saldo
+    assert fila.total_pendentes() == 0
+    assert fila.saldo_disponivel(user_id, _saldo(user_id)) == _saldo(user_id)
+
+    with pytest.raises(SorteioFechado):
+        fila.reservar(user_id, sorteio, [7])
+
+
+def test_retencao_conta_saldo_e_numeros_ainda_nao_gravados(fila, sorteio, criar_usuario):
+    user_id = criar_usuario(saldo=3 * VALOR_APOSTA)
+
+    primeira, _ = fila.reservar(user_id, sorteio, [1, 2])
+    # Gravada ou não a primeira reserva, o banco e a retenção somam o mesmo
+    segunda, resultados = fila.reservar(user_id, sorteio, [2, 3, 4])
+
+    assert primeira.numeros == [1, 2]
+    assert segunda.numeros == [3]
+    assert [resultado.get('motivo') for resultado in resultados] == [
+        MOTIVO_JA_APOSTADO, None, MOTIVO_SALDO_INSUFICIENTE
+    ]
+
+    assert fila.drenar(sorteio.id, timeout=10)
+    db.session.expire_all()
+    assert _apostados(user_id, sorteio) == [1, 2, 3]
+    assert _saldo(user_id) == 0.0
+
+
+def test_reserva_que_so_cabe_em_parte_e_rejeitada_inteira(fila, sorteio, criar_usuario):
+    user_id = criar_usuario(saldo=2 * VALOR_APOSTA)
+    resultados = [{'numero': numero, 'aceita': True} for numero in (10, 11)]
+    reserva = Reserva(user_id, sorteio.id, [10, 11], VALOR_APOSTA, resultados)
+
+    # Depois da reserva, o saldo foi consumido por fora: só um número caberia
+    db.session.execute(db.update(User).where(User.id == user_id).values(saldo=VALOR_APOSTA))
+    db.session.commit()
+
+    with pytest.raises(ReservaParcial):
+        fila._aplicar([reserva])
+    db.session.rollback()
+
+    reserva.estado = 'pendente'
+    fila._gravar_lote([reserva])
+    db.session.expire_all()
+
+    assert reserva.estado == 'rejeitada'
+    assert reserva.erro == MOTIVO_SALDO_INSUFICIENTE
+    assert all(not resultado['aceita'] for resultado in reserva.resultados)
+    assert _apostados(user_id, sorteio) == []
+    assert _saldo(user_id) == VALOR_APOSTA
+
+
+def test_lote_com_reserva_parcial_grava_as_demais(fila, sorteio, criar_usuario):
+    pobre = criar_usuario(saldo=VALOR_APOSTA)
+    rico = criar_usuario(saldo=10.0)
+    parcial = Reserva(pobre, sorteio.id, [20, 21], VALOR_APOSTA,
+                      [{'numero': numero, 'aceita': True} for numero in (20, 21)])
+    inteira = Reserva(rico, sorteio.id, [20, 21], VALOR_APOSTA,
+                      [{'numero': numero, 'aceita': True} for numero in (20, 21)])
+
+    fila._gravar_lote([parcial, inteira])
+    db.session.expire_all()
+
+    assert (parcial.estado, inteira.estado) == ('rejeitada', 'gravada')
+    assert _apostados(pobre, sorteio) == []
+    assert _apostados(rico, sorteio) == [20, 21]
+    assert db.session.get(Sorteio, sorteio.id).total_apostas == 2
@@ -0,0 +1,102 @@
+"""Sorteio e liquidação em conjunto (Sorteio.realizar_sorteio e services/liquidacao.py).
+
+As transições de status são UPDATEs condicionais: os testes simulam a cópia
+desatualizada de outro processo mudando o banco por trás do objeto carregado.
+"""
+import pytest
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.models.database import db
+from src.models.user import User
+from src.models.aposta import Aposta
+from src.models.lancamento import Lancamento
+from src.models.sorteio import Sorteio, SorteioFechado
+from src.services.liquidacao import liquidar_sorteio
+from src.services.registro_apostas import registrar_apostas
+
+
+@pytest.fixture
+def sorteio_com_apostas(app, criar_usuario, monkeypatch):
+    """Sorteio aberto com as apostas de três usuários; o número sorteado será o 7"""
+    monkeypatch.setattr('src.models.sorteio.random.randint', lambda inicio, fim: 7)
+
+    usuarios = [criar_usuario(saldo=10.0) for _ in range(3)]
+    sorteio = Sorteio.get_sorteio_atual()
+    for user_id, numeros in zip(usuarios, ([7, 8], [7], [9])):
+        registrar_apostas(db.session.get(User, user_id), sorteio, numeros)
+    db.session.commit()
+    return sorteio, usuarios
+
+
+def _saldos(usuarios):
+    return [db.session.get(User, user_id).saldo for user_id in usuarios]
+
+
+def test_liquidacao_marca_e_credita_os_ganhadores(sorteio_com_apostas):
+    sorteio, usuarios = sorteio_com_apostas
+
+    assert sorteio.realizar_sorteio()
+    resumo = liquidar_sorteio(sorteio)
+
+    # 4 apostas de 2,00: prêmio de 90% dividido entre as duas apostas no 7
+    assert resumo['total_ganhadores'] == 2
+    assert resumo['total_perdedoras'] == 2
+    assert resumo['premio_por_ganhador'] == pytest.approx(3.6)
+    assert sorteio.status == 'finalizado'
+
+    status = set(db.session.execute(
+        db.select(Aposta.numero_escolhido, Aposta.status).where(Aposta.sorteio_id == sorteio.id)
+    ).all())
+    assert status == {(7, 'ganhadora'), (8, 'perdedora'), (9, 'perdedora')}
+
+    assert _saldos(usuarios) == pytest.approx([6.0 + 3.6, 8.0 + 3.6, 8.0])
+    premios = Lancamento.query.filter_by(tipo='premio', sorteio_id=sorteio.id).order_by(Lancamento.user_id).all()
+    assert [(premio.user_id, premio.valor) for premio in premios] == [
+        (usuarios[0], pytest.approx(3.6)), (usuarios[1], pytest.approx(3.6))
+    ]
+    assert [premio.saldo_apos for premio in premios] == pytest.approx(_saldos(usuarios[:2]))
+
+
+def test_realizar_sorteio_so_vale_se_o_banco_ainda_esta_aberto(sorteio_com_apostas):
+    sorteio, _ = sorteio_com_apostas
+
+    # Outro processo já sorteou: o objeto desta sessão ainda diz 'aberto'
+    db.session.execute(
+        db.update(Sorteio).where(Sorteio.id == sorteio.id)
+        .values(status='sorteado', numero_sorteado=300)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    set_committed_value(sorteio, 'status', 'aberto')
+
+    assert sorteio.realizar_sorteio() is False
+    assert db.session.get(Sorteio, sorteio.id).numero_sorteado == 300
+
+
+def test_aposta_depois_do_sorteio_levanta_sorteio_fechado(sorteio_com_apostas, criar_usuario):
+    sorteio, _ = sorteio_com_apostas
+    user = db.session.get(User, criar_usuario(saldo=10.0))
+
+    assert sorteio.realizar_sorteio()
+    with pytest.raises(SorteioFechado):
+        registrar_apostas(user, sorteio, [100])
+    db.session.rollback()
+
+    assert db.session.get(User, user.id).saldo == 10.0
+
+
+def test_liquidacao_repetida_nao_credita_duas_vezes(sorteio_com_apostas):
+    sorteio, usuarios = sorteio_com_apostas
+
+    assert sorteio.realizar_sorteio()
+    assert liquidar_sorteio(sorteio) is not None
+    saldos = _saldos(usuarios)
+    lancamentos = Lancamento.query.count()
+
+    # Uma execução retomada com a cópia de antes da liquidação
+    set_committed_value(sorteio, 'status', 'sorteado')
+    assert liquidar_sorteio(sorteio) is None
+
+    assert _saldos(usuarios) == saldos
+    assert Lancamento.query.count() == lancamentos
+    assert db.session.get(Sorteio, sorteio.id).status == 'finalizado'
@@ -0,0 +1,67 @@
+"""Orçamento de consultas SQL de cada rota (services/orcamento_consultas.ORCAMENTOS).
+
+Usa o banco semeado e as chamadas de benchmarks/orcamento_consultas.py: cada
+chamada roda dentro de orcamento_consultas() com o orçamento da sua rota, e
+um teste por rota falha com as instruções executadas se alguma chamada dela
+passar do orçamento (ou responder 5xx).
+
+Uso (a partir do diretório backend):
+    python -m pytest tests
+"""
+import pytest
+
+from src.models.database import db
+from src.services.orcamento_consultas import (
+    ContadorConsultas, ORCAMENTOS, OrcamentoExcedido, orcamento_consultas, orcamento_da_rota
+)
+from src.services.scheduler import sorteio_scheduler
+from benchmarks.carga_api import criar_app, semear
+from benchmarks.orcamento_consultas import ROTAS_IGNORADAS, chamadas, chamar, preparar
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    app = criar_app(f"sqlite:///{tmp_path_factory.mktemp('orcamento') / 'orcamento.db'}", 'sqlite')
+    with app.app_context():
+        semear(200, 20, 2000, semente=42)
+    sorteio_scheduler.init_app(app)
+    yield app
+    sorteio_scheduler.parar_scheduler()
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture(scope='module')
+def conferidas(app):
+    """{endpoint: [(chamada, orçamento, status, OrcamentoExcedido ou None)]}, na ordem de chamadas()"""
+    cliente, finalizado = preparar(app)
+
+    resultados = {}
+    for endpoint, metodo, url, corpo, itens in chamadas(finalizado):
+        chamada = f'{metodo.upper()} {url}'
+        maximo = orcamento_da_rota(endpoint, itens)
+        # Sem orçamento a chamada ainda é feita: as seguintes dependem do estado que ela deixa
+        contador = ContadorConsultas if maximo is None else (lambda: orcamento_consultas(maximo, chamada))
+        try:
+            resposta, _ = chamar(app, cliente, endpoint, metodo, url, corpo, contador)
+            status, excedido = resposta.status_code, None
+        except OrcamentoExcedido as e:
+            status, excedido = None, e
+        resultados.setdefault(endpoint, []).append((chamada, maximo, status, excedido))
+    return resultados
+
+
+@pytest.mark.parametrize('endpoint', sorted(ORCAMENTOS))
+def test_rota_dentro_do_orcamento(conferidas, endpoint):
+    assert endpoint in conferidas, f'{endpoint} tem orçamento e nenhuma chamada conferida'
+
+    for chamada, maximo, status, excedido in conferidas[endpoint]:
+        assert maximo is not None, f'{chamada}: orçamento depende de itens e a chamada não os informa'
+        if excedido is not None:
+            raise excedido
+        assert status < 500, f'{chamada}: status {status}'
+
+
+def test_todas_as_rotas_tem_orcamento(app):
+    rotas = {regra.endpoint for regra in app.url_map.iter_rules()} - ROTAS_IGNORADAS
+    assert sorted(rotas - set(ORCAMENTOS)) == []
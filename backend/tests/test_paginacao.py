@@ -0,0 +1,132 @@
+"""Paginação por cursor (services/paginacao.py): bordas das páginas e ida e volta"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.database import db
+from src.models.lancamento import Lancamento
+from src.services.paginacao import (
+    MAXIMO_POR_PAGINA, CursorInvalido, codificar_cursor, decodificar_cursor, paginar_por_cursor
+)
+
+
+@pytest.fixture
+def extrato(criar_usuario):
+    """Cria ``total`` lançamentos de um usuário; datas repetidas de 3 em 3 (empates na ordenação)"""
+
+    def criar(total):
+        user_id = criar_usuario()
+        inicio = datetime(2024, 1, 1, 12, 0)
+        if total:
+            db.session.execute(db.insert(Lancamento.__table__), [
+                {
+                    'user_id': user_id, 'tipo': 'deposito', 'valor': 1.0, 'saldo_apos': float(indice),
+                    'descricao': f'Lançamento {indice}', 'data_criacao': inicio + timedelta(minutes=indice // 3),
+                }
+                for indice in range(total)
+            ])
+            db.session.commit()
+        return Lancamento.query.filter_by(user_id=user_id)
+
+    return criar
+
+
+CHAVES_ID = [Lancamento.id]
+CHAVES_DATA = [Lancamento.data_criacao, Lancamento.id]
+
+
+def _ids(pagina):
+    return [lancamento.id for lancamento in pagina['itens']]
+
+
+def _percorrer(consulta, chaves, por_pagina):
+    """Páginas (listas de ids) seguindo next_cursor até o fim"""
+    paginas = []
+    cursor = None
+    while True:
+        pagina = paginar_por_cursor(consulta, chaves, por_pagina, cursor)
+        paginas.append(_ids(pagina))
+        cursor = pagina['next_cursor']
+        if cursor is None:
+            return paginas
+
+
+@pytest.mark.parametrize('total, por_pagina', [(0, 5), (4, 5), (5, 5), (6, 5), (10, 5), (11, 5)])
+@pytest.mark.parametrize('chaves', [CHAVES_ID, CHAVES_DATA], ids=['id', 'data_id'])
+def test_paginas_cobrem_tudo_sem_repetir(extrato, total, por_pagina, chaves):
+    consulta = extrato(total)
+    esperado = [
+        lancamento.id for lancamento in consulta.order_by(*[chave.desc() for chave in chaves]).all()
+    ]
+
+    paginas = _percorrer(consulta, chaves, por_pagina)
+
+    assert [lancamento_id for pagina in paginas for lancamento_id in pagina] == esperado
+    # Um múltiplo exato do tamanho da página não gera uma última página vazia
+    assert len(paginas) == max(1, -(-total // por_pagina))
+    assert all(len(pagina) == por_pagina for pagina in paginas[:-1])
+
+
+def test_primeira_e_ultima_pagina(extrato):
+    consulta = extrato(10)
+
+    primeira = paginar_por_cursor(consulta, CHAVES_ID, 5)
+    assert primeira['prev_cursor'] is None
+    assert primeira['next_cursor'] is not None
+
+    ultima = paginar_por_cursor(consulta, CHAVES_ID, 5, primeira['next_cursor'])
+    assert ultima['next_cursor'] is None
+    assert ultima['prev_cursor'] is not None
+
+
+@pytest.mark.parametrize('chaves', [CHAVES_ID, CHAVES_DATA], ids=['id', 'data_id'])
+def test_voltar_pelo_prev_cursor_refaz_a_pagina(extrato, chaves):
+    consulta = extrato(12)
+
+    primeira = paginar_por_cursor(consulta, chaves, 5)
+    segunda = paginar_por_cursor(consulta, chaves, 5, primeira['next_cursor'])
+    terceira = paginar_por_cursor(consulta, chaves, 5, segunda['next_cursor'])
+    assert len(terceira['itens']) == 2
+
+    voltando = paginar_por_cursor(consulta, chaves, 5, terceira['prev_cursor'])
+    assert _ids(voltando) == _ids(segunda)
+    assert voltando['next_cursor'] is not None
+
+    inicio = paginar_por_cursor(consulta, chaves, 5, voltando['prev_cursor'])
+    assert _ids(inicio) == _ids(primeira)
+    # De volta à primeira página, não há anterior
+    assert inicio['prev_cursor'] is None
+
+
+def test_total_so_quando_pedido(extrato):
+    consulta = extrato(7)
+
+    assert 'total' not in paginar_por_cursor(consulta, CHAVES_ID, 5)
+    assert paginar_por_cursor(consulta, CHAVES_ID, 5, incluir_total=True)['total'] == 7
+
+
+@pytest.mark.parametrize('por_pagina, esperado', [(0, 1), (-3, 1), (MAXIMO_POR_PAGINA + 50, MAXIMO_POR_PAGINA)])
+def test_tamanho_da_pagina_fica_nos_limites(extrato, por_pagina, esperado):
+    consulta = extrato(MAXIMO_POR_PAGINA + 10)
+
+    assert len(paginar_por_cursor(consulta, CHAVES_ID, por_pagina)['itens']) == esperado
+
+
+def test_cursor_preserva_datas():
+    valores = [datetime(2024, 5, 6, 7, 8, 9, 123456), 42]
+
+    token = codificar_cursor(valores, 'anterior')
+
+    assert decodificar_cursor(token, 2) == (valores, 'anterior')
+    assert '=' not in token
+
+
+@pytest.mark.parametrize('token, chaves', [
+    ('nao-e-um-cursor', 1),
+    (codificar_cursor([1], 'proxima'), 2),
+    (codificar_cursor([1], 'lateral'), 1),
+    (codificar_cursor([{'x': 1}], 'proxima'), 1),
+])
+def test_cursor_invalido(token, chaves):
+    with pytest.raises(CursorInvalido):
+        decodificar_cursor(token, chaves)
@@ -0,0 +1,374 @@
+from src.models.database import db
+from src.models.sorteio import Sorteio, SORTEIOS_ALTERADOS
+from src.models.contagem_numeros import ContagemNumero
+from src.services.serializadores import serializar_estado_sorteio
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from datetime import date
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def formatar_evento(tipo, dados):
+    """Formata um evento no protocolo Server-Sent Events"""
+    return f'event: {tipo}\ndata: {json.dumps(dados, separators=(",", ":"))}\n\n'
+
+
+class Assinante:
+    """Conexão SSE aberta: uma fila limitada de eventos já formatados"""
+
+    def __init__(self, maximo_fila=100):
+        self.fila = queue.Queue(maxsize=maximo_fila)
+        self.ativo = True
+
+    def enviar(self, evento):
+        """Enfileira o evento; um cliente lento demais é desconectado (o EventSource reconecta)"""
+        try:
+            self.fila.put_nowait(evento)
+        except queue.Full:
+            self.ativo = False
+
+
+class AssinanteAssincrono(Assinante):
+    """Conexão SSE atendida por uma coroutine (asgi.py): fila do asyncio no loop do servidor.
+
+    O transmissor envia de sua própria thread, então cada evento entra na fila
+    pelo loop (call_soon_threadsafe). Um None na fila encerra a conexão.
+    """
+
+    def __init__(self, loop, maximo_fila=100):
+        self.loop = loop
+        self.fila = asyncio.Queue(maxsize=maximo_fila)
+        self.ativo = True
+
+    def enviar(self, evento):
+        try:
+            self.loop.call_soon_threadsafe(self._colocar, evento)
+        except RuntimeError:
+            # Loop já encerrado (servidor parando): a conexão não existe mais
+            self.ativo = False
+
+    def _colocar(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.encerrar()
+
+    def encerrar(self):
+        """Desconecta o cliente: descarta um evento para dar lugar ao None que acorda a coroutine"""
+        self.ativo = False
+        if self.fila.full():
+            self.fila.get_nowait()
+        self.fila.put_nowait(None)
+
+
+class TransmissorSorteios:
+    """Difusão do estado dos sorteios para as conexões SSE do processo.
+
+    As apostas e a apuração marcam o sorteio como alterado quando sua
+    transação é confirmada. A cada ``tick`` segundos a thread do transmissor
+    lê uma única vez o estado de cada sorteio alterado e envia a todos os
+    assinantes apenas os campos que mudaram, em vez de cada cliente consultar
+    o banco por conta própria.
+
+    Com vários processos, as apostas feitas em outro worker e o sorteio das
+    20:00 (que roda em um só) não passam pelos commits deste processo. Por
+    isso, enquanto houver assinantes, cada tick também lê sorteios.versao dos
+    sorteios acompanhados (uma leitura por chave primária) e trata como
+    alterado o que mudou desde o último envio.
+
+    Na virada do dia o transmissor passa ao sorteio novo (criando-o, como a
+    primeira requisição do dia faria) e o envia inteiro num evento 'sorteio',
+    para que as conexões abertas na véspera troquem de sorteio sem reconectar.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.tick = 1.0
+        self.keepalive = 15.0
+        self.retry = 3.0
+        self._dia = None
+        self._assinantes = set()
+        self._alterados = set()
+        self._estados = {}
+        self._versoes = {}
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configura o transmissor com a aplicação Flask.
+
+        SSE_TICK_SEGUNDOS agrupa as mudanças de cada envio, SSE_KEEPALIVE_SEGUNDOS
+        espaça os comentários que mantêm a conexão viva e SSE_RETRY_SEGUNDOS é
+        quanto o navegador espera para reconectar depois de uma queda.
+        """
+        self.app = app
+        self.tick = app.config.get('SSE_TICK_SEGUNDOS', self.tick)
+        self.keepalive = app.config.get('SSE_KEEPALIVE_SEGUNDOS', self.keepalive)
+        self.retry = app.config.get('SSE_RETRY_SEGUNDOS', self.retry)
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._executar, name='transmissor-sorteios', daemon=True
+                )
+                self._thread.start()
+
+    def assinar(self, assinante=None):
+        """Registra uma nova conexão (um Assinante novo, se não for informado) e a devolve"""
+        assinante = assinante or Assinante()
+        with self._lock:
+            self._assinantes.add(assinante)
+        self._iniciar()
+        # Tira a thread da espera para que ela passe a consultar as versões
+        self._acordar.set()
+        return assinante
+
+    def cancelar(self, assinante):
+        with self._lock:
+            self._assinantes.discard(assinante)
+            if not self._assinantes:
+                # Sem ninguém ouvindo as versões deixam de ser consultadas e o estado guardado
+                # pode ficar velho (mudanças de outros processos); a próxima conexão o relê
+                self._estados.clear()
+                self._versoes.clear()
+
+    def marcar_alterados(self, sorteio_ids):
+        """Registra sorteios com mudanças confirmadas, enviadas no próximo tick"""
+        with self._lock:
+            self._alterados.update(sorteio_ids)
+        self._acordar.set()
+
+    def estado_atual(self):
+        """Estado completo do sorteio de hoje, para o primeiro evento de cada conexão"""
+        sorteio = Sorteio.get_sorteio_atual()
+        with self._lock:
+            estado = self._estados.get(sorteio.id)
+        if estado is None:
+            estado = _ler_estado(sorteio)
+            with self._lock:
+                self._estados[sorteio.id] = estado
+                self._versoes[sorteio.id] = sorteio.versao
+        self._dia = sorteio.data_sorteio
+        return {'sorteio_id': sorteio.id, 'data_sorteio': sorteio.data_sorteio.isoformat(), **estado}
+
+    def estado_inicial(self):
+        """estado_atual() num contexto próprio da aplicação, para quem atende fora de uma requisição Flask"""
+        with self.app.app_context():
+            try:
+                return self.estado_atual()
+            finally:
+                db.session.remove()
+
+    def _executar(self):
+        while True:
+            # Sem assinantes, só um commit local acorda a thread
+            with self._lock:
+                tem_assinantes = bool(self._assinantes)
+            if not tem_assinantes:
+                self._acordar.wait()
+
+            # Agrupa tudo o que mudar dentro do tick em um único envio
+            time.sleep(self.tick)
+            self._acordar.clear()
+
+            if self._dia is not None and date.today() != self._dia:
+                try:
+                    self._virar_dia()
+                except Exception as e:
+                    logger.error(f"Erro ao passar a transmissão para o sorteio do dia: {str(e)}")
+
+            with self._lock:
+                alterados, self._alterados = self._alterados, set()
+                tem_assinantes = bool(self._assinantes)
+                acompanhados = dict(self._versoes)
+
+            if not tem_assinantes:
+                # Sem ninguém ouvindo, o estado guardado apenas deixa de valer
+                with self._lock:
+                    for sorteio_id in alterados:
+                        self._estados.pop(sorteio_id, None)
+                        self._versoes.pop(sorteio_id, None)
+                continue
+
+            try:
+                alterados |= self._alterados_no_banco(acompanhados)
+                if alterados:
+                    self._difundir(alterados)
+            except Exception as e:
+                logger.error(f"Erro ao difundir o estado dos sorteios {sorted(alterados)}: {str(e)}")
+
+    def _virar_dia(self):
+        """Passa a acompanhar só o sorteio de hoje e o envia inteiro a todas as conexões"""
+        with self._lock:
+            tem_assinantes = bool(self._assinantes)
+            if not tem_assinantes:
+                # A próxima conexão lê o sorteio do dia por estado_atual()
+                self._estados.clear()
+                self._versoes.clear()
+                self._dia = None
+        if not tem_assinantes:
+            return
+
+        inicial = self.estado_inicial()
+        evento = formatar_evento('sorteio', inicial)
+        with self._lock:
+            for sorteio_id in list(self._versoes):
+                if sorteio_id != inicial['sorteio_id']:
+                    self._estados.pop(sorteio_id, None)
+                    self._versoes.pop(sorteio_id, None)
+            assinantes = list(self._assinantes)
+
+        for assinante in assinantes:
+            assinante.enviar(evento)
+
+    def _alterados_no_banco(self, versoes):
+        """Sorteios acompanhados cuja versão no banco difere da última difundida"""
+        if not versoes:
+            return set()
+
+        with self.app.app_context():
+            try:
+                linhas = db.session.execute(
+                    db.select(Sorteio.id, Sorteio.versao).where(Sorteio.id.in_(list(versoes)))
+                ).all()
+            finally:
+                db.session.remove()
+        return {sorteio_id for sorteio_id, versao in linhas if versao != versoes[sorteio_id]}
+
+    def _difundir(self, sorteio_ids):
+        with self.app.app_context():
+            try:
+                sorteios = Sorteio.query.filter(Sorteio.id.in_(list(sorteio_ids))).all()
+                novos = {
+                    sorteio.id: (sorteio.data_sorteio.isoformat(), sorteio.versao, _ler_estado(sorteio))
+                    for sorteio in sorteios
+                }
+            finally:
+                db.session.remove()
+
+        eventos = []
+        with self._lock:
+            for sorteio_id, (data_sorteio, versao, estado) in novos.items():
+                anterior = self._estados.get(sorteio_id, {})
+                self._estados[sorteio_id] = estado
+                self._versoes[sorteio_id] = versao
+
+                mudancas = {
+                    campo: valor for campo, valor in estado.items()
+                    if anterior.get(campo) != valor
+                }
+                if not mudancas:
+                    continue
+
+                dados = {'sorteio_id': sorteio_id, 'data_sorteio': data_sorteio}
+                eventos.append(formatar_evento('estado', {**dados, **mudancas}))
+
+                # A saída do número sorteado vira um evento próprio com o resultado
+                if 'numero_sorteado' in mudancas and estado['numero_sorteado'] is not None:
+                    eventos.append(formatar_evento('resultado', {
+                        **dados,
+                        'numero_sorteado': estado['numero_sorteado'],
+                        'total_ganhadores': estado['total_ganhadores'],
+                        'premio_por_ganhador': estado['premio_por_ganhador']
+                    }))
+
+            assinantes = list(self._assinantes)
+
+        for assinante in assinantes:
+            for evento in eventos:
+                assinante.enviar(evento)
+
+    def _abertura(self, inicial):
+        """Primeiros blocos de uma conexão: o intervalo de reconexão e o sorteio inteiro.
+
+        ``inicial`` vem de estado_atual(). A assinatura só é feita quando o
+        corpo começa a ser enviado, e o primeiro evento usa o estado mais
+        recente já difundido, para não perder o que mudou nesse intervalo.
+        """
+        with self._lock:
+            estado = self._estados.get(inicial['sorteio_id'])
+        if estado is not None:
+            inicial = {**inicial, **estado}
+
+        return [f'retry: {int(self.retry * 1000)}\n\n', formatar_evento('sorteio', inicial)]
+
+    def eventos(self, inicial):
+        """Gerador do corpo da resposta SSE de uma conexão atendida por uma thread WSGI"""
+        assinante = self.assinar()
+        try:
+            yield from self._abertura(inicial)
+            while assinante.ativo:
+                try:
+                    yield assinante.fila.get(timeout=self.keepalive)
+                except queue.Empty:
+                    # Comentário SSE: mantém a conexão viva atrás de proxies
+                    yield ': keepalive\n\n'
+        finally:
+            self.cancelar(assinante)
+
+    async def eventos_assincronos(self, inicial):
+        """Gerador assíncrono do corpo SSE: a conexão espera no loop do ASGI, sem ocupar thread"""
+        assinante = self.assinar(AssinanteAssincrono(asyncio.get_running_loop()))
+        try:
+            for bloco in self._abertura(inicial):
+                yield bloco
+            while assinante.ativo:
+                try:
+                    evento = await asyncio.wait_for(assinante.fila.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if evento is None:
+                    break
+                yield evento
+        finally:
+            self.cancelar(assinante)
+
+
+def _ler_estado(sorteio):
+    """Lê o estado transmitido do sorteio: a própria linha e o top 10 dos contadores"""
+    top10 = db.session.query(ContagemNumero.numero, ContagemNumero.quantidade).filter(
+        ContagemNumero.sorteio_id == sorteio.id,
+        ContagemNumero.quantidade > 0
+    ).order_by(ContagemNumero.quantidade.desc(), ContagemNumero.numero).limit(10).all()
+
+    return serializar_estado_sorteio(sorteio, top10)
+
+
+transmissor_sorteios = TransmissorSorteios()
+
+
+# Chave em Session.info com os sorteios alterados na transação em curso
+_ALTERADOS = SORTEIOS_ALTERADOS
+
+
+@event.listens_for(Sorteio, 'after_update')
+def _marcar_sorteio_alterado(mapper, connection, target):
+    """Sorteio e liquidação atualizam a linha do sorteio pelo ORM (as apostas marcam em adicionar_aposta)"""
+    sessao = object_session(target)
+    if sessao is not None:
+        sessao.info.setdefault(_ALTERADOS, set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _transmitir_apos_commit(sessao):
+    alterados = sessao.info.pop(_ALTERADOS, None)
+    if alterados:
+        transmissor_sorteios.marcar_alterados(alterados)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_apos_rollback(sessao):
+    sessao.info.pop(_ALTERADOS, None)
@@ -1,23 +1,22 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, g
 from src.models.database import db
 from src.models.user import User
+from src.models.lancamento import Lancamento
+from src.services.autenticacao import login_obrigatorio, usuario_atual, invalidar_identidade
+from src.services.carteira import lancar, valor_valido
+from src.services.senhas import servico_senhas, ServicoSenhasOcupado
+from src.services.paginacao import (
+    usar_cursor, paginar_por_cursor, parametros_cursor, campos_cursor, CursorInvalido
+)
 
 user_bp = Blueprint('user', __name__)
 
-def require_auth():
-    """Decorator para verificar autenticação"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return None
-    return User.query.get(user_id)
-
 @user_bp.route('/perfil', methods=['GET'])
+@login_obrigatorio
 def get_perfil():
     """Retorna o perfil do usuário logado"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
+        user = usuario_atual()
         
         return jsonify({'user': user.to_dict()}), 200
         
@@ -25,12 +24,11 @@ def get_perfil():
         return jsonify({'error': str(e)}), 500
 
 @user_bp.route('/perfil', methods=['PUT'])
+@login_obrigatorio
 def update_perfil():
     """Atualiza o perfil do usuário logado"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
+        user = usuario_atual()
         
         data = request.get_json()
         
@@ -52,6 +50,7 @@ def update_perfil():
             user.email = data['email']
         
         db.session.commit()
+        invalidar_identidade(user.id)
         
         return jsonify({
             'message': 'Perfil atualizado com sucesso',
@@ -63,12 +62,11 @@ def update_perfil():
         return jsonify({'error': str(e)}), 500
 
 @user_bp.route('/alterar-senha', methods=['PUT'])
+@login_obrigatorio
 def alterar_senha():
     """Altera a senha do usuário logado"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
+        user = usuario_atual()
         
         data = request.get_json()
         
@@ -76,28 +74,29 @@ def alterar_senha():
             return jsonify({'error': 'Senha atual e nova senha são obrigatórias'}), 400
         
         # Verifica a senha atual
-        if not user.check_password(data['senha_atual']):
+        if not servico_senhas.verificar(user.password_hash, data['senha_atual']):
             return jsonify({'error': 'Senha atual incorreta'}), 400
         
-        # Atualiza a senha
-        from werkzeug.security import generate_password_hash
-        user.password_hash = generate_password_hash(data['nova_senha'])
+        # Atualiza a senha, já na política atual
+        user.password_hash = servico_senhas.gerar_hash(data['nova_senha'])
         
         db.session.commit()
+        invalidar_identidade(g.usuario_id)
         
         return jsonify({'message': 'Senha alterada com sucesso'}), 200
         
+    except ServicoSenhasOcupado:
+        return jsonify({'error': 'Serviço de senhas ocupado, tente novamente'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @user_bp.route('/saldo', methods=['GET'])
+@login_obrigatorio
 def get_saldo():
     """Retorna o saldo atual do usuário"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
+        user = usuario_atual()
         
         return jsonify({'saldo': user.saldo}), 200
         
@@ -105,13 +104,10 @@ def get_saldo():
         return jsonify({'error': str(e)}), 500
 
 @user_bp.route('/adicionar-saldo', methods=['POST'])
+@login_obrigatorio
 def adicionar_saldo():
     """Adiciona saldo à conta do usuário (simulação de pagamento)"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
-        
         data = request.get_json()
         
         if not data or 'valor' not in data:
@@ -119,15 +115,16 @@ def adicionar_saldo():
         
         valor = data['valor']
         
-        if not isinstance(valor, (int, float)) or valor <= 0:
+        if not valor_valido(valor) or valor <= 0:
             return jsonify({'error': 'Valor deve ser positivo'}), 400
         
-        # Adiciona o saldo
-        user.adicionar_saldo(valor)
+        # Adiciona o saldo e registra o depósito no extrato
+        lancamento = lancar(g.usuario_id, 'deposito', valor, 'Depósito de saldo')
+        db.session.commit()
         
         return jsonify({
             'message': 'Saldo adicionado com sucesso',
-            'saldo_atual': user.saldo
+            'saldo_atual': lancamento.saldo_apos
         }), 200
         
     except Exception as e:
@@ -135,50 +132,38 @@ def adicionar_saldo():
         return jsonify({'error': str(e)}), 500
 
 @user_bp.route('/historico-transacoes', methods=['GET'])
+@login_obrigatorio
 def historico_transacoes():
-    """Retorna o histórico de transações do usuário (apostas)"""
+    """Retorna o histórico de transações do usuário (extrato de saldo)"""
     try:
-        user = require_auth()
-        if not user:
-            return jsonify({'error': 'Usuário não autenticado'}), 401
+        # Depósitos, apostas, prêmios e ajustes vêm prontos do extrato
+        lancamentos_query = Lancamento.query.filter_by(user_id=g.usuario_id)
+        
+        # Paginação por cursor sobre o índice (user_id, id)
+        if usar_cursor():
+            pagina = paginar_por_cursor(
+                lancamentos_query, [Lancamento.id], **parametros_cursor(20)
+            )
+            return jsonify({
+                'transacoes': [lancamento.to_dict() for lancamento in pagina['itens']],
+                **campos_cursor(pagina)
+            }), 200
         
         # Pega parâmetros de paginação
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
-        # Busca as apostas do usuário (que são as transações)
-        from src.models.aposta import Aposta
-        apostas_query = Aposta.query.filter_by(user_id=user.id).order_by(Aposta.data_aposta.desc())
-        apostas_paginadas = apostas_query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        transacoes = []
-        for aposta in apostas_paginadas.items:
-            transacao = {
-                'id': aposta.id,
-                'tipo': 'aposta',
-                'valor': -aposta.valor_aposta,  # Negativo porque é débito
-                'descricao': f'Aposta no número {aposta.numero_escolhido}',
-                'data': aposta.data_aposta.isoformat(),
-                'status': aposta.status,
-                'sorteio_data': aposta.sorteio.data_sorteio.isoformat()
-            }
-            
-            # Se a aposta foi ganhadora, adiciona o prêmio como transação separada
-            if aposta.status == 'ganhadora':
-                apostas_ganhadoras = aposta.sorteio.get_apostas_ganhadoras()
-                if apostas_ganhadoras:
-                    premio = aposta.sorteio.premio_total / len(apostas_ganhadoras)
-                    transacao['premio'] = premio
-            
-            transacoes.append(transacao)
+        lancamentos_query = lancamentos_query.order_by(Lancamento.id.desc())
+        lancamentos_paginados = lancamentos_query.paginate(page=page, per_page=per_page, error_out=False)
         
         return jsonify({
-            'transacoes': transacoes,
-            'total': apostas_paginadas.total,
-            'pages': apostas_paginadas.pages,
+            'transacoes': [lancamento.to_dict() for lancamento in lancamentos_paginados.items],
+            'total': lancamentos_paginados.total,
+            'pages': lancamentos_paginados.pages,
             'current_page': page
         }), 200
         
+    except CursorInvalido:
+        return jsonify({'error': 'Cursor inválido'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
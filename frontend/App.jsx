@@ -30,6 +30,22 @@ function App() {
     checkAuthStatus()
   }, [])
 
+  // Atualiza o sorteio atual com as mudanças enviadas pelo servidor (uma conexão por login,
+  // não a cada atualização do usuário)
+  const logado = Boolean(user)
+  useEffect(() => {
+    if (!logado) return
+    return api.subscribeSorteio((tipo, dados) => {
+      const { sorteio_id, ...campos } = dados
+      setSorteioAtual((atual) => {
+        // 'sorteio' substitui o sorteio exibido (reconexão ou virada do dia)
+        if (tipo === 'sorteio') return { ...(atual && atual.id === sorteio_id ? atual : {}), id: sorteio_id, ...campos }
+        if (!atual || atual.id !== sorteio_id) return atual
+        return { ...atual, ...campos }
+      })
+    })
+  }, [logado])
+
   const checkAuthStatus = async () => {
     try {
       const response = await api.getCurrentUser()
@@ -35,6 +35,22 @@ function App() {
     checkAuth();
   }, []);
 
+  // Atualiza o sorteio atual com as mudanças enviadas pelo servidor (uma conexão por login,
+  // não a cada atualização do usuário)
+  const logado = Boolean(currentUser);
+  useEffect(() => {
+    if (!logado) return undefined;
+    return api.subscribeSorteio((tipo, dados) => {
+      const { sorteio_id, ...campos } = dados;
+      setSorteioAtual((atual) => {
+        // 'sorteio' substitui o sorteio exibido (reconexão ou virada do dia)
+        if (tipo === 'sorteio') return { ...(atual && atual.id === sorteio_id ? atual : {}), id: sorteio_id, ...campos };
+        if (!atual || atual.id !== sorteio_id) return atual;
+        return { ...atual, ...campos };
+      });
+    });
+  }, [logado]);
+
   const carregarDados = async () => {
     try {
       const sorteio = await api.getCurrentSorteio();
@@ -100,10 +116,10 @@ function App() {
       setComprovante(response.comprovante);
       setTelaAtual('comprovante');
       
-      // Atualizar dados
+      // Atualizar dados (o sorteio chega pela transmissão)
       const userResponse = await api.getCurrentUser();
       setCurrentUser(userResponse.user);
-      await carregarDados();
+      setMinhasApostas(await api.getMyApostas());
       
       // Limpar seleção
       setNumerosSelecionados([]);
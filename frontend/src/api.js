@@ -128,6 +128,18 @@ class ApiService {
     return this.request('/sorteios/estatisticas');
   }
 
+  // Acompanha o sorteio atual por Server-Sent Events em vez de consultar periodicamente.
+  // onEvento recebe (tipo, dados): 'sorteio' traz o sorteio inteiro (ao conectar e na virada do dia),
+  // 'estado' só os campos alterados e 'resultado' o número sorteado.
+  // Retorna uma função que encerra a conexão.
+  subscribeSorteio(onEvento) {
+    const source = new EventSource(`${this.baseURL}/sorteios/stream`, { withCredentials: true });
+    ['sorteio', 'estado', 'resultado'].forEach((tipo) => {
+      source.addEventListener(tipo, (event) => onEvento(tipo, JSON.parse(event.data)));
+    });
+    return () => source.close();
+  }
+
   // Métodos administrativos (se necessário)
   async executeManualSorteio(dataSorteio = null) {
     const body = dataSorteio ? { data_sorteio: dataSorteio } : {};